@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""Decodes the audio of one frame of the wall at a time.
+
+Muting a player only silences its output, libVLC keeps decoding and
+resampling the audio of every stream. With audio focus only the focused frame
+keeps its audio track, every other frame has its track disabled, so its audio
+is not decoded at all. The focus follows the frame last hovered, selected or
+made fullscreen. Enabling the track again takes a moment for the decoder to
+start, but no more data than the next audio frame.
+"""
+
+from PyQt5 import QtCore
+
+from constants import AUDIO_FOCUS_INTERVAL_MS
+
+# The track id libVLC uses for no audio at all
+NO_TRACK = -1
+
+
+def _first_track(player):
+    """Returns the id of the first audio track of the player, None if the
+    stream hasn't got one (yet)."""
+    for track in player.audio_get_track_description() or ():
+        track_id = track[0]
+        if track_id != NO_TRACK:
+            return track_id
+    return None
+
+
+class AudioFocusManager(QtCore.QObject):
+    """Keeps the audio track of the focused frame and disables the tracks of
+    the others, or of all frames that are muted.
+
+    libVLC selects a track again whenever a player starts, e.g. after a
+    reload, so the tracks are also checked on a timer.
+
+    Args:
+        parent (QObject): Owns the manager.
+        videoframes (callable): Returns the frames of all windows.
+        interval (int): Milliseconds between two checks of the tracks.
+        enabled (bool): False decodes the audio of all frames, like without
+            audio focus.
+    """
+
+    def __init__(self, parent, videoframes, interval=AUDIO_FOCUS_INTERVAL_MS, enabled=True):
+        super(AudioFocusManager, self).__init__(parent)
+        self.videoframes = videoframes
+        self.enabled = enabled
+        self.focused = None
+        self.switches = 0
+        self.decoding = 0
+        # The track ids of the frames whose track was disabled
+        self._tracks = {}
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.update)
+        self.timer.start(interval)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.update()
+
+    def focus(self, videoframe):
+        """Makes the frame the one whose audio is decoded."""
+        if videoframe is not self.focused:
+            self.focused = videoframe
+            self.switches += 1
+        self.update()
+
+    def audible(self, videoframe):
+        """Whether the audio of the frame should be decoded."""
+        if not self.enabled:
+            return True
+        # Unknown (-1) counts as not muted
+        return videoframe is self.focused and videoframe.player.audio_get_mute() != 1
+
+    def update(self):
+        """Enables and disables the audio tracks of the frames as needed."""
+        frames = self.videoframes()
+        if not any(frame is self.focused for frame in frames):
+            # The focused frame was deleted or moved away, or nothing was focused yet
+            self.focused = frames[0] if frames else None
+
+        tracks = {}
+        decoding = 0
+        for frame in frames:
+            player = frame.player
+            track = player.audio_get_track()
+            if self.audible(frame):
+                if track == NO_TRACK:
+                    track = self._enable(player, self._tracks.get(frame))
+                decoding += track != NO_TRACK
+            elif track != NO_TRACK:
+                player.audio_set_track(NO_TRACK)
+                tracks[frame] = track
+            elif frame in self._tracks:
+                tracks[frame] = self._tracks[frame]
+        self._tracks = tracks
+        self.decoding = decoding
+
+    @staticmethod
+    def _enable(player, track):
+        """Enables the track, or the first one if it's gone after a restart.
+
+        Returns:
+            int: The enabled track, NO_TRACK if there is none.
+        """
+        if track is not None and player.audio_set_track(track) == 0:
+            return track
+        track = _first_track(player)
+        if track is not None and player.audio_set_track(track) == 0:
+            return track
+        return NO_TRACK
+
+    def stats(self):
+        """Returns how often the focus changed and how many streams decode audio."""
+        return {
+            "audio_focus_switches": self.switches,
+            "audio_decoding_streams": self.decoding,
+        }
@@ -0,0 +1,2 @@
+"""Benchmarks for the application, run from the repository root with
+``python -m benchmarks.<name>``."""
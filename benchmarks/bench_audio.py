@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Measures the CPU time audio focus saves on a wall of tiles.
+
+    python -m benchmarks.bench_audio URL [URL ...] [--tiles N] [--quality Q]
+        [--warmup SECONDS] [--seconds S] [--rounds N] [--output FILE]
+
+The simulated streams have no audio, so this needs real streams with audio,
+e.g. channels of a streaming site or httpstream://http://host/sample.ts, used
+in turn until there are N tiles. The window runs on the offscreen Qt platform
+with real libVLC players, in an empty working directory like benchmarks.soak,
+and libVLC needs an audio output to decode into, e.g. a PulseAudio null sink
+on a server.
+
+Every round measures the CPU time of the process for S seconds with the audio
+of every tile decoded, then with audio focus, so changes in the streams over
+time hit both the same. The results hold the CPU time per second and the
+share of it audio focus saved.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.common import environment, summarize, use_offscreen_platform, write_results
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run_events(app, seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def _cpu_seconds():
+    times = os.times()
+    return times.user + times.system
+
+
+def measure(app, window, args):
+    """Returns the CPU seconds per second of every round without and with focus."""
+    samples = {"all_decoding": [], "audio_focus": []}
+    for _ in range(args.rounds):
+        for mode, enabled in (("all_decoding", False), ("audio_focus", True)):
+            window.audio_focus.set_enabled(enabled)
+            # Give the decoders time to stop or start
+            _run_events(app, 2)
+            before = _cpu_seconds()
+            _run_events(app, args.seconds)
+            samples[mode].append((_cpu_seconds() - before) / args.seconds)
+    return samples
+
+
+def run(args):
+    use_offscreen_platform()
+    with tempfile.TemporaryDirectory() as workdir:
+        # The application looks up its ui files and plugins relative to the working directory
+        for name in ("ui", "sim"):
+            os.symlink(os.path.join(REPO_ROOT, name), os.path.join(workdir, name))
+        os.chdir(workdir)
+
+        from PyQt5 import QtWidgets
+        from main import ApplicationWindow
+        from videoframes import libvlc
+
+        # Without libVLC there is nothing to measure, find out before opening the window
+        try:
+            instance = libvlc.get().Instance()
+        except Exception as e:
+            sys.exit("libVLC could not be loaded: {}".format(e))
+        if instance is None:
+            sys.exit("libVLC could not create a player, are its plugins installed?")
+        instance.release()
+
+        app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+        window = ApplicationWindow()
+        window.load_in_background()
+
+        for tile in range(args.tiles):
+            url = window.model.parse_url(args.urls[tile % len(args.urls)])
+            try:
+                stream_options = window.model.get_stream_options(url)
+            except Exception as e:
+                sys.exit("Could not resolve {}: {}".format(url, e))
+            if not stream_options:
+                sys.exit("No streams found for {}".format(url))
+            quality = args.quality if args.quality in stream_options else sorted(stream_options)[0]
+            window.setup_videoframe(url, stream_options, quality)
+        _run_events(app, args.warmup)
+
+        samples = measure(app, window, args)
+        decoding = window.audio_focus.stats()["audio_decoding_streams"]
+        window.model.history.close()
+        os.chdir(REPO_ROOT)
+
+    all_decoding = summarize(samples["all_decoding"], scale=1.0)
+    audio_focus = summarize(samples["audio_focus"], scale=1.0)
+    return {
+        "environment": environment(),
+        "tiles": args.tiles,
+        "rounds": args.rounds,
+        "unit": "CPU seconds per second",
+        "all_decoding": all_decoding,
+        "audio_focus": audio_focus,
+        "decoding_with_focus": decoding,
+        "saved": 1 - audio_focus["mean"] / all_decoding["mean"] if all_decoding["mean"] else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("urls", nargs="+", metavar="URL", help="streams with audio")
+    parser.add_argument("--tiles", type=int, default=16)
+    parser.add_argument("--quality", default="360p", help="used where the stream offers it")
+    parser.add_argument("--warmup", type=float, default=20, help="seconds played before measuring")
+    parser.add_argument("--seconds", type=float, default=20, help="seconds measured per mode and round")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+    write_results(run(args), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Times exporting clips from a large rewind buffer of simulated MPEG-TS.
+
+    python -m benchmarks.bench_clips [--minutes N] [--bitrate BPS] [--chunk BYTES]
+        [--clips SECONDS,...] [--repeats N] [--output FILE]
+
+The buffer holds --minutes of a stream at --bitrate, in chunks of --chunk
+bytes like the read callback stores them. For every clip length the results
+hold the time to snapshot the buffer, which is all the GUI thread does, and
+to cut and write the clip on the worker thread, with the throughput in MB of
+clip per second.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from collections import deque
+
+from benchmarks.common import environment, summarize, write_results
+
+MEGABYTE = 1024 * 1024
+
+
+def _parse_clips(text):
+    return [float(seconds) for seconds in text.split(",")]
+
+
+def build_buffer(minutes, bitrate, chunk):
+    """Returns a rewind buffer holding minutes of stream."""
+    from sim.mpegts import generate_segment
+
+    data = b"".join(generate_segment(sequence, 2.0, bitrate) for sequence in range(int(minutes * 30)))
+    return deque(data[offset:offset + chunk] for offset in range(0, len(data), chunk))
+
+
+def run(minutes, bitrate, chunk, clip_lengths, repeats):
+    import clips
+
+    buffer = build_buffer(minutes, bitrate, chunk)
+    buffer_bytes = sum(len(data) for data in buffer)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "clip.ts")
+        for seconds in clip_lengths:
+            samples = {"snapshot": [], "cut": [], "write": [], "total": []}
+            for _ in range(repeats):
+                start = time.perf_counter()
+                chunks = list(buffer)
+                snapshot = time.perf_counter()
+                clip = clips.cut_chunks(chunks, seconds)
+                cut = time.perf_counter()
+                clips.atomic_write(path, clip)
+                written = time.perf_counter()
+
+                samples["snapshot"].append(snapshot - start)
+                samples["cut"].append(cut - snapshot)
+                samples["write"].append(written - cut)
+                samples["total"].append(written - start)
+
+            total = summarize(samples["total"])
+            results.append({
+                "clip_seconds": seconds,
+                "clip_bytes": len(clip),
+                "ms": {name: summarize(values) for name, values in samples.items()},
+                "mb_per_s": len(clip) / MEGABYTE / (total["p50"] / 1000.0) if total["p50"] else 0.0,
+            })
+
+    return {
+        "environment": environment(),
+        "buffer_bytes": buffer_bytes,
+        "buffer_chunks": len(buffer),
+        "bitrate": bitrate,
+        "clips": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=5, help="stream held by the buffer")
+    parser.add_argument("--bitrate", type=int, default=6000000, help="bits per second of the stream")
+    parser.add_argument("--chunk", type=int, default=32768, help="bytes per buffered chunk")
+    parser.add_argument("--clips", type=_parse_clips, default=[30, 120, 290],
+                        help="comma separated clip lengths in seconds")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+    write_results(run(args.minutes, args.bitrate, args.chunk, args.clips, args.repeats), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""Measures the data path of containers.py without Qt or libVLC, by calling
+LiveStreamContainer.read and RewoundStreamContainer.read the way the libVLC
+read callback does, with fake streams and ctypes buffers.
+
+    python -m benchmarks.bench_containers [--sizes BYTES,...] [--buffers off|N,...]
+        [--megabytes N] [--repeats N] [--memory-calls N] [--probe] [--output FILE]
+
+Every combination of read size and buffer setting is one case. A live case
+reads from a fresh container with buffering off, or on with a buffer of N
+chunks. A rewound case reads from a container holding a full buffer of N
+chunks, looping over it like a rewound stream played to its end does.
+
+For every case the results hold:
+
+    mb_per_s          Throughput of the timed runs, p50, min and max
+    blocks_per_call   Memory blocks still allocated per call once the buffer is full
+    bytes_per_call    Bytes still allocated per call once the buffer is full
+    call_peak_bytes   Most memory allocated during a single call
+    peak_bytes        Peak memory of a container with a full buffer
+
+The memory numbers come from tracemalloc in a separate, untimed pass of
+--memory-calls calls, as tracing slows every call down several times.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.common import environment, percentile, write_results
+from benchmarks.fakes import FakeStream, FakeVlcInstance, fake_streams, vlc_buffer
+
+MEGABYTE = 1024 * 1024
+
+
+def _parse_sizes(text):
+    return [int(size) for size in text.split(",")]
+
+
+def _parse_buffers(text):
+    """Returns the buffer settings, None for buffering turned off."""
+    return [None if setting == "off" else int(setting) for setting in text.split(",")]
+
+
+def _live(size, buffer_length):
+    from config import cfg
+    from containers import LiveStreamContainer
+
+    config = cfg.snapshot()
+    config = config._replace(
+        buffer_stream=buffer_length is not None,
+        buffer_size=buffer_length or config.buffer_size,
+        # The fake stream can only be read in this process
+        worker_processes=False
+    )
+    # Room for the largest read, so every call returns a full chunk
+    stream = FakeStream(b"\x47" * max(size, 188 * 1024))
+    return LiveStreamContainer(FakeVlcInstance(), "bench://live", fake_streams(stream=stream), "best",
+                               config=config)
+
+
+def _fill(live, size):
+    """Fills the buffer of a live container, skipping the copy to libVLC."""
+    for _ in range(live.buffer.maxlen):
+        live._fetch(size)
+
+
+def _rewound(size, buffer_length):
+    from containers import RewoundStreamContainer
+
+    live = _live(size, buffer_length)
+    _fill(live, size)
+    live.close()
+    return RewoundStreamContainer(FakeVlcInstance(), live.buffer)
+
+
+def _reader(container):
+    """Returns a function reading once from the container. Rewound containers
+    start over at the end of their buffer instead of returning no data."""
+    if hasattr(container, "curr"):
+        chunks = len(container.buffer)
+
+        def read(buf, size):
+            if container.curr >= chunks:
+                container.curr = 0
+            return container.read(buf, size)
+        return read
+    return container.read
+
+
+def _throughput(factory, size, buffer_length, calls, repeats):
+    buf = vlc_buffer(size)
+    samples = []
+    for _ in range(repeats):
+        container = factory(size, buffer_length)
+        read = _reader(container)
+        total = 0
+        start = time.perf_counter()
+        for _ in range(calls):
+            total += read(buf, size)
+        elapsed = time.perf_counter() - start
+        container.close()
+        samples.append(total / MEGABYTE / elapsed)
+    return {
+        "p50": percentile(samples, 50),
+        "min": min(samples),
+        "max": max(samples),
+    }
+
+
+def _memory(factory, size, buffer_length, calls):
+    buf = vlc_buffer(size)
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        container = factory(size, buffer_length)
+        read = _reader(container)
+        # A live container peaks once its buffer is full
+        if buffer_length is not None and hasattr(container, "_fetch"):
+            _fill(container, size)
+        for _ in range(calls):
+            read(buf, size)
+        _, peak = tracemalloc.get_traced_memory()
+
+        # With the buffer full, whatever stays allocated is a leak or growth
+        before = tracemalloc.take_snapshot()
+        call_peak = 0
+        for _ in range(calls):
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            read(buf, size)
+            call_peak = max(call_peak, tracemalloc.get_traced_memory()[1] - current)
+        after = tracemalloc.take_snapshot()
+        container.close()
+    finally:
+        tracemalloc.stop()
+
+    # Leave out what the snapshots themselves allocated
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "filename")
+    return {
+        "blocks_per_call": sum(stat.count_diff for stat in stats) / calls,
+        "bytes_per_call": sum(stat.size_diff for stat in stats) / calls,
+        # Without reset_peak the peak of a call can't be told apart from earlier ones
+        "call_peak_bytes": call_peak if hasattr(tracemalloc, "reset_peak") else None,
+        "peak_bytes": peak - start,
+    }
+
+
+def run(sizes, buffers, megabytes, repeats, memory_calls):
+    cases = []
+    for size in sizes:
+        calls = max(1, int(megabytes * MEGABYTE / size))
+        for buffer_length in buffers:
+            kinds = [("live", _live)]
+            # A rewound container needs the buffer of a live one
+            if buffer_length is not None:
+                kinds.append(("rewound", _rewound))
+            for kind, factory in kinds:
+                case = {
+                    "container": kind,
+                    "read_size": size,
+                    "buffer": "off" if buffer_length is None else buffer_length,
+                    "calls": calls,
+                    "mb_per_s": _throughput(factory, size, buffer_length, calls, repeats),
+                }
+                case.update(_memory(factory, size, buffer_length, memory_calls))
+                cases.append(case)
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=_parse_sizes, default=[4096, 32768, 65536],
+                        help="comma separated bytes asked for per read call")
+    parser.add_argument("--buffers", type=_parse_buffers, default=[None, 10, 100],
+                        help="comma separated buffer lengths in chunks, 'off' turns buffering off")
+    parser.add_argument("--megabytes", type=float, default=4, help="data read per run")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--memory-calls", type=int, default=64, help="calls traced per case")
+    parser.add_argument("--probe", action="store_true", help="measure with the read probe enabled")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    from metrics import ReadProbe
+    enabled = ReadProbe.enabled
+    ReadProbe.set_enabled(args.probe)
+    try:
+        cases = run(args.sizes, args.buffers, args.megabytes, args.repeats, args.memory_calls)
+    finally:
+        ReadProbe.set_enabled(enabled)
+
+    write_results({
+        "environment": environment(),
+        "megabytes": args.megabytes,
+        "repeats": args.repeats,
+        "memory_calls": args.memory_calls,
+        "probe": args.probe,
+        "cases": cases,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
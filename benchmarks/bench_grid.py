@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""Times the operations of VideoFrameGrid for grids of 4 up to 100 tiles, with
+stub frames in place of the libVLC players.
+
+    python -m benchmarks.bench_grid [--tiles N,...] [--repeats N] [--output FILE]
+        [--max-exponent OPERATION=EXPONENT ...] [--baseline FILE] [--tolerance EXPONENT]
+
+Every operation is timed together with the events it posts, so the layout
+passes it triggers are included, and the layout passes are counted too:
+
+    add_new_videoframe      Adding the Nth tile
+    delete_stream           Deleting the first tile, which moves every other one
+    swap_frame              Selecting two tiles, which swaps them
+    toggle_fullscreen_on    Showing one tile fullscreen
+    toggle_fullscreen_off   Going back to the grid
+
+The exponent of an operation is the slope of its p50 time against the number
+of tiles on a log-log scale, 0 for constant time and 1 for linear time, so a
+change of the layout that makes an operation scale worse shows up as a larger
+exponent. The script exits with status 1 if an exponent exceeds its
+--max-exponent, or grew by more than --tolerance since the --baseline results.
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+
+from benchmarks.common import environment, summarize, use_offscreen_platform, write_results
+
+OPERATIONS = (
+    "add_new_videoframe",
+    "delete_stream",
+    "swap_frame",
+    "toggle_fullscreen_on",
+    "toggle_fullscreen_off",
+)
+
+
+def _parse_tiles(text):
+    return [int(tiles) for tiles in text.split(",")]
+
+
+def parse_max_exponent(text):
+    name, _, exponent = text.rpartition("=")
+    if not name:
+        raise argparse.ArgumentTypeError("expected OPERATION=EXPONENT, got " + text)
+    return name, float(exponent)
+
+
+def exponent(sizes, times):
+    """Returns the least squares slope of log(time) against log(size)."""
+    points = [(math.log(size), math.log(t)) for size, t in zip(sizes, times) if t > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, _ in points)
+    if not variance:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+
+def _stubs():
+    """Returns the stub frame and grid classes, created once Qt is imported."""
+    from PyQt5 import QtWidgets
+    from videoframegrid import VideoFrameGrid
+
+    class StubPlayer:
+        def play(self):
+            pass
+
+        def pause(self):
+            pass
+
+        def audio_set_mute(self, mute):
+            pass
+
+    class StubFrame(QtWidgets.QFrame):
+        """Provides what the grid uses of a LiveVideoFrame."""
+
+        def __init__(self, parent):
+            super(StubFrame, self).__init__(parent)
+            self.player = StubPlayer()
+            self.is_muted = False
+            self.selected = False
+
+        def set_stats_overlay_visible(self, visible):
+            pass
+
+        def select(self):
+            self.selected = True
+            self._swap(self)
+
+        def deselect(self):
+            self.selected = False
+
+    class StubGrid(VideoFrameGrid):
+        """Creates stub frames and counts its layout passes."""
+
+        layout_passes = 0
+
+        def _create_videoframe(self, stream_url, stream_options, quality):
+            return StubFrame(self.parent)
+
+        def setGeometry(self, rect):
+            self.layout_passes += 1
+            super(StubGrid, self).setGeometry(rect)
+
+    return StubGrid
+
+
+class _Window:
+    """Creates the main window the grid lives in."""
+
+    def __init__(self, grid_class):
+        from PyQt5 import QtWidgets
+
+        self.window = QtWidgets.QMainWindow()
+        self.window.menubar = self.window.menuBar()
+        self.window.menubar.addMenu("File")
+        self.window.resize(1280, 720)
+        central = QtWidgets.QWidget(self.window)
+        self.window.setCentralWidget(central)
+        self.grid = grid_class(self.window)
+        central.setLayout(self.grid)
+        self.window.show()
+
+    def close(self):
+        self.window.close()
+        self.window.deleteLater()
+
+
+def _timed(app, grid, operation):
+    """Returns the seconds and layout passes of the operation and the events it posted."""
+    passes = grid.layout_passes
+    start = time.perf_counter()
+    operation()
+    app.processEvents()
+    return time.perf_counter() - start, grid.layout_passes - passes
+
+
+def _add(grid):
+    grid.add_new_videoframe("bench://grid", {}, "best")
+
+
+def measure(app, grid_class, tiles, repeats):
+    """Returns the samples of every operation on a grid of tiles tiles."""
+    window = _Window(grid_class)
+    grid = window.grid
+    for _ in range(tiles - 1):
+        _add(grid)
+    app.processEvents()
+
+    samples = {operation: ([], []) for operation in OPERATIONS}
+
+    def record(operation, func):
+        seconds, passes = _timed(app, grid, func)
+        samples[operation][0].append(seconds)
+        samples[operation][1].append(passes)
+
+    for _ in range(repeats):
+        record("add_new_videoframe", lambda: _add(grid))
+
+        record("delete_stream", lambda: grid.delete_stream(grid.videoframes[0]))
+        _add(grid)
+        app.processEvents()
+
+        first, last = grid.videoframes[0], grid.videoframes[-1]
+
+        def swap():
+            first.select()
+            last.select()
+        record("swap_frame", swap)
+
+        record("toggle_fullscreen_on", lambda: grid.toggle_fullscreen(first))
+        record("toggle_fullscreen_off", lambda: grid.toggle_fullscreen(first))
+
+        # Back to tiles - 1 for the next add
+        grid.delete_stream(grid.videoframes[-1])
+        app.processEvents()
+
+    window.close()
+    app.processEvents()
+    return samples
+
+
+def run(sizes, repeats):
+    use_offscreen_platform()
+    from PyQt5 import QtWidgets
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    grid_class = _stubs()
+
+    operations = {operation: {"tiles": {}} for operation in OPERATIONS}
+    for tiles in sizes:
+        samples = measure(app, grid_class, tiles, repeats)
+        for operation, (seconds, passes) in samples.items():
+            result = summarize(seconds)
+            result["layout_passes"] = sum(passes) / len(passes)
+            operations[operation]["tiles"][str(tiles)] = result
+
+    for operation in operations.values():
+        operation["exponent"] = exponent(sizes, [operation["tiles"][str(tiles)]["p50"] for tiles in sizes])
+
+    return {
+        "environment": environment(),
+        "repeats": repeats,
+        "unit": "ms",
+        "operations": operations,
+    }
+
+
+def regressions(results, max_exponents, baseline, tolerance):
+    """Returns a message for every exponent over its maximum or grown by
+    more than tolerance since the baseline results."""
+    messages = []
+    for name, maximum in max_exponents:
+        value = results["operations"].get(name, {}).get("exponent")
+        if value is not None and value > maximum:
+            messages.append("{}: exponent {:.2f} > {:.2f}".format(name, value, maximum))
+    if baseline is not None:
+        for name, operation in sorted(results["operations"].items()):
+            before = baseline["operations"].get(name, {}).get("exponent")
+            value = operation["exponent"]
+            if before is not None and value is not None and value - before > tolerance:
+                messages.append("{}: exponent {:.2f}, was {:.2f}".format(name, value, before))
+    return messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tiles", type=_parse_tiles, default=[4, 9, 16, 25, 36, 49, 64, 81, 100],
+                        help="comma separated grid sizes")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument(
+        "--max-exponent",
+        type=parse_max_exponent,
+        action="append",
+        default=[],
+        metavar="OPERATION=EXPONENT",
+        help="fail if the exponent of OPERATION exceeds EXPONENT"
+    )
+    parser.add_argument("--baseline", help="results of an earlier run to compare the exponents to")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="how much an exponent may grow since the baseline")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+    results = run(args.tiles, args.repeats)
+    write_results(results, args.output)
+
+    messages = regressions(results, args.max_exponent, baseline, args.tolerance)
+    if messages:
+        sys.exit("Grid operations scale worse:\n  " + "\n  ".join(messages))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Measures the overhead of the read callback instrumentation by driving a
+LiveStreamContainer with and without its ReadProbe enabled.
+
+    python -m benchmarks.bench_read_instrumentation [--calls N] [--size BYTES]
+        [--block N] [--repeats N] [--output FILE]
+
+The modes take turns every block of calls, so drift in the machine hits both
+alike, and every repeat gives one overhead. The result is the median of them.
+"""
+
+import argparse
+import statistics
+import time
+
+from benchmarks.common import summarize, write_results
+from benchmarks.fakes import FakeVlcInstance, fake_streams, vlc_buffer
+
+
+def _time_reads(container, buf, size, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        container.read(buf, size)
+    return (time.perf_counter() - start) / calls
+
+
+def run(calls, size, block, repeats):
+    from containers import LiveStreamContainer
+    from metrics import ReadProbe
+
+    buf = vlc_buffer(size)
+    enabled = ReadProbe.enabled
+    samples = {"off": [], "on": []}
+    overheads = []
+    try:
+        for _ in range(repeats):
+            containers = {
+                mode: LiveStreamContainer(FakeVlcInstance(), "bench://read", fake_streams(), "best")
+                for mode in ("off", "on")
+            }
+            seconds = {"off": 0.0, "on": 0.0}
+            for _ in range(calls // block):
+                for mode, container in containers.items():
+                    ReadProbe.set_enabled(mode == "on")
+                    seconds[mode] += _time_reads(container, buf, size, block)
+            for mode in seconds:
+                samples[mode].append(seconds[mode] / (calls // block))
+            overheads.append((seconds["on"] / seconds["off"] - 1) * 100)
+    finally:
+        ReadProbe.set_enabled(enabled)
+
+    return {
+        "calls": calls,
+        "size": size,
+        "block": block,
+        "unit": "us/call",
+        "off": summarize(samples["off"], scale=1e6),
+        "on": summarize(samples["on"], scale=1e6),
+        "overhead_pct": statistics.median(overheads),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=32768, help="bytes asked for per read call")
+    parser.add_argument("--block", type=int, default=50, help="calls in a row in one mode")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+    write_results(run(args.calls, args.size, args.block, args.repeats), args.output)
+
+
+if __name__ == "__main__":
+    main()
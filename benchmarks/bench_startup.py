@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Runs repeated cold starts of main.py under the offscreen Qt platform and
+reports percentiles for every startup span.
+
+    python -m benchmarks.bench_startup [--runs N] [--output FILE]
+                                       [--budget SPAN=MS ...]
+
+Every run starts a fresh interpreter in an empty working directory, so the
+user's config and history are left alone. With --budget the script exits
+with status 1 if the p50 of a span exceeds its budget in milliseconds, which
+is how CI catches startup regressions.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import percentile, write_results
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cold_start(workdir, timeout):
+    """Starts main.py once and returns its spans and the process wall time."""
+    trace = os.path.join(workdir, "trace.json")
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(REPO_ROOT, "main.py"),
+         "--trace-startup", trace, "--quit-after-startup"],
+        cwd=workdir, env=env, timeout=timeout, check=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    wall = (time.perf_counter() - start) * 1000
+
+    with open(trace, "r") as f:
+        spans = json.load(f)["spans"]
+    os.remove(trace)
+    return spans, wall
+
+
+def run(runs, timeout):
+    samples = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        # The application looks up its ui files relative to the working directory
+        os.symlink(os.path.join(REPO_ROOT, "ui"), os.path.join(workdir, "ui"))
+
+        for _ in range(runs):
+            spans, wall = cold_start(workdir, timeout)
+            samples.setdefault("process", []).append(wall)
+            for span in spans:
+                samples.setdefault(span["name"], []).append(span["duration_ms"])
+
+    return {
+        name: {
+            "runs": len(values),
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p99": percentile(values, 99),
+            "max": max(values),
+        }
+        for name, values in samples.items()
+    }
+
+
+def parse_budget(text):
+    name, _, millis = text.rpartition("=")
+    if not name:
+        raise argparse.ArgumentTypeError("expected SPAN=MS, got " + text)
+    return name, float(millis)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=60, help="seconds per cold start")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    parser.add_argument(
+        "--budget",
+        type=parse_budget,
+        action="append",
+        default=[],
+        metavar="SPAN=MS",
+        help="fail if the p50 of SPAN exceeds MS milliseconds"
+    )
+    args = parser.parse_args()
+
+    results = run(args.runs, args.timeout)
+    write_results(results, args.output)
+
+    over_budget = [
+        "{}: p50 {:.1f} ms > {:.1f} ms".format(name, results[name]["p50"], budget)
+        for name, budget in args.budget
+        if name in results and results[name]["p50"] > budget
+    ]
+    if over_budget:
+        sys.exit("Startup over budget:\n  " + "\n  ".join(over_budget))
+
+
+if __name__ == "__main__":
+    main()
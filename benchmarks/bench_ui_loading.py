@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Times building the main window and a tile from runtime-parsed .ui files
+against the precompiled modules generated by compile_ui.py.
+
+    python -m benchmarks.bench_ui_loading [--iterations N] [--output FILE]
+"""
+
+import argparse
+import time
+
+from benchmarks.common import summarize, use_offscreen_platform, write_results
+
+
+def _time(func, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run(iterations):
+    use_offscreen_platform()
+    from PyQt5 import QtWidgets, uic
+
+    from compile_ui import compile_ui_files
+    from constants import FRAME_UI_FILE, MAIN_UI_FILE, REWOUND_FRAME_UI_FILE
+    import uiloader
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    compile_ui_files()
+    with open("ui/styles.qss", "r") as f:
+        stylesheet = f.read()
+    parent = QtWidgets.QWidget()
+
+    def startup(load):
+        def func():
+            window = QtWidgets.QMainWindow()
+            load(MAIN_UI_FILE, window)
+            window.setStyleSheet(stylesheet)
+            window.deleteLater()
+        return func
+
+    def tile_add(ui_file, load):
+        def func():
+            frame = QtWidgets.QFrame(parent)
+            load(ui_file, frame)
+            frame.deleteLater()
+        return func
+
+    loaders = {
+        "runtime": uic.loadUi,
+        "compiled": uiloader.load_ui,
+    }
+
+    results = {}
+    for mode, load in loaders.items():
+        results[mode] = {
+            "startup": summarize(_time(startup(load), iterations)),
+            "live_tile_add": summarize(_time(tile_add(FRAME_UI_FILE, load), iterations)),
+            "rewound_tile_add": summarize(_time(tile_add(REWOUND_FRAME_UI_FILE, load), iterations)),
+        }
+        app.processEvents()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    write_results(run(args.iterations), args.output)
+
+
+if __name__ == "__main__":
+    main()
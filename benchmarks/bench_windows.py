@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""Compares the memory of a wall of W windows in one process with W processes
+of one window each.
+
+    python -m benchmarks.bench_windows [--windows W] [--tiles N] [--quality Q]
+        [--settle SECONDS] [--output FILE]
+
+The stream simulator runs in a process of its own. Every window plays N
+streams of it, first as W windows opened from one ApplicationWindow, then as
+W copies of the app started side by side, each in an empty working directory
+like benchmarks.soak. Once all streams have played for a while the resident
+(RSS) and proportional (PSS) memory of the app processes is summed. PSS
+splits the shared libraries between the processes that map them, so it is the
+fair total of the processes; RSS counts them once per process.
+
+Where libVLC can't be loaded the streams are read through LiveStreamContainers
+without frames, like record.py does, so decoding is not part of the results.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.common import environment, process_memory, start_simulator, use_offscreen_platform, write_results
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MEGABYTE = 1024 * 1024
+READ_SIZE = 65536
+
+
+def run_app(args):
+    """Runs in an app process: opens the windows, plays the streams and
+    reports on stdout once they have settled, then waits for stdin to close."""
+    use_offscreen_platform()
+    from PyQt5 import QtWidgets
+    from containers import LiveStreamContainer
+    from main import ApplicationWindow
+    from videoframes import libvlc
+
+    app = QtWidgets.QApplication([])
+    window = ApplicationWindow()
+    for _ in range(args.windows - 1):
+        window.open_window()
+    window.load_in_background()
+    try:
+        libvlc.get()
+        frames = True
+    except Exception:
+        frames = False
+
+    containers = []
+    for number, open_window in enumerate(window.windows):
+        for tile in range(args.tiles):
+            url = "sim://{}/app{}-window{}-tile{}".format(args.address, args.app, number, tile)
+            stream_options = open_window.model.get_stream_options(url)
+            if frames:
+                open_window.setup_videoframe(url, stream_options, args.quality)
+            else:
+                containers.append(LiveStreamContainer(None, url, stream_options, args.quality))
+
+    def pull(container):
+        while container.pull(READ_SIZE):
+            pass
+
+    for container in containers:
+        threading.Thread(target=pull, args=(container,), daemon=True).start()
+
+    end = time.monotonic() + args.settle
+    while time.monotonic() < end:
+        app.processEvents()
+        time.sleep(0.01)
+    print(json.dumps({"frames": frames, "tiles": len(window.videoframes()) + len(containers)}), flush=True)
+
+    sys.stdin.read()
+    window.model.history.close()
+    # Tearing down the players is not measured
+    os._exit(0)
+
+
+def run_layout(address, args, apps, windows):
+    """Starts apps processes of windows windows each and measures them."""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    workdirs = []
+    processes = []
+    try:
+        for app in range(apps):
+            workdir = tempfile.mkdtemp()
+            workdirs.append(workdir)
+            # The application looks up its ui files and plugins relative to the working directory
+            for name in ("ui", "sim"):
+                os.symlink(os.path.join(REPO_ROOT, name), os.path.join(workdir, name))
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.bench_windows", "--app", str(app),
+                 "--windows", str(windows), "--tiles", str(args.tiles), "--quality", args.quality,
+                 "--settle", str(args.settle), "--address", address],
+                cwd=workdir, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True
+            ))
+
+        reports = []
+        for process in processes:
+            # The app prints what it does before the report
+            line = " "
+            while not line.startswith("{"):
+                line = process.stdout.readline()
+                if not line:
+                    raise RuntimeError("An app process exited before its streams were playing")
+            reports.append(json.loads(line))
+        memory = [process_memory(process.pid) for process in processes]
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+        for workdir in workdirs:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    pss = [p for _, p in memory]
+    return {
+        "processes": apps,
+        "windows_per_process": windows,
+        "tiles": sum(report["tiles"] for report in reports),
+        "frames": all(report["frames"] for report in reports),
+        "rss_mb": sum(rss for rss, _ in memory) / MEGABYTE,
+        "pss_mb": sum(pss) / MEGABYTE if None not in pss else None,
+        "rss_mb_per_process": [rss / MEGABYTE for rss, _ in memory],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--windows", type=int, default=4)
+    parser.add_argument("--tiles", type=int, default=4, help="streams per window")
+    parser.add_argument("--quality", default="360p")
+    parser.add_argument("--settle", type=float, default=10, help="seconds the streams play before measuring")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    # Used by the app processes the benchmark starts
+    parser.add_argument("--app", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--address", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.app is not None:
+        run_app(args)
+        return
+
+    simulator, address = start_simulator()
+    try:
+        one_process = run_layout(address, args, 1, args.windows)
+        processes = run_layout(address, args, args.windows, 1)
+    finally:
+        simulator.terminate()
+        simulator.wait()
+
+    saved = {
+        "rss_mb": processes["rss_mb"] - one_process["rss_mb"],
+        "pss_mb": None,
+    }
+    if one_process["pss_mb"] is not None and processes["pss_mb"] is not None:
+        saved["pss_mb"] = processes["pss_mb"] - one_process["pss_mb"]
+    write_results({
+        "environment": environment(),
+        "windows": args.windows,
+        "tiles_per_window": args.tiles,
+        "one_process": one_process,
+        "process_per_window": processes,
+        "saved": saved,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Compares reading streams in process with reading them in worker processes.
+
+    python -m benchmarks.bench_workers [--streams N] [--seconds S] [--quality Q]
+        [--transport hls|http] [--bitrate-scale X] [--output FILE]
+
+The stream simulator runs in a process of its own. For each mode N streams of
+it are read through LiveStreamContainers by one thread each, like the libVLC
+read callbacks would, while the main thread wakes up every 10 ms like the GUI
+event loop. The results hold the data delivered, the CPU time and memory of
+this process and of the workers, how late the main thread woke up, which is
+what makes the wall stutter, and how long the reads took.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from benchmarks.common import environment, process_memory, start_simulator, summarize, write_results
+
+MEGABYTE = 1024 * 1024
+TICK = 0.01
+READ_SIZE = 65536
+
+
+def _process_cpu(pid):
+    """Returns the CPU seconds of a process from /proc, or None if unknown."""
+    try:
+        with open("/proc/{}/stat".format(pid), "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _megabytes(sizes):
+    """Returns the sum of the sizes in megabytes, None if any is unknown."""
+    if None in sizes:
+        return None
+    return sum(sizes) / MEGABYTE
+
+
+def run_mode(address, args, in_workers):
+    from config import cfg
+    from containers import LiveStreamContainer
+    from models.model import create_streamlink_session
+
+    session = create_streamlink_session()
+    config = cfg.snapshot()._replace(worker_processes=in_workers)
+    query = "bitrate_scale={}".format(args.bitrate_scale)
+    if args.transport == "http":
+        query += "&transport=http"
+
+    containers = []
+    for number in range(args.streams):
+        # Resolved here either way, like the GUI does to offer the qualities
+        url = "sim://{}/bench{}?{}".format(address, number, query)
+        containers.append(LiveStreamContainer(None, url, session.streams(url), args.quality, config=config))
+
+    stop = threading.Event()
+    latencies = [[] for _ in containers]
+
+    def pull(container, samples):
+        while not stop.is_set():
+            start = time.perf_counter()
+            if not container.pull(READ_SIZE):
+                break
+            samples.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=pull, args=(container, samples), daemon=True)
+               for container, samples in zip(containers, latencies)]
+    for thread in threads:
+        thread.start()
+    # Let the streams start up before measuring
+    time.sleep(args.warmup)
+    for samples in latencies:
+        del samples[:]
+    read_before = sum(container.bytes_read for container in containers)
+    worker_pids = [container.stream.pid for container in containers if in_workers]
+    workers_before = [_process_cpu(pid) for pid in worker_pids]
+    times_before = os.times()
+
+    lateness = []
+    end = time.perf_counter() + args.seconds
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        time.sleep(TICK)
+        lateness.append(time.perf_counter() - start - TICK)
+
+    times_after = os.times()
+    workers_after = [_process_cpu(pid) for pid in worker_pids]
+    delivered = sum(container.bytes_read for container in containers) - read_before
+    main_memory = process_memory(os.getpid())
+    worker_memory = [process_memory(pid) for pid in worker_pids]
+
+    stop.set()
+    for container in containers:
+        container.close()
+    for thread in threads:
+        thread.join(5)
+
+    worker_cpu = None
+    if in_workers and None not in workers_before + workers_after:
+        worker_cpu = sum(workers_after) - sum(workers_before)
+    reads = [latency for samples in latencies for latency in samples]
+    return {
+        "mb_per_s": delivered / MEGABYTE / args.seconds,
+        "main_cpu_seconds": (times_after.user + times_after.system) - (times_before.user + times_before.system),
+        "worker_cpu_seconds": worker_cpu,
+        "main_rss_mb": _megabytes([main_memory[0]]),
+        "worker_rss_mb": _megabytes([rss for rss, _ in worker_memory]) if in_workers else None,
+        "worker_pss_mb": _megabytes([pss for _, pss in worker_memory]) if in_workers else None,
+        "tick_lateness_ms": summarize(lateness),
+        "read_ms": summarize(reads),
+        "worker_restarts": sum(getattr(container.stream, "restarts", 0) for container in containers),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=5, help="seconds read before measuring")
+    parser.add_argument("--quality", default="720p")
+    parser.add_argument("--transport", choices=["hls", "http"], default="hls")
+    parser.add_argument("--bitrate-scale", type=float, default=2.0, help="multiplies the simulated bitrates")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    import workers
+    if not workers.available:
+        sys.exit("Worker processes need multiprocessing.shared_memory, Python 3.8 or later")
+
+    simulator, address = start_simulator()
+    try:
+        results = {
+            "environment": environment(),
+            "streams": args.streams,
+            "cpus": os.cpu_count(),
+            "in_process": run_mode(address, args, False),
+            "workers": run_mode(address, args, True),
+        }
+    finally:
+        simulator.terminate()
+        simulator.wait()
+    write_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Helpers shared by the benchmark scripts."""
+
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+
+
+def use_offscreen_platform():
+    """Makes Qt render offscreen unless a platform was explicitly requested."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+def percentile(samples, pct):
+    """Returns the pct:th percentile of samples using linear interpolation."""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(samples, scale=1000.0):
+    """Summarizes timing samples in seconds, scaled to milliseconds by default."""
+    scaled = [sample * scale for sample in samples]
+    return {
+        "runs": len(scaled),
+        "mean": sum(scaled) / len(scaled) if scaled else 0.0,
+        "min": min(scaled) if scaled else 0.0,
+        "p50": percentile(scaled, 50),
+        "p90": percentile(scaled, 90),
+        "p99": percentile(scaled, 99),
+        "max": max(scaled) if scaled else 0.0,
+    }
+
+
+def write_results(results, output=None):
+    """Writes the results as JSON to output, or stdout if none is given."""
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+def environment():
+    """Describes what the results were measured on, so results of different
+    commits and machines can be told apart."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def process_memory(pid):
+    """Returns the RSS and PSS of a process in bytes from /proc, None where
+    unknown."""
+    fields = {}
+    for path in ("/proc/{}/smaps_rollup".format(pid), "/proc/{}/status".format(pid)):
+        try:
+            with open(path, "r") as f:
+                for line in f:
+                    name, _, value = line.partition(":")
+                    if value.strip().endswith("kB"):
+                        fields.setdefault(name, int(value.split()[0]) * 1024)
+        except OSError:
+            continue
+    return fields.get("Rss", fields.get("VmRSS")), fields.get("Pss")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_simulator():
+    """Starts the stream simulator in a subprocess, so it does not count
+    towards the measured process. Returns the process and its address."""
+    port = _free_port()
+    process = subprocess.Popen([sys.executable, "-m", "sim", "--port", str(port)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process, "127.0.0.1:{}".format(port)
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("The simulator did not start")
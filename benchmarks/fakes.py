@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Stand-ins for libVLC and streamlink so containers can be driven without
+either, as the libVLC read callback would drive them."""
+
+import ctypes
+
+
+class FakeMedia:
+    def release(self):
+        pass
+
+
+class FakeVlcInstance:
+    """Only provides what StreamContainer needs from a vlc.Instance."""
+
+    def media_new_callbacks(self, *args):
+        return FakeMedia()
+
+
+class FakeStream:
+    """A stream that returns length bytes from a fixed payload on every read."""
+
+    def __init__(self, payload=b"\x47" * 188 * 1024):
+        self.payload = payload
+
+    def read(self, length):
+        return self.payload[:length]
+
+    def close(self):
+        pass
+
+
+class FakeStreamOption:
+    """Stands in for a streamlink stream, opening a FakeStream."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or FakeStream()
+
+    def open(self):
+        return self.stream
+
+
+def fake_streams(quality="best", stream=None):
+    """Returns a streamlink style quality to stream mapping."""
+    return {quality: FakeStreamOption(stream)}
+
+
+def vlc_buffer(length):
+    """Returns a buffer typed the way libVLC hands it to the read callback."""
+    return ctypes.cast(ctypes.create_string_buffer(length), ctypes.POINTER(ctypes.c_char))
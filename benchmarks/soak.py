@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""Runs the whole application for hours against the local stream simulator
+and fails if memory, objects or threads keep growing.
+
+    python -m benchmarks.soak [--duration SECONDS] [--tiles N] [--interval SECONDS]
+        [--sample-interval SECONDS] [--warmup SECONDS] [--seed N] [--no-tracemalloc]
+        [--max-rss-growth MB] [--max-traced-growth MB] [--max-object-growth N]
+        [--max-thread-growth N] [--output FILE]
+
+The window runs on the offscreen Qt platform with real libVLC players, in an
+empty working directory so the user's config, history and session are left
+alone. Every interval one operation is done on the grid, the way a user would:
+adding streams until there are N tiles, then deleting, swapping, rewinding
+(and closing the rewound window again) and changing the quality of random
+tiles.
+
+Every sample holds the resident memory, CPU usage, thread count, the number
+of Python objects, the memory traced by tracemalloc and how many containers
+and frames are alive. Growth is measured from the first sample after the
+warmup, when the buffers have filled, to the mean of the last three samples.
+The results are written as JSON and the exit status is 1 if any growth
+exceeds its limit, or if containers outlive their frames.
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import environment, use_offscreen_platform, write_results
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MEGABYTE = 1024 * 1024
+
+
+def _count_instances(classes):
+    """Returns how many objects of each class are alive, by class name."""
+    counts = {cls.__name__: 0 for cls in classes}
+    for obj in gc.get_objects():
+        for cls in classes:
+            if isinstance(obj, cls):
+                counts[cls.__name__] += 1
+    return counts
+
+
+class Soak:
+    """Drives the grid of a window with random operations and samples the
+    process every sample_interval seconds."""
+
+    def __init__(self, window, server, args):
+        from containers import LiveStreamContainer, RewoundStreamContainer
+        from sim import QUALITIES
+        from videoframes import LiveVideoFrame, RewoundVideoFrame
+
+        self.window = window
+        self.server = server
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.qualities = [quality for quality, _, _ in QUALITIES]
+        self.classes = [LiveStreamContainer, RewoundStreamContainer, LiveVideoFrame, RewoundVideoFrame]
+        self.operations = {}
+        self.added = 0
+        self.failed = 0
+        self.samples = []
+        self.start = time.monotonic()
+        self._last_cpu = None
+
+    @property
+    def frames(self):
+        return self.window.grid.videoframes
+
+    def step(self):
+        """Does one operation on the grid."""
+        # Streams that are still resolving count as tiles
+        pending = self.added - self.failed - len(self.frames) - self.operations.get("delete", 0)
+        if len(self.frames) + pending < self.args.tiles:
+            self._do("add")
+        elif self.frames:
+            self._do(self.random.choice(["delete", "swap", "rewind", "quality"]))
+
+    def _do(self, operation):
+        getattr(self, "_" + operation)()
+        self.operations[operation] = self.operations.get(operation, 0) + 1
+
+    def _add(self):
+        self.added += 1
+        url = self.server.url("tile{}".format(self.added))
+        self.window.add_new_stream(url, self.qualities)
+
+    def on_fail_add_stream(self, err, args):
+        """Counts a stream that could not be added, instead of asking the user."""
+        self.failed += 1
+        self.window.hide_loading_gif()
+
+    def _delete(self):
+        frame = self.random.choice(self.frames)
+        if frame.rewound is not None:
+            frame.rewound.close()
+        frame.delete_stream()
+
+    def _swap(self):
+        if len(self.frames) < 2:
+            return
+        first, second = self.random.sample(self.frames, 2)
+        first.select()
+        second.select()
+
+    def _rewind(self):
+        frame = self.random.choice(self.frames)
+        if frame.rewound is None:
+            frame.rewind()
+        else:
+            # Closing the window releases the rewound player
+            frame.rewound.close()
+
+    def _quality(self):
+        frame = self.random.choice(self.frames)
+        others = [quality for quality in frame.stream.all_qualities if quality != frame.stream.quality]
+        if others:
+            frame.change_stream_quality(self.random.choice(others))
+
+    def sample(self):
+        """Records the state of the process."""
+        from utils import process_stats
+
+        gc.collect()
+        stats = process_stats()
+        now = time.monotonic()
+        cpu = stats.pop("cpu_seconds")
+        if self._last_cpu is not None:
+            stats["cpu_percent"] = 100.0 * (cpu - self._last_cpu[1]) / (now - self._last_cpu[0])
+        self._last_cpu = (now, cpu)
+
+        stats["elapsed_seconds"] = now - self.start
+        stats["objects"] = len(gc.get_objects())
+        stats["traced_bytes"] = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        stats["tiles"] = len(self.frames)
+        stats["rewound_windows"] = sum(1 for frame in self.frames if frame.rewound is not None)
+        stats["instances"] = _count_instances(self.classes)
+        self.samples.append(stats)
+
+    def leaked_containers(self, sample):
+        """Returns how many containers are alive without a frame playing them."""
+        instances = sample["instances"]
+        return (instances["LiveStreamContainer"] - sample["tiles"]) + \
+            (instances["RewoundStreamContainer"] - sample["rewound_windows"])
+
+
+def growth(samples, warmup, key):
+    """Returns how much the value of key grew from the first sample after the
+    warmup to the mean of the last three samples, or None without enough
+    samples or values."""
+    settled = [sample[key] for sample in samples
+               if sample["elapsed_seconds"] >= warmup and sample.get(key) is not None]
+    if len(settled) < 2:
+        return None
+    last = settled[-3:] if len(settled) > 3 else settled[1:]
+    return sum(last) / len(last) - settled[0]
+
+
+def evaluate(soak, args):
+    """Returns the growth of every measure and the limits that were exceeded."""
+    limits = {
+        "resident_memory_bytes": args.max_rss_growth * MEGABYTE,
+        "traced_bytes": args.max_traced_growth * MEGABYTE,
+        "objects": args.max_object_growth,
+        "threads": args.max_thread_growth,
+    }
+    growths = {key: growth(soak.samples, args.warmup, key) for key in limits}
+    failures = [
+        "{} grew by {:.0f}, the limit is {:.0f}".format(key, growths[key], limit)
+        for key, limit in sorted(limits.items())
+        if growths[key] is not None and growths[key] > limit
+    ]
+    leaked = soak.leaked_containers(soak.samples[-1]) if soak.samples else 0
+    if leaked > 0:
+        failures.append("{} containers outlived their frames".format(leaked))
+    return growths, leaked, failures
+
+
+def run(args):
+    use_offscreen_platform()
+    # Imports below must come from the repository, not the working directory
+    sys.path.insert(0, REPO_ROOT)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # The application looks up its ui files and plugins relative to the working directory
+        for name in ("ui", "sim"):
+            os.symlink(os.path.join(REPO_ROOT, name), os.path.join(workdir, name))
+        os.chdir(workdir)
+
+        if not args.no_tracemalloc:
+            tracemalloc.start()
+
+        from PyQt5 import QtCore, QtWidgets
+        from config import cfg
+        from constants import CONFIG_BUFFER_STREAM
+        from main import ApplicationWindow
+        from sim import SimulatorServer
+
+        app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+        # Rewinding needs the buffer
+        cfg[CONFIG_BUFFER_STREAM] = True
+        cfg.dump()
+
+        server = SimulatorServer(port=0).start()
+        window = ApplicationWindow()
+        window.load_in_background()
+
+        soak = Soak(window, server, args)
+        # Nobody is there to close a message box
+        window.fail_add_stream.disconnect(window.on_fail_add_stream)
+        window.fail_add_stream.connect(soak.on_fail_add_stream)
+        operation_timer = QtCore.QTimer()
+        operation_timer.timeout.connect(soak.step)
+        operation_timer.start(int(args.interval * 1000))
+        sample_timer = QtCore.QTimer()
+        sample_timer.timeout.connect(soak.sample)
+        sample_timer.start(int(args.sample_interval * 1000))
+        QtCore.QTimer.singleShot(int(args.duration * 1000), app.quit)
+
+        soak.sample()
+        app.exec_()
+        operation_timer.stop()
+        sample_timer.stop()
+        soak.sample()
+
+        window.model.history.close()
+        server.stop()
+        os.chdir(REPO_ROOT)
+
+    growths, leaked, failures = evaluate(soak, args)
+    return {
+        "environment": environment(),
+        "duration": args.duration,
+        "tiles": args.tiles,
+        "seed": args.seed,
+        "operations": soak.operations,
+        "failed_adds": soak.failed,
+        "requests": server.requests,
+        "growth": growths,
+        "leaked_containers": leaked,
+        "failures": failures,
+        "passed": not failures,
+        "samples": soak.samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=3600, help="seconds to run for")
+    parser.add_argument("--tiles", type=int, default=4, help="streams kept on the grid")
+    parser.add_argument("--interval", type=float, default=5, help="seconds between two operations")
+    parser.add_argument("--sample-interval", type=float, default=60, help="seconds between two samples")
+    parser.add_argument("--warmup", type=float, default=300, help="seconds before growth is measured")
+    parser.add_argument("--seed", type=int, default=0, help="seeds the operations")
+    parser.add_argument("--no-tracemalloc", action="store_true",
+                        help="don't trace allocations, which slows every Python call down")
+    parser.add_argument("--max-rss-growth", type=float, default=100, help="in megabytes")
+    parser.add_argument("--max-traced-growth", type=float, default=25, help="in megabytes")
+    parser.add_argument("--max-object-growth", type=int, default=20000)
+    parser.add_argument("--max-thread-growth", type=int, default=4)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = run(args)
+    write_results(results, args.output)
+    for failure in results["failures"]:
+        print("Soak test failed: " + failure, file=sys.stderr)
+    sys.exit(0 if results["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
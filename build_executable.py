@@ -1,6 +1,11 @@
 from cx_Freeze import setup, Executable
 import sys
 
+from compile_ui import compile_ui_files
+
+# Ship precompiled ui modules so the frozen app never parses .ui XML.
+compile_ui_files()
+
 # Dependencies are automatically detected, but it might need
 # fine tuning.
 buildOptions = dict(
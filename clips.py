@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""Cuts clips out of the MPEG-TS data in the buffer of a live stream.
+
+Clips are stream copies: the packets of the buffer are written as they are,
+starting at the first packet of a keyframe, with the PAT and PMT in front so
+players can decode the clip from its first byte. Times are taken from the
+PTS of the video frames, counted back from the newest frame in the buffer.
+"""
+
+import os
+import re
+import time
+from collections import namedtuple
+
+from constants import CLIP_DIR, RECORD_EXTENSION, RECORD_PACKET_SIZE
+from utils import atomic_write
+
+_SYNC_BYTE = 0x47
+_PAT_PID = 0x0000
+# Stream types of the PMT
+_H264 = 0x1b
+_HEVC = 0x24
+_PTS_WRAP = 1 << 33
+CLOCK = 90000
+
+# A video frame starting at byte offset, with its unwrapped PTS
+Frame = namedtuple("Frame", ["offset", "pts", "keyframe"])
+
+
+class ClipError(Exception):
+    """Raised when the buffer holds nothing a clip can be cut from."""
+
+
+def _sync(data, offset):
+    """Returns the offset of the next packet at or after offset, or -1."""
+    size = RECORD_PACKET_SIZE
+    offset = data.find(b"\x47", offset)
+    while offset != -1:
+        # One sync byte can be chance, three in a row at packet distance are not
+        if all(data[offset + i * size] == _SYNC_BYTE for i in range(1, 3) if offset + i * size < len(data)):
+            return offset
+        offset = data.find(b"\x47", offset + 1)
+    return -1
+
+
+def _pts(data, offset):
+    return (((data[offset] >> 1) & 0x07) << 30 | data[offset + 1] << 22 | (data[offset + 2] >> 1) << 15 |
+            data[offset + 3] << 7 | data[offset + 4] >> 1)
+
+
+def _is_h264_keyframe(header):
+    # An IDR slice or SPS
+    return header & 0x1f in (5, 7)
+
+
+def _is_hevc_keyframe(header):
+    # An IRAP picture
+    return 16 <= (header >> 1) & 0x3f <= 21
+
+
+# Tells keyframes from the first byte of the NAL unit header, by stream type
+_KEYFRAME_NALS = {
+    _H264: _is_h264_keyframe,
+    _HEVC: _is_hevc_keyframe,
+}
+
+
+def _is_keyframe_nal(payload, stream_type):
+    """Looks for a keyframe NAL unit in the start of a frame of the stream
+    type. Streams of other types only have the random access indicator."""
+    is_keyframe = _KEYFRAME_NALS.get(stream_type)
+    if is_keyframe is None:
+        return False
+    start = payload.find(b"\x00\x00\x01")
+    while start != -1 and start + 3 < len(payload):
+        if is_keyframe(payload[start + 3]):
+            return True
+        start = payload.find(b"\x00\x00\x01", start + 3)
+    return False
+
+
+def _pmt_pid(data, payload):
+    """Returns the PID of the first program's PMT in a PAT packet, or None."""
+    section = payload + 1 + data[payload]
+    end = min(section + 3 + (((data[section + 1] & 0x0f) << 8) | data[section + 2]) - 4,
+              payload + RECORD_PACKET_SIZE - 4)
+    for entry in range(section + 8, end - 3, 4):
+        program = (data[entry] << 8) | data[entry + 1]
+        if program != 0:
+            return ((data[entry + 2] & 0x1f) << 8) | data[entry + 3]
+    return None
+
+
+def _stream_types(data, payload, end):
+    """Returns the stream types of the elementary streams in a PMT packet, by PID."""
+    section = payload + 1 + data[payload]
+    end = min(section + 3 + (((data[section + 1] & 0x0f) << 8) | data[section + 2]) - 4, end)
+    entry = section + 12 + (((data[section + 10] & 0x0f) << 8) | data[section + 11])
+    types = {}
+    while entry + 5 <= end:
+        types[((data[entry + 1] & 0x1f) << 8) | data[entry + 2]] = data[entry]
+        entry += 5 + (((data[entry + 3] & 0x0f) << 8) | data[entry + 4])
+    return types
+
+
+def index(data):
+    """Finds the video frames and the PSI packets in MPEG-TS data.
+
+    The NAL units of a frame are only looked at once the whole data is
+    indexed, with the stream types of the newest PMT, so frames before the
+    first PMT are told apart too.
+
+    Returns:
+        tuple: The frames in stream order, and the newest PAT and PMT packets
+            as bytes (empty if the data holds none).
+    """
+    size = RECORD_PACKET_SIZE
+    # Frames as (offset, pts, random access, pid, start of the payload)
+    found = []
+    stream_types = {}
+    pat = pmt = b""
+    pmt_pid = None
+    last_pts = None
+    wraps = 0
+
+    offset = _sync(data, 0)
+    while offset != -1 and offset + size <= len(data):
+        if data[offset] != _SYNC_BYTE:
+            offset = _sync(data, offset + 1)
+            continue
+
+        flags = data[offset + 1]
+        pid = ((flags & 0x1f) << 8) | data[offset + 2]
+        if flags & 0x40:
+            # The payload unit starts in this packet
+            control = data[offset + 3] >> 4
+            payload = offset + 4
+            random_access = False
+            if control & 0x2:
+                adaptation = data[offset + 4]
+                random_access = adaptation > 0 and bool(data[offset + 5] & 0x40)
+                payload += 1 + adaptation
+
+            if pid == _PAT_PID:
+                pat = data[offset:offset + size]
+                pmt_pid = _pmt_pid(data, payload)
+            elif pid == pmt_pid:
+                pmt = data[offset:offset + size]
+                stream_types = _stream_types(data, payload, offset + size)
+            elif (payload + 14 <= offset + size and data[payload:payload + 3] == b"\x00\x00\x01" and
+                    0xe0 <= data[payload + 3] <= 0xef and data[payload + 7] & 0x80):
+                # A video PES packet with a PTS
+                pts = _pts(data, payload + 9) + wraps * _PTS_WRAP
+                if last_pts is not None and last_pts - pts > _PTS_WRAP // 2:
+                    wraps += 1
+                    pts += _PTS_WRAP
+                last_pts = pts
+                found.append((offset, pts, random_access, pid, payload + 9 + data[payload + 8]))
+        offset += size
+
+    frames = [
+        Frame(offset, pts, random_access or _is_keyframe_nal(data[start:offset + size], stream_types.get(pid)))
+        for offset, pts, random_access, pid, start in found
+    ]
+    return frames, pat + pmt
+
+
+def cut(data, start, end=0.0):
+    """Returns the clip from start to end seconds before the newest frame.
+
+    The clip starts at the last keyframe at or before start, so it can be a
+    little longer than asked for, and ends before the first frame after end.
+
+    Raises:
+        ClipError: If there is no keyframe to start the clip at.
+    """
+    frames, psi = index(data)
+    return _cut(data, frames, psi, start, end)
+
+
+def _first_keyframe(frames, start):
+    """Returns the last keyframe at or before start seconds before the
+    newest frame, or the first keyframe if there is none, or None."""
+    start_pts = max(frame.pts for frame in frames) - start * CLOCK
+    first = None
+    for frame in frames:
+        if frame.keyframe:
+            if first is not None and frame.pts > start_pts:
+                break
+            first = frame
+    return first
+
+
+def _cut(data, frames, psi, start, end):
+    if not frames:
+        raise ClipError("The buffer holds no video frames")
+    first = _first_keyframe(frames, start)
+    if first is None:
+        raise ClipError("The buffer holds no keyframe")
+    end_pts = max(frame.pts for frame in frames) - end * CLOCK
+
+    last = next((frame.offset for frame in frames if frame.offset > first.offset and frame.pts > end_pts), None)
+    if last is None:
+        # Up to the last complete packet
+        last = first.offset + (len(data) - first.offset) // RECORD_PACKET_SIZE * RECORD_PACKET_SIZE
+    return psi + data[first.offset:last]
+
+
+def cut_chunks(chunks, start, end=0.0):
+    """Like cut(), on a list of buffered chunks. Only the newest chunks the
+    clip needs are joined and indexed: the newest 16 first, then as many as
+    their bitrate suggests, at least twice as many every time, until the
+    clip's keyframe and the PSI are among them."""
+    count = min(len(chunks), 16)
+    while True:
+        data = b"".join(chunks[len(chunks) - count:])
+        frames, psi = index(data)
+        if count == len(chunks):
+            break
+        estimate = 0
+        if frames:
+            newest = max(frame.pts for frame in frames)
+            first = _first_keyframe(frames, start)
+            # Only a keyframe at or before the start shows the window reaches back far enough
+            if psi and first is not None and first.pts <= newest - start * CLOCK:
+                break
+            span = newest - min(frame.pts for frame in frames)
+            if span:
+                # With some room for the keyframe before the start
+                estimate = int(count * start * CLOCK / span * 1.25)
+        count = min(len(chunks), max(count * 2, estimate))
+    return _cut(data, frames, psi, start, end)
+
+
+def clip_path(name, directory=CLIP_DIR):
+    """Returns a new file path for a clip of the stream."""
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+    return os.path.join(directory, "{}-{}{}".format(name, stamp, RECORD_EXTENSION))
+
+
+def export_clip(chunks, path, start, end=0.0):
+    """Writes the clip from start to end seconds before the newest frame of
+    the buffered chunks to path. Meant to run on a worker thread, on a
+    snapshot of the buffer.
+
+    Returns:
+        int: The size of the clip in bytes.
+
+    Raises:
+        ClipError: If the chunks hold no clip.
+        OSError: If the clip could not be written.
+    """
+    clip = cut_chunks(chunks, start, end)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    atomic_write(path, clip)
+    return len(clip)
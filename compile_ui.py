@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Compiles all Qt Designer files in ui/ into Python modules.
+
+The generated modules are picked up by uiloader.load_ui, which avoids parsing
+the .ui XML at runtime. Rerun this whenever a .ui file changes; stale modules
+are ignored until then.
+"""
+
+import glob
+import os
+
+from PyQt5 import uic
+
+from constants import UI_COMPILED_DIR, UI_DIR
+from uiloader import compiled_module_path
+
+
+def compile_ui_files(ui_dir=UI_DIR):
+    """Compiles every .ui file in ui_dir and returns the generated paths."""
+    os.makedirs(UI_COMPILED_DIR, exist_ok=True)
+
+    compiled = []
+    for ui_file in sorted(glob.glob(os.path.join(ui_dir, "*.ui"))):
+        module_path = compiled_module_path(ui_file)
+        with open(ui_file, "r") as src, open(module_path, "w") as dst:
+            uic.compileUi(src, dst)
+        compiled.append(module_path)
+
+    return compiled
+
+
+if __name__ == "__main__":
+    for path in compile_ui_files():
+        print("Compiled " + path)
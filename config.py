@@ -1,20 +1,170 @@
+import copy
+import inspect
 import json
-from constants import CONFIG_FILE, CONFIG_DEFAULT_VALUES
+import os
+import sys
+import threading
+import weakref
+from typing import NamedTuple
+
+from constants import (
+    CONFIG_FILE, CONFIG_DEFAULT_VALUES, CONFIG_MUTE, CONFIG_QUALITY,
+    CONFIG_BUFFER_STREAM, CONFIG_BUFFER_SIZE, CONFIG_READ_INSTRUMENTATION,
+    CONFIG_METRICS_ENABLED, CONFIG_METRICS_ADDRESS, CONFIG_METRICS_PORT,
+    CONFIG_RECORD_DIR, CONFIG_RECORD_MAX_SIZE, CONFIG_WORKER_PROCESSES, CONFIG_AUDIO_FOCUS,
+    CONFIG_VERSION, CONFIG_VERSION_KEY, CONFIG_SAVE_DELAY, CONFIG_QUALITY_DELIMITER_SPLIT
+)
+from utils import atomic_write
+
+
+def _freeze(value):
+    """Returns an immutable version of a config value."""
+    return tuple(value) if isinstance(value, list) else value
+
+
+# An immutable copy of all config values, read as attributes named like the keys
+ConfigSnapshot = NamedTuple("ConfigSnapshot", [
+    (key, type(_freeze(value))) for key, value in sorted(CONFIG_DEFAULT_VALUES.items())
+])
+
+
+def _is_bool(value):
+    return isinstance(value, bool)
+
+
+def _is_int(value, low, high):
+    # bool is a subclass of int, but true is not a valid size
+    return isinstance(value, int) and not isinstance(value, bool) and low <= value <= high
+
+
+# Validates the value of every config key, invalid values are replaced by the default
+SCHEMA = {
+    CONFIG_MUTE: _is_bool,
+    CONFIG_QUALITY: lambda value: isinstance(value, list) and all(isinstance(q, str) for q in value),
+    CONFIG_BUFFER_STREAM: _is_bool,
+    CONFIG_BUFFER_SIZE: lambda value: _is_int(value, 1, 100000),
+    CONFIG_READ_INSTRUMENTATION: _is_bool,
+    CONFIG_METRICS_ENABLED: _is_bool,
+    CONFIG_METRICS_ADDRESS: lambda value: isinstance(value, str),
+    CONFIG_METRICS_PORT: lambda value: _is_int(value, 1, 65535),
+    CONFIG_RECORD_DIR: lambda value: isinstance(value, str) and bool(value),
+    CONFIG_RECORD_MAX_SIZE: lambda value: _is_int(value, 1, 10 ** 8),
+    CONFIG_WORKER_PROCESSES: _is_bool,
+    CONFIG_AUDIO_FOCUS: _is_bool,
+}
+
+
+def _migrate_1(values):
+    """Version 1 files were written before the version key, some by hand with
+    the quality priority as a single comma separated string."""
+    quality = values.get(CONFIG_QUALITY)
+    if isinstance(quality, str):
+        values[CONFIG_QUALITY] = [q.strip() for q in quality.split(CONFIG_QUALITY_DELIMITER_SPLIT)]
+    return values
+
+
+# Upgrades the values of a file of the version to the next version
+MIGRATIONS = {
+    1: _migrate_1,
+}
+
+
+def validate(values):
+    """Migrates parsed config values to CONFIG_VERSION and checks them against
+    the schema.
+
+    Returns:
+        tuple: The valid values, with defaults for missing and invalid keys,
+            and a list of the keys that were invalid.
+
+    Raises:
+        ValueError: If the values are not an object or the version is not a number.
+    """
+    if not isinstance(values, dict):
+        raise ValueError("The config is not a JSON object")
+    values = dict(values)
+    version = values.pop(CONFIG_VERSION_KEY, 1)
+    # Files of newer versions are read as far as this version understands them
+    if not isinstance(version, int) or isinstance(version, bool) or version < 1:
+        raise ValueError("Invalid config version: {!r}".format(version))
+    while version < CONFIG_VERSION:
+        values = MIGRATIONS[version](values)
+        version += 1
+
+    valid = copy.deepcopy(CONFIG_DEFAULT_VALUES)
+    invalid = []
+    for key, value in values.items():
+        if key not in SCHEMA:
+            continue
+        if SCHEMA[key](value):
+            valid[key] = value
+        else:
+            invalid.append(key)
+    return valid, invalid
+
+
+# Parsed config files by path, with the modification time and size they were parsed at
+_parsed = {}
+
+
+def read_config(path):
+    """Reads and validates the config file, reusing the last result while the
+    file has not been modified. Exceptions are not handled.
+
+    Returns:
+        tuple: See validate().
+    """
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _parsed.get(path)
+    if cached is None or cached[0] != key:
+        with open(path, mode='r') as f:
+            cached = (key, validate(json.load(f)))
+        _parsed[path] = cached
+    values, invalid = cached[1]
+    return copy.deepcopy(values), list(invalid)
+
+
+def write_config(path, values):
+    """Atomically replaces the config file, so a crash while writing leaves
+    either the old or the new file. Exceptions are not handled."""
+    data = dict(values)
+    data[CONFIG_VERSION_KEY] = CONFIG_VERSION
+    atomic_write(path, json.dumps(data, indent=4, sort_keys=True))
 
 
 class _Config:
-    def __init__(self):
+    """The config values, backed by a JSON file.
+
+    Args:
+        path (str): The config file.
+        save_delay (float): Seconds save() waits for more changes before writing.
+    """
+
+    def __init__(self, path=CONFIG_FILE, save_delay=CONFIG_SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
         self._values = None
+        self._snapshot = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._save_timer = None
 
         try:
             self.load()
         except FileNotFoundError:
-            print("No config file found, creating one...")
-            self._values = CONFIG_DEFAULT_VALUES
+            print("No config file found, creating one...", file=sys.stderr)
+            self._values = copy.deepcopy(CONFIG_DEFAULT_VALUES)
             self.dump()
-        except json.decoder.JSONDecodeError:
-            print("There was an error while loading config, using default config instead.")
-            self._values = CONFIG_DEFAULT_VALUES
+        except ValueError:
+            # Keep the broken file around instead of overwriting it on the next save
+            print("There was an error while loading config, using default config instead. "
+                  "The broken config was moved to " + self.path + ".bad", file=sys.stderr)
+            self._values = copy.deepcopy(CONFIG_DEFAULT_VALUES)
+            try:
+                os.replace(self.path, self.path + ".bad")
+            except OSError:
+                pass
 
     def __getitem__(self, key):
         if key in self._values:
@@ -23,17 +173,88 @@ class _Config:
             raise ValueError("Tried to access config value that does not exist: " + key)
 
     def __setitem__(self, key, value):
+        if key not in SCHEMA:
+            raise ValueError("Tried to set config value that does not exist: " + key)
+        if not SCHEMA[key](value):
+            raise ValueError("Invalid value for config value {}: {!r}".format(key, value))
         self._values[key] = value
+        self._snapshot = None
+
+    def snapshot(self):
+        """Returns a ConfigSnapshot of the current values.
+
+        Reading an attribute of the snapshot is far cheaper than a lookup
+        through __getitem__, so hot paths should keep a snapshot around and
+        subscribe to get a new one when the config is saved.
+        """
+        if self._snapshot is None:
+            self._snapshot = ConfigSnapshot(**{
+                key: _freeze(self[key]) for key in ConfigSnapshot._fields
+            })
+        return self._snapshot
+
+    def subscribe(self, callback):
+        """Calls callback(snapshot) with a new snapshot every time the config
+        is saved. Bound methods are only weakly referenced, so subscribing
+        does not keep their object alive."""
+        if inspect.ismethod(callback):
+            self._subscribers.append(weakref.WeakMethod(callback))
+        else:
+            self._subscribers.append(lambda: callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers = [ref for ref in self._subscribers if ref() not in (None, callback)]
+
+    def _publish(self):
+        """Pushes the current snapshot to all live subscribers."""
+        snapshot = self.snapshot()
+        # Callbacks may subscribe and unsubscribe, so they run on a copy
+        for ref in list(self._subscribers):
+            callback = ref()
+            if callback is not None:
+                callback(snapshot)
+        self._subscribers = [ref for ref in self._subscribers if ref() is not None]
 
     def load(self):
         """Loads the config file. Exceptions are not handled"""
-        with open(CONFIG_FILE, mode='r') as f:
-            self._values = json.load(f)
+        self._values, invalid = read_config(self.path)
+        for key in invalid:
+            print("Invalid config value for '{}', using the default instead.".format(key), file=sys.stderr)
+        self._snapshot = None
+
+    def save(self):
+        """Notifies the subscribers and writes the config file once no more
+        changes have been saved for save_delay seconds."""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+        self._publish()
+
+    def flush(self):
+        """Writes a pending save to the config file right away."""
+        with self._lock:
+            if self._save_timer is None:
+                return
+            self._save_timer.cancel()
+            self._save_timer = None
+            values = copy.deepcopy(self._values)
+        try:
+            write_config(self.path, values)
+        except OSError as e:
+            print("Could not dump config file: " + str(e), file=sys.stderr)
 
     def dump(self):
-        """Dumps the config to the config file. Exceptions are not handled"""
-        with open(CONFIG_FILE, mode='w+') as f:
-            json.dump(self._values, f)
+        """Dumps the config to the config file and notifies the subscribers.
+        Exceptions are not handled"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+        write_config(self.path, self._values)
+        self._publish()
 
 
 cfg = _Config()
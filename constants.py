@@ -15,28 +15,126 @@ QUALITY_SETTINGS = 'qualityOptionsLineEdit'
 MUTE_SETTINGS = 'muteStreamsCheckBox'
 ADD_NEW_SCHEDULED_STREAM = "AddNewScheduledStream"
 LOAD_STREAM_HISTORY = 'LoadStreamsFromHistory'
-BUTTON_PLAY = 'QPushButton#pause_button {background-color: transparent; border-image: url(ui/res/pause2.png); background: none; border: none; background-repeat: none;}'
-BUTTON_PAUSE = 'QPushButton#pause_button {background-color: transparent; border-image: url(ui/res/play1.png); background: none; border: none; background-repeat: none;}'
+PAUSE_ICON = 'ui/res/pause2.png'
+PLAY_ICON = 'ui/res/play1.png'
 CONFIG_FILE = 'config.json'
+CONFIG_VERSION_KEY = 'version'
+CONFIG_VERSION = 2
+# Seconds to wait for more changes before the config file is written
+CONFIG_SAVE_DELAY = 1.0
 CONFIG_MUTE = 'mute'
 CONFIG_QUALITY = 'quality'
 CONFIG_BUFFER_STREAM = 'buffer_stream'
 CONFIG_BUFFER_SIZE = 'buffer_size'
+CONFIG_READ_INSTRUMENTATION = 'read_instrumentation'
+CONFIG_METRICS_ENABLED = 'metrics_enabled'
+CONFIG_METRICS_ADDRESS = 'metrics_address'
+CONFIG_METRICS_PORT = 'metrics_port'
+CONFIG_RECORD_DIR = 'record_dir'
+# Disk usage cap of all recordings, in megabytes
+CONFIG_RECORD_MAX_SIZE = 'record_max_size'
+# Read every stream in a worker process of its own, see workers.py
+CONFIG_WORKER_PROCESSES = 'worker_processes'
+# Only decode the audio of the focused frame, see audio.py
+CONFIG_AUDIO_FOCUS = 'audio_focus'
 CONFIG_DEFAULT_VALUES = {
     CONFIG_MUTE: False,
     CONFIG_QUALITY: ["720p", "480p", "360p", "160p"],
     CONFIG_BUFFER_STREAM: True,
-    CONFIG_BUFFER_SIZE: 100
+    CONFIG_BUFFER_SIZE: 100,
+    CONFIG_READ_INSTRUMENTATION: True,
+    CONFIG_METRICS_ENABLED: False,
+    CONFIG_METRICS_ADDRESS: "127.0.0.1",
+    CONFIG_METRICS_PORT: 9405,
+    CONFIG_RECORD_DIR: "recordings",
+    CONFIG_RECORD_MAX_SIZE: 10240,
+    CONFIG_WORKER_PROCESSES: False,
+    CONFIG_AUDIO_FOCUS: True
 }
-FRAME_SELECT_STYLE = """QFrame
-                        {
-                            border-style: outset;
-                            border-width: 2px;
-                            border-color: blue;
-                        }
-                        """
+# Dynamic property styled by ui/styles.qss
+FRAME_SELECTED_PROPERTY = 'selected'
+# Plain text history of older versions, imported into the database once
 HISTORY_FILE = 'history.txt'
+HISTORY_DB_FILE = 'history.db'
+# Seconds the history writer waits to batch more plays into one transaction
+HISTORY_FLUSH_INTERVAL = 2.0
+HISTORY_SEARCH_LIMIT = 10
+SESSION_FILE = 'session.json'
+SESSION_VERSION = 1
+SESSION_SAVE_INTERVAL_MS = 30000
+# Streams resolved at the same time when restoring a session
+SESSION_RESTORE_WORKERS = 8
+METRICS_INTERVAL_MS = 1000
+# Milliseconds between two checks of the audio tracks of the frames
+AUDIO_FOCUS_INTERVAL_MS = 500
+OVERLAY_REFRESH_MS = 1000
+# Upper bounds in seconds of the read callback histogram buckets
+READ_LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+READ_COPY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05)
+# Every n:th read callback is timed into the read histograms
+READ_PROBE_SAMPLE_EVERY = 8
 
+# A read callback blocking for at least this many seconds counts as a stall
+STALL_THRESHOLD = 1.0
+RESOLVER_CACHE_TTL = 30
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+STATS_OVERLAY = 'StatsOverlay'
+READ_INSTRUMENTATION = 'ReadInstrumentation'
+# A dropped frame alarm needs at least this many and this share of the
+# pictures of one sampling interval to be lost
+DROPPED_FRAMES_ALARM_MIN = 5
+DROPPED_FRAMES_ALARM_RATIO = 0.1
+RECENT_STREAMS_LIMIT = 30
+# The local stream simulator, see sim/
+SIM_SCHEME = 'sim://'
+SIM_ADDRESS = '127.0.0.1'
+SIM_PORT = 9480
+SIM_PLUGIN_DIR = 'sim/plugins'
+# libVLC messages below this level (0 debug, 2 notice, 3 warning, 4 error) are dropped
+VLC_LOG_MIN_LEVEL = 3
+VLC_LOG_MESSAGE_MAX = 1024
+VLC_LOG_RING_SIZE = 200
+# Distinct messages counted per stream between two flushes
+VLC_LOG_PENDING_MAX = 50
+VLC_LOG_FLUSH_MS = 5000
+# Streams whose logs are kept for dumping, closed ones included
+VLC_LOG_KEEP = 32
+VLC_LOG_DUMP_FILE = 'vlc-log.txt'
+DUMP_VLC_LOGS = 'DumpVlcLogs'
+RECORD_ALL_STREAMS = 'RecordAllStreams'
+NEW_WINDOW = 'NewWindow'
+AUDIO_FOCUS = 'AudioFocus'
+RECORD_DIR = 'recordings'
+RECORD_EXTENSION = '.ts'
+# Recordings are cut into files of this many seconds, on packet boundaries
+RECORD_SEGMENT_SECONDS = 600
+RECORD_PACKET_SIZE = 188
+# Chunks waiting for the writer before new ones are dropped, about 100 MB of 32 kB reads
+RECORD_QUEUE_CHUNKS = 3200
+RECORD_WRITE_BUFFER = 4 * 1024 * 1024
+# Bytes the headless recorder reads from a stream at a time
+HEADLESS_READ_SIZE = 65536
+# Seconds the headless recorder waits before reconnecting, doubled after every failed attempt
+HEADLESS_RECONNECT_DELAY = 1.0
+HEADLESS_RECONNECT_MAX_DELAY = 60.0
+# Shared memory ring between a worker process and the read callback of its stream
+WORKER_RING_SIZE = 8 * 1024 * 1024
+WORKER_READ_SIZE = 65536
+# Seconds between checks whether a worker is still alive while waiting for its data
+WORKER_POLL_INTERVAL = 0.1
+# Seconds a worker gets to exit when its stream is closed, before it is terminated
+WORKER_STOP_TIMEOUT = 2.0
+# Restarts of a worker that keeps exiting without delivering anything before the stream is given up
+WORKER_MAX_RESTARTS = 5
+CLIP_DIR = 'clips'
+CLIP_DEFAULT_SECONDS = 30
+
+UI_DIR = 'ui'
+MAIN_UI_FILE = 'ui/main.ui'
+FRAME_UI_FILE = 'ui/frame.ui'
+REWOUND_FRAME_UI_FILE = 'ui/rewoundframe.ui'
 SETTINGS_UI_FILE = 'ui/settings_dialog.ui'
+UI_COMPILED_DIR = 'ui/compiled'
+UI_COMPILED_SUFFIX = '_ui.py'
 CONFIG_QUALITY_DELIMITER_SPLIT = ","
 CONFIG_QUALITY_DELIMITER_JOIN = ", "
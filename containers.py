@@ -1,11 +1,20 @@
 # -*- coding: utf-8 -*-
 import ctypes
+import itertools
+import time
 from abc import ABC, abstractmethod
 from collections import deque
 
 import callbacks as cb
-from constants import CONFIG_BUFFER_SIZE, CONFIG_BUFFER_STREAM
+import workers
 from config import cfg
+from constants import STALL_THRESHOLD
+from metrics import ReadProbe
+from recorder import Recorder, recording_name
+
+
+def _skip_copy(buf, data):
+    pass
 
 
 class StreamContainer(ABC):
@@ -13,13 +22,18 @@ class StreamContainer(ABC):
     neccesary functions for libVLC playback.
 
     Args:
-        vlc_instance (libvlc_instance_t*): The vlc instance.
+        vlc_instance (libvlc_instance_t*): The vlc instance, or None for a
+            container nothing plays, which has no media.
         stream_info (dict): Holds information about stream url and stream quality.
 
     Attributes:
         media (libvlc_media_t*): The media object that vlc uses, includes callbacks.
     """
     def __init__(self, vlc_instance):
+        if vlc_instance is None:
+            self.media = None
+            return
+
         # Cast this container to a c pointer to use in the callbacks
         self._opaque = ctypes.cast(ctypes.pointer(
             ctypes.py_object(self)), ctypes.c_void_p)
@@ -75,17 +89,44 @@ class LiveStreamContainer(StreamContainer):
 
     Add attribute on_stream_end() to bind a callback for when the stream has ended.
     Note: Do not try to remove this Container in that callback, as it will not work.
+
+    While recording, everything read from the stream is also written to disk,
+    see start_recording(). With worker processes enabled in the config, the
+    stream is read by a worker process, see workers.py.
+
+    The container also counts what passes through it for the metrics, see
+    counters(), gauges() and histograms().
     """
 
-    def __init__(self, vlc_instance, url, streams, quality, buffer_length=cfg[CONFIG_BUFFER_SIZE]):
+    # Gives every container a stream id that stays the same for its lifetime
+    _ids = itertools.count(1)
+
+    def __init__(self, vlc_instance, url, streams, quality, buffer_length=None, config=None):
 
         super().__init__(vlc_instance)
+        # The read path only looks at this snapshot, which is replaced
+        # whenever the config is saved
+        self.config = config or cfg.snapshot()
+        cfg.subscribe(self.on_config_changed)
         # Use default value for buffer_length if none specified
         if not buffer_length:
-            buffer_length = cfg[CONFIG_BUFFER_SIZE]
+            buffer_length = self.config.buffer_size
         self.streams = streams
-        self.stream = self.streams[quality].open()
+        self.stream = self._open_stream(url, quality)
+        self.buffer_length = buffer_length
         self.buffer = deque(maxlen=buffer_length)
+        self.buffer_bytes = 0
+
+        self.id = next(LiveStreamContainer._ids)
+        self.read_calls = 0
+        self.bytes_requested = 0
+        self.bytes_read = 0
+        # Counted whether the probe is enabled or not
+        self.stalls = 0
+        self.reconnects = 0
+        self.quality_switches = 0
+        self.probe = ReadProbe()
+        self.recorder = None
 
         self.update_info(url, quality)
 
@@ -93,16 +134,77 @@ class LiveStreamContainer(StreamContainer):
         """Called by libVLC upon opening the media. Not currently used."""
         return 0
 
+    def _open_stream(self, url, quality):
+        """Opens the stream of the quality, in a worker process if the config
+        asks for it and shared memory is available."""
+        if self.config.worker_processes and workers.available:
+            return workers.WorkerStream(url, quality, self.streams.get(quality), self.config.quality)
+        return self.streams[quality].open()
+
     def read(self, buf, length):
         """Called by libVLC upon requesting more data.
 
         Reads 'length' video data directly from the stream, as well as caches
         it away in the buffer accordingly.
         """
+        self.read_calls += 1
+        self.bytes_requested += length
+
+        start = time.perf_counter()
+        data = self._fetch(length)
+        fetched = time.perf_counter()
+        if fetched - start >= STALL_THRESHOLD:
+            self.stalls += 1
+        if ReadProbe.enabled:
+            self.probe.measure(self._copy, buf, data, start, fetched)
+        else:
+            self._copy(buf, data)
+
+        data_len = len(data)
+        self.bytes_read += data_len
+        return data_len
+
+    def pull(self, length):
+        """Reads like read() does, for readers other than libVLC, e.g. the
+        headless recorder, which have no buffer to copy into.
+
+        Returns:
+            bytes: Up to 'length' bytes, empty once the stream has ended.
+        """
+        self.read_calls += 1
+        self.bytes_requested += length
+
+        start = time.perf_counter()
+        data = self._fetch(length)
+        fetched = time.perf_counter()
+        if fetched - start >= STALL_THRESHOLD:
+            self.stalls += 1
+        if ReadProbe.enabled:
+            self.probe.measure(_skip_copy, None, data, start, fetched)
+
+        self.bytes_read += len(data)
+        return data
+
+    def _fetch(self, length):
+        """Reads 'length' data from the stream and caches it in the buffer."""
         data = self.stream.read(length)
-        if cfg[CONFIG_BUFFER_STREAM]:
-            self.buffer.append(data)
         data_len = len(data)
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.write(data)
+        config = self.config
+        if config.buffer_stream:
+            # A new buffer size is applied here, on the thread that appends
+            if self.buffer.maxlen != self.buffer_length:
+                self._resize_buffer(self.buffer_length)
+            if len(self.buffer) == self.buffer.maxlen:
+                self.buffer_bytes -= len(self.buffer[0])
+            self.buffer.append(data)
+            self.buffer_bytes += data_len
+        elif self.buffer:
+            # Buffering was turned off, let the buffered data go
+            self.buffer.clear()
+            self.buffer_bytes = 0
 
         # if the stream has ended invoke on_stream_end
         if data_len == 0:
@@ -111,24 +213,107 @@ class LiveStreamContainer(StreamContainer):
             except AttributeError:
                 pass
 
+        return data
+
+    def _resize_buffer(self, buffer_length):
+        """Replaces the buffer with one of the new length, keeping the newest
+        data. Growing the buffer keeps all of it."""
+        self.buffer = deque(self.buffer, maxlen=buffer_length)
+        self.buffer_bytes = sum(len(data) for data in self.buffer)
+
+    @staticmethod
+    def _copy(buf, data):
+        """Copies the data into the libVLC buffer."""
         for i, val in enumerate(data):
             buf[i] = val
 
-        return len(data)
-
     def seek(self, offset):
         """Called by libVLC upon seeking in the media."""
         return 0
 
     def close(self):
-        """Called by libVLC upon closing the media."""
+        """Called by libVLC upon closing the media, which it also does on every
+        stop of the player, e.g. before a reload or quality change. A
+        recording goes on until stop_recording() is called, and the container
+        keeps getting config snapshots until it is garbage collected."""
         self.stream.close()
         return 0
 
+    def on_config_changed(self, config):
+        """Called with a new ConfigSnapshot when the config has been saved.
+
+        The read callback picks up buffering and buffer size changes on its
+        next call, so the buffer is never touched from two threads.
+        """
+        if config.buffer_size != self.config.buffer_size:
+            self.buffer_length = config.buffer_size
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.max_bytes = config.record_max_size * 1024 * 1024
+        self.config = config
+
+    @property
+    def recording(self):
+        return self.recorder is not None
+
+    def start_recording(self):
+        """Starts writing what is read from the stream to the recordings
+        directory of the config."""
+        if self.recorder is None:
+            self.recorder = Recorder(
+                recording_name(self.id, self.url),
+                self.config.record_dir,
+                max_bytes=self.config.record_max_size * 1024 * 1024
+            )
+
+    def stop_recording(self):
+        """Stops recording. What has been read is written to disk in the
+        background, see recorder.join_all()."""
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.stop()
+
+    @property
+    def buffer_fill(self):
+        """How full the buffer is, in percent."""
+        return 100.0 * len(self.buffer) / self.buffer.maxlen
+
+    def counters(self):
+        """Returns the ever growing counters of the container."""
+        return {
+            "read_calls": self.read_calls,
+            "bytes_requested": self.bytes_requested,
+            "bytes_read": self.bytes_read,
+            "stalls": self.stalls,
+            "reconnects": self.reconnects,
+            "quality_switches": self.quality_switches,
+            "recorded_bytes": self.recorder.bytes_written if self.recorder is not None else 0,
+            "recording_dropped_chunks": self.recorder.dropped_chunks if self.recorder is not None else 0,
+            "worker_restarts": getattr(self.stream, "restarts", 0),
+        }
+
+    def gauges(self):
+        """Returns the current state of the buffer."""
+        return {
+            "buffer_fill": self.buffer_fill,
+            "buffer_bytes": self.buffer_bytes,
+        }
+
+    def histograms(self):
+        """Returns snapshots of the histograms of the container."""
+        return self.probe.histograms()
+
     @staticmethod
     def quality_options(streams):
         return sorted(streams.keys())
 
+    def preferred_quality(self, priority):
+        """Returns the first quality in priority the stream offers, or None."""
+        for quality in priority:
+            if quality in self.streams:
+                return quality
+        return None
+
     def update_info(self, url, quality):
         """Updates the current quality as well as available qualities of
         the stream.
@@ -138,16 +323,27 @@ class LiveStreamContainer(StreamContainer):
 
         self.all_qualities = LiveStreamContainer.quality_options(self.streams)
 
-    def change_stream_quality(self, quality):
-        """Changes the streams quality."""
+    def _reopen(self, quality):
+        """Closes the current stream and opens the one of the quality."""
         self.stream.close()
-        self.stream = self.streams[quality].open()
+        self.stream = self._open_stream(self.url, quality)
         self.buffer.clear()
+        self.buffer_bytes = 0
+        # The new stream starts over, give it its own file
+        if self.recorder is not None:
+            self.recorder.rotate()
 
         self.quality = quality
 
+    def change_stream_quality(self, quality):
+        """Changes the streams quality."""
+        self._reopen(quality)
+        self.quality_switches += 1
+
     def refresh(self):
-        self.change_stream_quality(self.quality)
+        """Reconnects to the stream in the current quality."""
+        self._reopen(self.quality)
+        self.reconnects += 1
 
 
 class RewoundStreamContainer(StreamContainer):
@@ -1,15 +1,20 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+# Imported first so that the time spent on the imports below is measured.
+from profiling import profiler, LAUNCH_TIME
+
+import argparse
+import logging
 import sys
 import textwrap
 import threading
+import time
 
 from datetime import datetime
 
-import streamlink
 # Qt imports
-from PyQt5 import QtWidgets, uic, QtCore, QtGui
+from PyQt5 import QtWidgets, QtCore, QtGui
 from PyQt5.QtWidgets import QDialog
 
 from config import cfg
@@ -19,40 +24,142 @@ from constants import (
     CONFIG_QUALITY, CONFIG_BUFFER_STREAM, CONFIG_BUFFER_SIZE,
     SETTINGS_MENU, BUTTONBOX, QUALITY_SETTINGS, MUTE_SETTINGS,
     RECORD_SETTINGS, BUFFER_SIZE, ADD_NEW_SCHEDULED_STREAM,
-    LOAD_STREAM_HISTORY, SETTINGS_UI_FILE,
-    CONFIG_QUALITY_DELIMITER_SPLIT, CONFIG_QUALITY_DELIMITER_JOIN
+    LOAD_STREAM_HISTORY, SETTINGS_UI_FILE, MAIN_UI_FILE, RECENT_STREAMS_LIMIT,
+    CONFIG_QUALITY_DELIMITER_SPLIT, CONFIG_QUALITY_DELIMITER_JOIN,
+    STATS_OVERLAY, CONFIG_METRICS_ENABLED, CONFIG_METRICS_ADDRESS,
+    CONFIG_METRICS_PORT, READ_INSTRUMENTATION, CONFIG_READ_INSTRUMENTATION,
+    DUMP_VLC_LOGS, VLC_LOG_DUMP_FILE, VLC_LOG_FLUSH_MS, HISTORY_SEARCH_LIMIT,
+    SESSION_SAVE_INTERVAL_MS, RECORD_ALL_STREAMS, CONFIG_WORKER_PROCESSES,
+    NEW_WINDOW, AUDIO_FOCUS, CONFIG_AUDIO_FOCUS
 )
 
+from audio import AudioFocusManager
 from containers import LiveStreamContainer
 from enums import AddStreamError
+from metrics import ReadProbe
+from metricsserver import MetricsServer
 from models import StreamModel, VideoFrameCoordinates
+import recorder
+import session
+from statscollector import MediaStatsCollector
+from uiloader import load_ui
+from utils import MostRecentlyUsed, process_stats
 from videoframegrid import VideoFrameGrid
+from videoframes import libvlc
+from vlclog import bridge as vlc_log_bridge
+import workers
+
+profiler.record("import", LAUNCH_TIME, time.perf_counter())
+
+
+class _FirstFrameFilter(QtCore.QObject):
+    """Records the first time the watched window is painted."""
+
+    def __init__(self, window):
+        super(_FirstFrameFilter, self).__init__(window)
+        self.painted = threading.Event()
+        window.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Paint and not self.painted.is_set():
+            profiler.record("first frame", LAUNCH_TIME, time.perf_counter())
+            self.painted.set()
+            obj.removeEventFilter(self)
+        return False
 
 
 class ApplicationWindow(QtWidgets.QMainWindow):
-    """The main GUI window."""
+    """The main GUI window.
+
+    More windows, e.g. one per monitor of a wall, are opened from the first
+    one. They share its resolver, history, stats collector, audio focus and
+    metrics server, so streamlink and libVLC are only loaded once, and frames can be
+    moved between the grids of the windows.
+
+    Args:
+        primary (ApplicationWindow): The first window, None for the first window.
+    """
 
     # Define a new signal, used to add_frames from the separate thread
     add_frame = QtCore.pyqtSignal(str, dict, str, VideoFrameCoordinates)
     # Used when the add stream thread fails
     fail_add_stream = QtCore.pyqtSignal(AddStreamError, tuple)
 
-    def __init__(self):
+    @profiler.span("window init")
+    def __init__(self, primary=None):
         super(ApplicationWindow, self).__init__(None)
+        self.primary = primary or self
+        # All open windows, in the order they were opened
+        self.windows = self.primary.windows if primary is not None else []
+        self.windows.append(self)
+        self.first_frame = _FirstFrameFilter(self)
         self.setup_ui()
 
         # Connect threading signals
         self.add_frame.connect(self.setup_videoframe)
         self.fail_add_stream.connect(self.on_fail_add_stream)
 
-        self.model = StreamModel(self.grid)
+        if primary is not None:
+            self.model = StreamModel(self.grid, primary.model.resolver, primary.model.history)
+            self.grid.audio_focus = primary.audio_focus
+            self.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+            self.setWindowTitle("{} - Window {}".format(primary.windowTitle(), len(self.windows)))
+            return
+
+        with profiler.span("model"):
+            self.model = StreamModel(self.grid)
+
+        self.stats_collector = MediaStatsCollector(self, self.videoframes)
+        self.stats_collector.alarm.connect(self.on_stream_alarm)
+
+        self.audio_focus = AudioFocusManager(self, self.videoframes, enabled=cfg[CONFIG_AUDIO_FOCUS])
+        self.grid.audio_focus = self.audio_focus
+
+        self.session_autosaver = session.SessionAutosaver(self, SESSION_SAVE_INTERVAL_MS)
+
+        self.vlc_log_timer = QtCore.QTimer(self)
+        self.vlc_log_timer.timeout.connect(vlc_log_bridge.flush)
+        self.vlc_log_timer.start(VLC_LOG_FLUSH_MS)
+
+        self.metrics_server = None
+        if cfg[CONFIG_METRICS_ENABLED]:
+            self.start_metrics_server(cfg[CONFIG_METRICS_ADDRESS], cfg[CONFIG_METRICS_PORT])
+
+    def start_metrics_server(self, address, port):
+        """Starts serving the metrics over HTTP on the address and port."""
+        try:
+            self.metrics_server = MetricsServer(
+                address,
+                port,
+                sources=[process_stats, self.model.resolver_stats, self.audio_focus.stats]
+            ).start()
+        except OSError as e:
+            print("Could not start the metrics server: " + str(e))
+
+    def load_in_background(self):
+        """Starts loading streamlink and libVLC, call once the window is up."""
+        self.model.load_session()
+        libvlc.start()
+
+    def wait_until_loaded(self):
+        """Blocks until the window has been painted and everything started by
+        load_in_background is loaded."""
+        self.first_frame.painted.wait()
+        for load in (lambda: self.model.streamlink_session, libvlc.get):
+            try:
+                load()
+            except Exception:
+                # Errors are reported once the value is actually used
+                pass
 
     def setup_ui(self):
         """Loads the main.ui file and sets up the window and grid."""
 
-        self.ui = uic.loadUi("ui/main.ui", self)
-        with open("ui/styles.qss", "r") as f:
-            self.setStyleSheet(f.read())
+        with profiler.span("ui load"):
+            self.ui = load_ui(MAIN_UI_FILE, self)
+        with profiler.span("stylesheet"):
+            with open("ui/styles.qss", "r") as f:
+                self.setStyleSheet(f.read())
         self.grid = VideoFrameGrid(self)
 
         self.container = self.ui.findChild(QtCore.QObject, "container")
@@ -70,22 +177,59 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.__bind_view_to_action(IMPORT_STREAMS_FROM_CLIPBOARD, self.import_streams_from_clipboard)
         self.__bind_view_to_action(SETTINGS_MENU, self.show_settings)
         self.__bind_view_to_action(LOAD_STREAM_HISTORY, self.stream_history)
+        self.__bind_view_to_action(STATS_OVERLAY, self.grid.set_stats_overlay_visible, toggled=True)
+        # Keep the shortcut working while the menu bar is hidden in fullscreen
+        self.addAction(self.ui.findChild(QtCore.QObject, STATS_OVERLAY))
+        ReadProbe.set_enabled(cfg[CONFIG_READ_INSTRUMENTATION])
+        self.ui.findChild(QtCore.QObject, READ_INSTRUMENTATION).setChecked(ReadProbe.enabled)
+        self.__bind_view_to_action(READ_INSTRUMENTATION, ReadProbe.set_enabled, toggled=True)
+        self.__bind_view_to_action(DUMP_VLC_LOGS, self.dump_vlc_logs)
+        self.__bind_view_to_action(RECORD_ALL_STREAMS, self.grid.set_recording, toggled=True)
+        self.__bind_view_to_action(NEW_WINDOW, self.open_window)
+        self.ui.findChild(QtCore.QObject, AUDIO_FOCUS).setChecked(cfg[CONFIG_AUDIO_FOCUS])
+        self.__bind_view_to_action(AUDIO_FOCUS, self.set_audio_focus, toggled=True)
 
         self.recent_menu = self.ui.findChild(QtCore.QObject, "menuRecent")
+        self.recent_actions = MostRecentlyUsed(RECENT_STREAMS_LIMIT)
 
         # Create the loading gear but dont add it to anywhere, just save it
         self.setup_loading_gif()
 
-        self.ui.show()
+        with profiler.span("show"):
+            self.ui.show()
 
     def setup_videoframe(self, stream_url, stream_options, stream_quality):
         """Sets up a videoframe and with the provided stream information."""
         self.model.add_new_videoframe(stream_url, stream_options, stream_quality)
+        self.primary.session_autosaver.enabled = True
         # Remove the loading feedback
         self.hide_loading_gif()
         # Update recent meny option
-        self.update_recent()
+        self.update_recent(stream_url)
+
+    def videoframes(self):
+        """Returns the frames of all windows."""
+        return [videoframe for window in self.windows for videoframe in window.grid.videoframes]
+
+    def open_window(self):
+        """Opens another window with a grid of its own."""
+        return ApplicationWindow(self.primary)
+
+    def closeEvent(self, event):
+        """Closing the first window closes the others, closing any other one
+        stops its streams."""
+        if self.primary is self:
+            # The session holds every window, so it is saved before they close
+            self.session_autosaver.finish()
+            for window in self.windows[1:]:
+                window.close()
+        else:
+            for videoframe in list(self.grid.videoframes):
+                videoframe.delete_stream()
+            self.windows.remove(self)
+        super(ApplicationWindow, self).closeEvent(event)
 
+    @profiler.span("loading gif")
     def setup_loading_gif(self):
         """Creates the loading gear as QMovie and its label."""
         self.movie = QtGui.QMovie(self)
@@ -111,6 +255,20 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         """Toggles the audio of all the players."""
         is_mute_checked = self.actions[MUTE_CHECKBOX].isChecked()
         self.model.mute_all_streams(is_mute_checked)
+        # Muted streams don't need their audio decoded
+        self.primary.audio_focus.update()
+
+    def set_audio_focus(self, enabled):
+        """Decodes the audio of the focused frame only, or of all frames."""
+        self.primary.audio_focus.set_enabled(enabled)
+        # The setting is shared, so the menus of all windows show it
+        for window in self.windows:
+            action = window.ui.findChild(QtCore.QObject, AUDIO_FOCUS)
+            blocked = action.blockSignals(True)
+            action.setChecked(enabled)
+            action.blockSignals(blocked)
+        cfg[CONFIG_AUDIO_FOCUS] = enabled
+        cfg.save()
 
     def export_streams_to_clipboard(self):
         """Exports all streams to the users clipboard."""
@@ -128,7 +286,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
     def show_settings(self):
         """Shows a dialog containing settings for DSW"""
         self.dialog = QDialog(self)
-        self.dialog.ui = uic.loadUi(SETTINGS_UI_FILE, self.dialog)
+        self.dialog.ui = load_ui(SETTINGS_UI_FILE, self.dialog)
         self.dialog.setAttribute(QtCore.Qt.WA_DeleteOnClose)
         self.dialog.findChild(QtCore.QObject, BUTTONBOX) \
             .accepted.connect(self.generate_conf)
@@ -155,25 +313,28 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         cfg[CONFIG_MUTE] = self.dialog.findChild(QtCore.QObject, MUTE_SETTINGS).isChecked()
         cfg[CONFIG_BUFFER_SIZE] = self.dialog.findChild(QtCore.QObject, BUFFER_SIZE).value()
 
-        QtWidgets.QMessageBox.critical(
-            self,
-            "Caution",
-            "Some of your changes may require a restart in order to take effect."
-        )
+        # Saving pushes the new settings to the running streams right away,
+        # the file is written once the settings have stopped changing
+        cfg.save()
 
-        try:
-            cfg.dump()
-        except IOError:
-            print("Could not dump config file.")
-
-    def update_recent(self):
-        """Updates the recent menu option."""
-        self.recent_menu.clear()
-        # Only the 30 recently added streams are shown
-        for url in self.grid.url_list[:30]:
-            action = QtWidgets.QAction(url, parent=self)
-            action.triggered.connect(self.add_stream_from_history(action.text()))
-            self.recent_menu.addAction(action)
+    def update_recent(self, stream_url):
+        """Moves the stream to the top of the recent menu option."""
+        newest = self.recent_actions.newest()
+        if newest == stream_url:
+            return
+
+        action = self.recent_actions.get(stream_url)
+        if action is None:
+            action = QtWidgets.QAction(stream_url, parent=self)
+            action.triggered.connect(self.add_stream_from_history(stream_url))
+        else:
+            self.recent_menu.removeAction(action)
+        self.recent_menu.insertAction(self.recent_actions.get(newest), action)
+
+        # Only the most recently added streams are shown
+        for _, evicted_action in self.recent_actions.add(stream_url, action):
+            self.recent_menu.removeAction(evicted_action)
+            evicted_action.deleteLater()
 
     def add_stream_from_history(self, stream_url):
         def func():
@@ -190,11 +351,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
     def add_new_stream(self, stream_url=None, stream_qualities=None):
         """Adds a new player for the specified stream in the grid."""
         if not stream_url:
-            stream_url, ok = QtWidgets.QInputDialog.getText(
-                self,
-                "Stream input",
-                "Enter the stream URL:"
-            )
+            stream_url, ok = self._get_stream_url()
 
             if not ok:
                 return
@@ -213,6 +370,28 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         # Also helps a lot with lag
         threading.Thread(target=self._add_new_stream, args=(stream_url, stream_qualities)).start()
 
+    def _get_stream_url(self):
+        """Asks the user for a stream url, suggesting streams from the history
+        that start with what has been typed."""
+        dialog = QtWidgets.QInputDialog(self)
+        dialog.setWindowTitle("Stream input")
+        dialog.setLabelText("Enter the stream URL:")
+        # Creates the line edit
+        dialog.setInputMode(QtWidgets.QInputDialog.TextInput)
+        line_edit = dialog.findChild(QtWidgets.QLineEdit)
+
+        suggestions = QtCore.QStringListModel(self.model.history.recent(HISTORY_SEARCH_LIMIT), dialog)
+        completer = QtWidgets.QCompleter(suggestions, dialog)
+        # The history already did the matching, scheme and www. left out
+        completer.setCompletionMode(QtWidgets.QCompleter.UnfilteredPopupCompletion)
+        line_edit.setCompleter(completer)
+        line_edit.textEdited.connect(
+            lambda text: suggestions.setStringList(self.model.history.search(text, HISTORY_SEARCH_LIMIT))
+        )
+
+        ok = dialog.exec_() == QDialog.Accepted
+        return dialog.textValue(), ok
+
     def add_new_scheduled_stream(self, stream_url=None, stream_qualities=None):
         """Schedules a new stream at given time"""
         if not stream_url:
@@ -239,7 +418,6 @@ class ApplicationWindow(QtWidgets.QMainWindow):
 
         # Add stream after certain delay (factory function)
         def schedule_stream():
-            self.model.save_stream_to_history(stream_url)
             self._add_new_stream(stream_url, stream_qualities)
 
         try:
@@ -265,8 +443,13 @@ class ApplicationWindow(QtWidgets.QMainWindow):
 
     def _add_new_stream(self, stream_url, stream_qualities):
         """Fetches qualities and if possible adds a frame to the main window."""
+        # Imported here as loading streamlink is deferred until after startup
+        import streamlink
+
         try:
+            resolve_start = time.perf_counter()
             stream_options = self.model.get_stream_options(stream_url)
+            resolve_seconds = time.perf_counter() - resolve_start
 
             # If the stream is not currently broadcasting, 'stream_options'
             # will be an empty list.
@@ -290,7 +473,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
             self.add_frame.emit(stream_url, stream_options, available_qualities[0], self.model.grid.coordinates)
 
             # Save url to stream history
-            self.model.save_stream_to_history(stream_url)
+            self.model.save_stream_to_history(stream_url, available_qualities[0], resolve_seconds)
 
         except streamlink.exceptions.NoPluginError:
             self.fail_add_stream.emit(
@@ -348,6 +531,18 @@ class ApplicationWindow(QtWidgets.QMainWindow):
                 )
             )
 
+    def on_stream_alarm(self, videoframe, message):
+        """Reports playback problems detected by the stats collector."""
+        print("Warning: " + message)
+
+    def dump_vlc_logs(self):
+        """Writes the recent libVLC log entries of the streams to a file."""
+        try:
+            vlc_log_bridge.dump(VLC_LOG_DUMP_FILE)
+            print("libVLC logs written to " + VLC_LOG_DUMP_FILE)
+        except OSError as e:
+            print("Error: could not write the libVLC logs: " + str(e))
+
     def on_fail_add_stream(self, err, args):
         # Remove the loading feedback
         self.hide_loading_gif()
@@ -391,14 +586,103 @@ class ApplicationWindow(QtWidgets.QMainWindow):
 
     def stream_history(self):
         """Starts streaming all streams that were playing when last session was closed."""
+        if self.restore_session():
+            return
         if self.model.stream_history:
             for stream in self.model.stream_history:
                 self.add_new_stream(stream)
 
+    def restore_session(self):
+        """Restores the streams and layout saved when the app last ran.
+
+        Returns:
+            bool: False if there was no saved session to restore.
+        """
+        saved = session.load()
+        if saved is None:
+            return False
+        restorer = session.SessionRestorer(self, saved)
+        restorer.finished.connect(self.on_session_restored)
+        restorer.start()
+        return True
+
+    def on_session_restored(self, restored, seconds):
+        print("Restored {} streams in {:.1f} seconds".format(restored, seconds))
+
+
+def report_startup(app, window, args):
+    """Reports the startup profile as requested by the command line
+    arguments, once all background loading has finished."""
+    def wait_and_report():
+        window.wait_until_loaded()
+        profiler.record("startup", LAUNCH_TIME, time.perf_counter())
+
+        if args.profile_startup:
+            print(profiler.report())
+        if args.trace_startup:
+            profiler.dump(args.trace_startup)
+        if args.quit_after_startup:
+            QtCore.QMetaObject.invokeMethod(app, "quit", QtCore.Qt.QueuedConnection)
+
+    threading.Thread(target=wait_and_report, daemon=True).start()
+
 
 def main():
-    app = QtWidgets.QApplication([])
+    parser = argparse.ArgumentParser(description="Watch multiple streams at the same time.")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="print how long each phase of the startup took"
+    )
+    parser.add_argument(
+        "--trace-startup",
+        metavar="FILE",
+        help="write the startup spans as JSON to FILE"
+    )
+    parser.add_argument(
+        "--quit-after-startup",
+        action="store_true",
+        help="exit once startup has finished, used for benchmarking"
+    )
+    parser.add_argument(
+        "--log-level",
+        default="warning",
+        choices=["debug", "info", "warning", "error"],
+        help="lowest level of the log messages that are printed"
+    )
+    parser.add_argument(
+        "--restore-session",
+        action="store_true",
+        help="restore the streams that were open when the app last quit"
+    )
+    args, qt_args = parser.parse_known_args()
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s %(message)s", level=args.log_level.upper())
+    if cfg[CONFIG_WORKER_PROCESSES] and not workers.available:
+        print("Worker processes need Python 3.8 or later and can't run from a frozen build, "
+              "the streams are read in this process instead.")
+
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+    # Write settings that are still waiting to be saved
+    app.aboutToQuit.connect(cfg.flush)
     window = ApplicationWindow()
+    app.aboutToQuit.connect(window.model.history.close)
+    # In case the app quits without closing its first window
+    app.aboutToQuit.connect(window.session_autosaver.finish)
+
+    # Write out what the recordings have queued before their writers are killed
+    def stop_recording():
+        for open_window in window.windows:
+            open_window.grid.set_recording(False)
+        recorder.join_all()
+    app.aboutToQuit.connect(stop_recording)
+
+    # Show the window before loading streamlink and libVLC
+    QtCore.QTimer.singleShot(0, window.load_in_background)
+    if args.restore_session:
+        QtCore.QTimer.singleShot(0, window.restore_session)
+    if args.profile_startup or args.trace_startup or args.quit_after_startup:
+        report_startup(app, window, args)
+
     sys.exit(app.exec_())
 
 
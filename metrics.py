@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""Per stream playback metrics computed from libVLC media statistics.
+
+The libVLC counters (libvlc_media_stats_t) only ever grow, so every stream
+keeps its previous sample around and turns the counters into rates and deltas
+per sampling interval. The module level ``registry`` holds the metrics of all
+streams and can be polled from any thread, e.g.:
+
+    from metrics import registry
+    for stream in registry.snapshot():
+        print(stream["url"], stream["displayed_fps"], stream["dropped_pictures"])
+"""
+
+import bisect
+import threading
+import time
+
+from constants import (
+    DROPPED_FRAMES_ALARM_MIN, DROPPED_FRAMES_ALARM_RATIO, READ_COPY_BUCKETS,
+    READ_LATENCY_BUCKETS, READ_PROBE_SAMPLE_EVERY
+)
+
+# The libvlc_media_stats_t counters that are turned into deltas.
+COUNTER_FIELDS = (
+    "read_bytes", "demux_read_bytes", "demux_corrupted", "demux_discontinuity",
+    "decoded_video", "decoded_audio", "displayed_pictures", "lost_pictures",
+    "played_abuffers", "lost_abuffers",
+)
+
+# libVLC reports bitrates in bytes per microsecond, its info panel also
+# multiplies them by 8000 to show kb/s.
+_BYTES_PER_US_TO_KBPS = 8000.0
+
+# Per thread CPU time is only available from Python 3.7
+_thread_time = getattr(time, "thread_time", None)
+
+
+class Histogram:
+    """A histogram with fixed buckets, cheap enough to observe on hot paths.
+
+    Args:
+        bounds (tuple): Sorted upper bounds of the buckets, a last bucket
+            catches everything above the largest bound.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def snapshot(self):
+        """Returns the cumulative bucket counts, the sum and the count.
+
+        Returns:
+            dict: {"buckets": [[bound, cumulative count], ...], "sum", "count"}
+            where the last bound is float("inf").
+        """
+        counts = list(self.counts)
+        buckets = []
+        total = 0
+        for bound, count in zip(self.bounds + (float("inf"),), counts):
+            total += count
+            buckets.append([bound, total])
+        return {"buckets": buckets, "sum": self.sum, "count": total}
+
+
+class ReadProbe:
+    """Times the libVLC read callbacks of one stream.
+
+    The container times the stream read of every call, which it needs for
+    counting stalls anyway, and hands the probe the times. Every
+    READ_PROBE_SAMPLE_EVERY:th call the probe also times the copy into the
+    libVLC buffer, wall and thread CPU time, and adds the call to the
+    histograms; wall time the copy spent off the CPU was mostly spent waiting
+    for the GIL. Other calls only count, so the histograms hold a sample of
+    the calls. All probes are switched on and off together with
+    set_enabled().
+    """
+
+    enabled = True
+
+    @classmethod
+    def set_enabled(cls, enabled):
+        cls.enabled = enabled
+
+    def __init__(self):
+        self.calls = 0
+        self.latency = Histogram(READ_LATENCY_BUCKETS)
+        self.blocked = Histogram(READ_LATENCY_BUCKETS)
+        self.copy = Histogram(READ_COPY_BUCKETS)
+        self.gil_wait = Histogram(READ_COPY_BUCKETS)
+
+    def measure(self, copy, buf, data, start, fetched):
+        """Calls copy(buf, data), timing it if the call is sampled.
+
+        Args:
+            start (float): time.perf_counter() before the stream read.
+            fetched (float): time.perf_counter() after the stream read.
+        """
+        self.calls += 1
+        if self.calls % READ_PROBE_SAMPLE_EVERY:
+            copy(buf, data)
+            return
+
+        cpu_start = _thread_time() if _thread_time is not None else None
+        copy(buf, data)
+        end = time.perf_counter()
+
+        self.blocked.observe(fetched - start)
+        self.copy.observe(end - fetched)
+        self.latency.observe(end - start)
+        if cpu_start is not None:
+            self.gil_wait.observe(max(0.0, end - fetched - (_thread_time() - cpu_start)))
+
+    def histograms(self):
+        return {
+            "read_latency": self.latency.snapshot(),
+            "read_blocked": self.blocked.snapshot(),
+            "read_copy": self.copy.snapshot(),
+            "read_gil_wait": self.gil_wait.snapshot(),
+        }
+
+
+class StreamMetrics:
+    """Rates and deltas of a single stream, updated from libVLC media stats.
+
+    Args:
+        labels (dict): Describes the stream, e.g. its url and quality.
+    """
+
+    def __init__(self, labels):
+        self.labels = dict(labels)
+        self.values = {}
+        self.histograms = {}
+        self.in_alarm = False
+        self._previous = None
+        self._previous_time = None
+
+    def update(self, stats, now=None, counters=None, gauges=None, histograms=None):
+        """Updates the metrics from a libvlc MediaStats structure, or any
+        object with the same attributes.
+
+        Args:
+            stats (MediaStats): The libVLC media stats.
+            now (float): Time of the sample, defaults to time.monotonic().
+            counters (dict): Other ever growing counters, reported as is and
+                as a rate under the name + '_rate'.
+            gauges (dict): Other values, reported as is.
+            histograms (dict): Histogram snapshots, reported as is.
+
+        Returns:
+            str: A message if a dropped frame spike started, otherwise None.
+        """
+        now = time.monotonic() if now is None else now
+        current = {field: getattr(stats, field) for field in COUNTER_FIELDS}
+        if counters:
+            current.update(counters)
+
+        values = dict(current)
+        values["input_bitrate_kbps"] = stats.input_bitrate * _BYTES_PER_US_TO_KBPS
+        values["demux_bitrate_kbps"] = stats.demux_bitrate * _BYTES_PER_US_TO_KBPS
+
+        if gauges:
+            values.update(gauges)
+
+        if self._previous is None:
+            deltas = {field: 0 for field in current}
+            elapsed = 0.0
+        else:
+            deltas = {}
+            for field, value in current.items():
+                delta = value - self._previous.get(field, 0)
+                # Counters start over when libVLC restarts the input
+                deltas[field] = value if delta < 0 else delta
+            elapsed = now - self._previous_time
+
+        def rate(field):
+            return deltas[field] / elapsed if elapsed > 0 else 0.0
+
+        values["interval"] = elapsed
+        values["read_rate"] = rate("read_bytes")
+        values["decoded_fps"] = rate("decoded_video")
+        values["displayed_fps"] = rate("displayed_pictures")
+        values["dropped_fps"] = rate("lost_pictures")
+        values["dropped_pictures"] = deltas["lost_pictures"]
+        values["lost_audio_buffers"] = deltas["lost_abuffers"]
+        values["corrupted"] = deltas["demux_corrupted"]
+        values["discontinuities"] = deltas["demux_discontinuity"]
+        for field in counters or ():
+            values[field + "_rate"] = rate(field)
+
+        self.values = values
+        if histograms:
+            self.histograms = dict(histograms)
+        self._previous = current
+        self._previous_time = now
+
+        return self._check_dropped_frames(deltas["lost_pictures"], deltas["displayed_pictures"])
+
+    def _check_dropped_frames(self, dropped, displayed):
+        """Raises an alarm when a dropped frame spike starts. A spike lasts
+        as long as the dropped share of the pictures stays too high."""
+        total = dropped + displayed
+        spiking = (dropped >= DROPPED_FRAMES_ALARM_MIN and
+                   dropped >= total * DROPPED_FRAMES_ALARM_RATIO)
+
+        started = spiking and not self.in_alarm
+        self.in_alarm = spiking
+        if not started:
+            return None
+
+        return "{url}: dropped {dropped} of {total} pictures".format(
+            url=self.labels.get("url", "stream"),
+            dropped=dropped,
+            total=total
+        )
+
+    def as_dict(self):
+        result = dict(self.labels)
+        result.update(self.values)
+        result["in_alarm"] = self.in_alarm
+        result["histograms"] = dict(self.histograms)
+        return result
+
+
+class MetricsRegistry:
+    """Holds the metrics of every stream, keyed by any hashable object.
+
+    Updates usually come from the GUI thread while snapshot() may be called
+    from anywhere, so all access goes through a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams = {}
+        self.alarm_handlers = []
+
+    def update(self, key, labels, stats, now=None, counters=None, gauges=None, histograms=None):
+        """Updates the stream from libVLC media stats, creating it if needed,
+        see StreamMetrics.update. Alarm handlers are called with the key and message on dropped frame spikes.
+
+        Returns:
+            str: The alarm message if a dropped frame spike started, otherwise None.
+        """
+        with self._lock:
+            metrics = self._streams.get(key)
+            if metrics is None:
+                metrics = self._streams[key] = StreamMetrics(labels)
+            metrics.labels.update(labels)
+            alarm = metrics.update(stats, now, counters, gauges, histograms)
+
+        if alarm is not None:
+            for handler in self.alarm_handlers:
+                handler(key, alarm)
+        return alarm
+
+    def retain(self, keys):
+        """Forgets every stream not in keys, e.g. after they were deleted."""
+        keys = set(keys)
+        with self._lock:
+            for key in list(self._streams):
+                if key not in keys:
+                    del self._streams[key]
+
+    def get(self, key):
+        """Returns the metrics of a single stream as a dict, or None."""
+        with self._lock:
+            metrics = self._streams.get(key)
+            return metrics.as_dict() if metrics is not None else None
+
+    def snapshot(self):
+        """Returns the metrics of all streams as a list of dicts."""
+        with self._lock:
+            return [metrics.as_dict() for metrics in self._streams.values()]
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""An optional HTTP endpoint serving the metrics for monitoring.
+
+    GET /metrics        Prometheus text exposition format
+    GET /metrics.json   The same values as JSON
+
+The server runs on its own threads and only reads the metrics registry and
+the provided sources, so scraping never touches the GUI thread.
+"""
+
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from constants import METRICS_CONTENT_TYPE
+from metrics import registry
+
+STREAM_LABELS = ("stream_id", "url", "quality")
+
+# (key in the stream metrics, metric name, type, help)
+STREAM_SERIES = (
+    ("bytes_requested", "dsv_stream_bytes_requested_total", "counter",
+     "Bytes asked for by libVLC in read callbacks."),
+    ("bytes_read", "dsv_stream_bytes_read_total", "counter",
+     "Bytes handed to libVLC by the read callback."),
+    ("read_calls", "dsv_stream_read_calls_total", "counter",
+     "Read callbacks made by libVLC."),
+    ("stalls", "dsv_stream_stalls_total", "counter",
+     "Read callbacks that blocked longer than the stall threshold."),
+    ("reconnects", "dsv_stream_reconnects_total", "counter",
+     "Times the stream was reloaded."),
+    ("quality_switches", "dsv_stream_quality_switches_total", "counter",
+     "Times the quality of the stream was changed."),
+    ("recorded_bytes", "dsv_stream_recorded_bytes_total", "counter",
+     "Bytes of the current recording written to disk."),
+    ("recording_dropped_chunks", "dsv_stream_recording_dropped_chunks_total", "counter",
+     "Chunks left out of the current recording because the disk could not keep up."),
+    ("worker_restarts", "dsv_stream_worker_restarts_total", "counter",
+     "Times the worker process of the stream was restarted after exiting early."),
+    ("buffer_bytes", "dsv_stream_buffer_bytes", "gauge",
+     "Memory held by the rewind buffer."),
+    ("buffer_fill", "dsv_stream_buffer_fill_percent", "gauge",
+     "How full the rewind buffer is."),
+    ("input_bitrate_kbps", "dsv_stream_input_bitrate_kbps", "gauge",
+     "Input bitrate reported by libVLC."),
+    ("decoded_fps", "dsv_stream_decoded_fps", "gauge",
+     "Video pictures decoded per second."),
+    ("displayed_fps", "dsv_stream_displayed_fps", "gauge",
+     "Video pictures displayed per second."),
+    ("lost_pictures", "dsv_stream_lost_pictures_total", "counter",
+     "Video pictures dropped by libVLC."),
+    ("lost_abuffers", "dsv_stream_lost_audio_buffers_total", "counter",
+     "Audio buffers dropped by libVLC."),
+)
+
+# (key in the stream histograms, metric name, help)
+STREAM_HISTOGRAMS = (
+    ("read_latency", "dsv_stream_read_latency_seconds",
+     "Time spent in the read callback."),
+    ("read_blocked", "dsv_stream_read_blocked_seconds",
+     "Time the read callback blocked waiting for stream data."),
+    ("read_copy", "dsv_stream_read_copy_seconds",
+     "Time the read callback spent copying into the libVLC buffer."),
+    ("read_gil_wait", "dsv_stream_read_gil_wait_seconds",
+     "Wall time minus CPU time of sampled copies, mostly spent waiting for the GIL."),
+)
+
+# (key in the process values, metric name, type, help)
+PROCESS_SERIES = (
+    ("resident_memory_bytes", "process_resident_memory_bytes", "gauge",
+     "Resident memory size in bytes."),
+    ("cpu_seconds", "process_cpu_seconds_total", "counter",
+     "User and system CPU time spent in seconds."),
+    ("threads", "dsv_threads", "gauge",
+     "Python threads alive."),
+    ("resolver_cache_hits", "dsv_resolver_cache_hits_total", "counter",
+     "Stream resolutions answered from the cache."),
+    ("resolver_cache_misses", "dsv_resolver_cache_misses_total", "counter",
+     "Stream resolutions that had to ask streamlink."),
+    ("resolver_cache_hit_ratio", "dsv_resolver_cache_hit_ratio", "gauge",
+     "Share of stream resolutions answered from the cache."),
+    ("audio_focus_switches", "dsv_audio_focus_switches_total", "counter",
+     "Times the audio focus moved to another stream."),
+    ("audio_decoding_streams", "dsv_audio_decoding_streams", "gauge",
+     "Streams whose audio is decoded."),
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(stream, extra=()):
+    pairs = [(name, stream[name]) for name in STREAM_LABELS if name in stream]
+    pairs.extend(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(name, _escape(value)) for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(data):
+    """Renders the collected metrics in the Prometheus text format."""
+    lines = []
+
+    def header(name, kind, help_text):
+        lines.append("# HELP {} {}".format(name, help_text))
+        lines.append("# TYPE {} {}".format(name, kind))
+
+    streams = data["streams"]
+    for key, name, kind, help_text in STREAM_SERIES:
+        header(name, kind, help_text)
+        for stream in streams:
+            if stream.get(key) is not None:
+                lines.append("{}{} {}".format(name, _labels(stream), _number(stream[key])))
+
+    for key, name, help_text in STREAM_HISTOGRAMS:
+        header(name, "histogram", help_text)
+        for stream in streams:
+            histogram = stream.get("histograms", {}).get(key)
+            if histogram is None:
+                continue
+            for bound, count in histogram["buckets"]:
+                lines.append("{}_bucket{} {}".format(
+                    name, _labels(stream, [("le", _number(bound))]), count
+                ))
+            lines.append("{}_sum{} {}".format(name, _labels(stream), _number(histogram["sum"])))
+            lines.append("{}_count{} {}".format(name, _labels(stream), histogram["count"]))
+
+    process = data["process"]
+    for key, name, kind, help_text in PROCESS_SERIES:
+        if process.get(key) is not None:
+            header(name, kind, help_text)
+            lines.append("{} {}".format(name, _number(process[key])))
+
+    return "\n".join(lines) + "\n"
+
+
+def _json_histogram(histogram):
+    buckets = [[_number(bound) if bound == float("inf") else bound, count]
+               for bound, count in histogram["buckets"]]
+    return dict(histogram, buckets=buckets)
+
+
+def render_json(data):
+    """Renders the collected metrics as JSON. Infinite histogram bounds
+    are written as "+Inf", since JSON has no infinity."""
+    streams = []
+    for stream in data["streams"]:
+        stream = dict(stream)
+        stream["histograms"] = {
+            key: _json_histogram(histogram)
+            for key, histogram in stream.get("histograms", {}).items()
+        }
+        streams.append(stream)
+    return json.dumps({"streams": streams, "process": data["process"]})
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        data = self.server.metrics_server.collect()
+        if self.path == "/metrics":
+            self._respond(render_prometheus(data), METRICS_CONTENT_TYPE)
+        elif self.path == "/metrics.json":
+            self._respond(render_json(data), "application/json")
+        else:
+            self.send_error(404)
+
+    def _respond(self, text, content_type):
+        body = text.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes happen every few seconds, don't spam stderr
+        pass
+
+
+class MetricsServer:
+    """Serves the metrics over HTTP from background threads.
+
+    Args:
+        address (str): Address to bind to, e.g. "127.0.0.1" or "0.0.0.0".
+        port (int): Port to bind to, 0 picks a free one.
+        metrics (MetricsRegistry): Source of the per stream metrics.
+        sources (list): Callables returning dicts of process wide values,
+            merged into the "process" section, e.g. utils.process_stats.
+    """
+
+    def __init__(self, address, port, metrics=registry, sources=()):
+        self.metrics = metrics
+        self.sources = list(sources)
+        self._server = _ThreadingHTTPServer((address, port), _MetricsRequestHandler)
+        self._server.metrics_server = self
+        self._thread = None
+
+    @property
+    def address(self):
+        """The (host, port) the server is bound to."""
+        return self._server.server_address
+
+    def collect(self):
+        """Returns all metrics as a dict with "streams" and "process"."""
+        process = {}
+        for source in self.sources:
+            process.update(source())
+        return {"streams": self.metrics.snapshot(), "process": process}
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="metrics-server",
+            daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -1,4 +1,5 @@
-from models.model import StreamModel
+from models.history import StreamHistory
+from models.model import StreamModel, StreamResolver
 from models.coordinates import VideoFrameCoordinates
 
-__all__ = ['StreamModel', 'VideoFrameCoordinates']
+__all__ = ['StreamHistory', 'StreamModel', 'StreamResolver', 'VideoFrameCoordinates']
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from constants import HISTORY_DB_FILE, HISTORY_FILE, HISTORY_FLUSH_INTERVAL
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS streams (
+    url TEXT PRIMARY KEY,
+    search_key TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    play_count INTEGER NOT NULL DEFAULT 0,
+    last_quality TEXT,
+    resolve_seconds REAL,
+    session REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS streams_search_key ON streams (search_key);
+CREATE INDEX IF NOT EXISTS streams_session ON streams (session);
+"""
+
+# Plays count less the longer ago they were, halving once a week
+_FRECENCY = "play_count / (1.0 + (? - last_seen) / 604800.0)"
+
+
+def search_key(url):
+    """Returns the url without scheme and www., which is what users start typing."""
+    key = url.lower()
+    for prefix in ("https://", "http://"):
+        if key.startswith(prefix):
+            key = key[len(prefix):]
+            break
+    if key.startswith("www."):
+        key = key[len("www."):]
+    return key
+
+
+def _prefix_end(prefix):
+    """Returns the smallest string greater than every string starting with prefix."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class StreamHistory:
+    """Every stream that has been played, in an SQLite database.
+
+    record() only queues the play, a writer thread commits the queued plays
+    in one transaction every flush_interval seconds so the GUI thread never
+    waits for the disk. Queries use their own connection and see the
+    committed plays.
+
+    Args:
+        path (str): The database file.
+        flush_interval (float): Seconds between two batched writes.
+        history_file (str): Plain text history to import and remove, if it exists.
+    """
+
+    def __init__(self, path=HISTORY_DB_FILE, flush_interval=HISTORY_FLUSH_INTERVAL, history_file=HISTORY_FILE):
+        self.path = path
+        self.flush_interval = flush_interval
+        # Plays recorded in this session are told apart from earlier ones by this
+        self.session = time.time()
+
+        self._connection = sqlite3.connect(path)
+        # Lets the writer commit while the GUI thread reads
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+        self._import_history_file(history_file)
+
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, url, quality=None, resolve_seconds=None):
+        """Queues a play of the stream, with the quality it was played in and
+        how long resolving its streams took."""
+        self._queue.put((url, quality, resolve_seconds, time.time()))
+
+    def flush(self):
+        """Blocks until everything recorded so far has been committed."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self):
+        """Commits what has been recorded and stops the writer."""
+        self._queue.put(None)
+        self._writer.join()
+        self._connection.close()
+
+    def search(self, prefix, limit=10):
+        """Returns the urls starting with prefix, scheme and www. left out,
+        played the most and the most recently first."""
+        key = search_key(prefix)
+        if not key:
+            return self.recent(limit)
+        rows = self._connection.execute(
+            "SELECT url FROM streams WHERE search_key >= ? AND search_key < ? "
+            "ORDER BY " + _FRECENCY + " DESC LIMIT ?",
+            (key, _prefix_end(key), time.time(), limit)
+        )
+        return [url for url, in rows]
+
+    def recent(self, limit=10):
+        """Returns the most recently played urls."""
+        rows = self._connection.execute("SELECT url FROM streams ORDER BY last_seen DESC LIMIT ?", (limit,))
+        return [url for url, in rows]
+
+    def last_session(self):
+        """Returns the urls played in the last session before this one."""
+        rows = self._connection.execute(
+            "SELECT url FROM streams WHERE session = "
+            "(SELECT MAX(session) FROM streams WHERE session < ?) ORDER BY last_seen",
+            (self.session,)
+        )
+        return [url for url, in rows]
+
+    def get(self, url):
+        """Returns what is known about the stream as a dict, or None."""
+        cursor = self._connection.execute(
+            "SELECT url, first_seen, last_seen, play_count, last_quality, resolve_seconds "
+            "FROM streams WHERE url = ?",
+            (url,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def _import_history_file(self, history_file):
+        """Moves the streams of the old history file into the database, as
+        plays of an earlier session."""
+        if not os.path.exists(history_file):
+            return
+        with open(history_file, 'r') as f:
+            urls = [line.strip("\n") for line in f if line.strip()]
+        seen = os.path.getmtime(history_file)
+        with self._connection:
+            self._write(self._connection, [(url, None, None, seen) for url in urls], session=seen)
+        os.remove(history_file)
+
+    def _write(self, connection, plays, session=None):
+        session = self.session if session is None else session
+        connection.executemany(
+            "INSERT OR IGNORE INTO streams (url, search_key, first_seen, last_seen, session) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(url, search_key(url), seen, seen, session) for url, _, _, seen in plays]
+        )
+        connection.executemany(
+            "UPDATE streams SET last_seen = ?, play_count = play_count + 1, session = ?, "
+            "last_quality = COALESCE(?, last_quality), resolve_seconds = COALESCE(?, resolve_seconds) "
+            "WHERE url = ?",
+            [(seen, session, quality, resolve_seconds, url) for url, quality, resolve_seconds, seen in plays]
+        )
+
+    def _write_loop(self):
+        connection = sqlite3.connect(self.path)
+        running = True
+        while running:
+            # Wait for a play, then give more of them time to arrive
+            items = [self._queue.get()]
+            if isinstance(items[0], tuple):
+                time.sleep(self.flush_interval)
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            plays = [item for item in items if isinstance(item, tuple)]
+            if plays:
+                try:
+                    with connection:
+                        self._write(connection, plays)
+                except sqlite3.Error as e:
+                    print("Could not save stream history: " + str(e))
+            for item in items:
+                if item is None:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    item.set()
+        connection.close()
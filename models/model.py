@@ -1,19 +1,110 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import streamlink
-import os
+import threading
+import time
 from urllib.parse import urlparse, urlunparse
 
-from constants import HISTORY_FILE
+from constants import RESOLVER_CACHE_TTL, SIM_PLUGIN_DIR, SIM_SCHEME
+from models.history import StreamHistory
+from profiling import profiler
+from utils import Deferred
+
+
+def create_streamlink_session():
+    """Imports streamlink and creates a session, which loads every plugin,
+    including the one for the local stream simulator."""
+    with profiler.span("streamlink session"):
+        import streamlink
+        session = streamlink.Streamlink()
+        session.load_plugins(SIM_PLUGIN_DIR)
+        return session
+
+
+class StreamResolver:
+    """Resolves the available streams of urls with one streamlink session.
+
+    Results are reused for RESOLVER_CACHE_TTL seconds, e.g. when a stream is
+    re-added with another quality. All windows share one resolver, so
+    streamlink is loaded once and a stream is only resolved once.
+    """
+
+    def __init__(self):
+        # Creating the session is slow, so it is only started on load_session()
+        self._streamlink_session = Deferred(create_streamlink_session, name="streamlink-session")
+
+        # Resolved stream options by url, as (time resolved, options)
+        self._resolved = {}
+        self._resolved_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def streamlink_session(self):
+        """The streamlink session, blocks until it has been created."""
+        return self._streamlink_session.get()
+
+    def load_session(self):
+        """Starts creating the streamlink session in the background."""
+        self._streamlink_session.start()
+
+    def get_stream_options(self, stream_url):
+        """Resolves the available streams of the url, from the cache if it
+        was resolved less than RESOLVER_CACHE_TTL seconds ago."""
+        now = time.monotonic()
+        with self._resolved_lock:
+            resolved = self._resolved.get(stream_url)
+            if resolved is not None and now - resolved[0] < RESOLVER_CACHE_TTL:
+                self.hits += 1
+                return resolved[1]
+            self.misses += 1
+
+        stream_options = self.streamlink_session.streams(stream_url)
+
+        with self._resolved_lock:
+            # Forget expired results so the cache doesn't grow forever
+            for url, (resolved_at, _) in list(self._resolved.items()):
+                if now - resolved_at >= RESOLVER_CACHE_TTL:
+                    del self._resolved[url]
+            if stream_options:
+                self._resolved[stream_url] = (now, stream_options)
+
+        return stream_options
+
+    def stats(self):
+        """Returns the hit and miss counts of the resolved streams cache."""
+        lookups = self.hits + self.misses
+        return {
+            "resolver_cache_hits": self.hits,
+            "resolver_cache_misses": self.misses,
+            "resolver_cache_hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
 
 
 class StreamModel:
-    def __init__(self, grid):
-        self.streamlink_session = streamlink.Streamlink()
+    """The streams of one grid.
+
+    Args:
+        grid (VideoFrameGrid): The grid of the window.
+        resolver (StreamResolver): Shared with the other windows, a new one by default.
+        history (StreamHistory): Shared with the other windows, opened by default.
+    """
+
+    def __init__(self, grid, resolver=None, history=None):
         self.grid = grid
-        self.stream_history = set()
-        self.load_stream_history()
+        self.resolver = resolver or StreamResolver()
+        self.history = None
+        self.stream_history = []
+        self.load_stream_history(history)
+
+    @property
+    def streamlink_session(self):
+        """The streamlink session, blocks until it has been created."""
+        return self.resolver.streamlink_session
+
+    def load_session(self):
+        """Starts creating the streamlink session in the background."""
+        self.resolver.load_session()
 
     def mute_all_streams(self, is_mute_checked):
         for video_frame in self.grid.videoframes:
@@ -26,10 +117,18 @@ class StreamModel:
     def export_streams_to_clipboard(self):
         return "\n".join([video_frame.stream.url for video_frame in self.grid.videoframes])
 
-    def get_stream_options(self, *args):
-        return self.streamlink_session.streams(*args)
+    def get_stream_options(self, stream_url):
+        """Resolves the available streams of the url, see StreamResolver."""
+        return self.resolver.get_stream_options(stream_url)
+
+    def resolver_stats(self):
+        """Returns the hit and miss counts of the resolved streams cache."""
+        return self.resolver.stats()
 
     def parse_url(self, stream_url):
+        # Simulated streams are resolved by their own plugin, as they are
+        if stream_url.lower().startswith(SIM_SCHEME):
+            return stream_url
         if "http" not in stream_url.lower():
             stream_url = "http://" + stream_url
 
@@ -49,23 +148,20 @@ class StreamModel:
     def remove_widget(self, *args):
         self.grid.removeWidget(*args)
 
-    def save_stream_to_history(self, url):
-        """Saves a stream to history file."""
-        with open(HISTORY_FILE, 'a') as f:
-            f.write(url + '\n')
-
-    def load_stream_history(self):
-        """Loads up all streams from last session."""
-        if os.path.exists(HISTORY_FILE):
-            with open(HISTORY_FILE, 'r') as f:
-                lines = f.readlines()
-                for line in lines:
-                    self.stream_history.add(line.strip("\n"))
-        # Clear history file
-        open(HISTORY_FILE, 'w').close()
+    def save_stream_to_history(self, url, quality=None, resolve_seconds=None):
+        """Records a play of the stream in the history, written in the background."""
+        self.history.record(url, quality, resolve_seconds)
+
+    @profiler.span("history")
+    def load_stream_history(self, history=None):
+        """Opens the history, unless one is given, and loads up all streams
+        from last session."""
+        self.history = history or StreamHistory()
+        self.stream_history = self.history.last_session()
 
     @staticmethod
     def streams(stream_url):
+        import streamlink
         streamlink.streams(stream_url)
 
     @staticmethod
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from PyQt5 import QtCore, QtWidgets
+
+from constants import OVERLAY_REFRESH_MS
+from metrics import registry
+
+OVERLAY_TEXT = (
+    "{quality}  {input_bitrate_kbps:.0f} kb/s\n"
+    "buffer {buffer_fill:.0f}%  reads {read_calls_rate:.0f}/s\n"
+    "dropped {dropped_pictures}  decoded {decoded_fps:.1f} fps"
+)
+
+
+class StatsOverlay(QtWidgets.QLabel):
+    """A small label drawn on top of a frame showing its playback metrics.
+
+    The text is taken from the metrics registry, which the stats collector
+    keeps up to date, and is only refreshed while the overlay is shown.
+
+    Args:
+        frame (_VideoFrame): The frame the overlay is shown on.
+        metrics (MetricsRegistry): Where the metrics of the frame are read from.
+    """
+
+    def __init__(self, frame, metrics=registry, interval=OVERLAY_REFRESH_MS):
+        super(StatsOverlay, self).__init__(frame)
+        self.frame = frame
+        self.metrics = metrics
+        self.setObjectName("stats_overlay")
+        self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+        self.hide()
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.refresh)
+
+    def refresh(self):
+        """Updates the text from the latest metrics of the frame."""
+        values = self.metrics.get(self.frame)
+        if values is None:
+            self.setText("Waiting for stats...")
+        else:
+            self.setText(OVERLAY_TEXT.format(**values))
+        self.adjustSize()
+
+    def showEvent(self, event):
+        self.refresh()
+        self.raise_()
+        self.timer.start()
+
+    def hideEvent(self, event):
+        self.timer.stop()
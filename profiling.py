@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Records named spans covering the startup of the application.
+
+``main.py --profile-startup`` prints the spans once startup has finished and
+``main.py --trace-startup FILE`` dumps them as JSON, see to_dict() for the
+format. benchmarks/bench_startup.py runs repeated cold starts on top of this.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# main.py imports this module first, so this is as close to launch as we get.
+LAUNCH_TIME = time.perf_counter()
+
+
+class StartupProfiler:
+    """Collects named spans, each with a start and end time. Spans may be
+    recorded from any thread, e.g. by the background loaders."""
+
+    def __init__(self):
+        self.spans = []
+
+    def record(self, name, start, end):
+        """Records a span that has already finished."""
+        self.spans.append((name, start, end, threading.current_thread().name))
+
+    @contextmanager
+    def span(self, name):
+        """Times the body of the with-statement (or decorated function) as
+        the span name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def _sorted_spans(self):
+        return sorted(self.spans, key=lambda span: span[1])
+
+    def to_dict(self):
+        """Returns all spans in milliseconds since launch, ready for JSON."""
+        spans = [
+            {
+                "name": name,
+                "start_ms": (start - LAUNCH_TIME) * 1000,
+                "duration_ms": (end - start) * 1000,
+                "thread": thread,
+            }
+            for name, start, end, thread in self._sorted_spans()
+        ]
+        end = max((span[2] for span in self.spans), default=LAUNCH_TIME)
+        return {"total_ms": (end - LAUNCH_TIME) * 1000, "spans": spans}
+
+    def dump(self, path):
+        """Writes all spans as JSON to the path."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def report(self):
+        """Returns a table of all spans, in milliseconds since launch."""
+        lines = [
+            "Startup profile (ms since launch):",
+            "  {:<24}{:>10}{:>10}  {}".format("span", "start", "duration", "thread"),
+        ]
+        for span in self.to_dict()["spans"]:
+            lines.append("  {:<24}{:>10.1f}{:>10.1f}  {}".format(
+                span["name"], span["start_ms"], span["duration_ms"], span["thread"]
+            ))
+        return "\n".join(lines)
+
+
+profiler = StartupProfiler()
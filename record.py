@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""Records live streams to disk without the GUI, e.g. on a server.
+
+    python record.py [URL ...] [--session FILE] [--quality QUALITIES]
+        [--record-dir DIR] [--max-size MB] [--metrics-port PORT] [--duration SECONDS]
+
+Every stream is resolved by a StreamModel and read into a LiveStreamContainer
+on a thread of its own, like the libVLC read callback would, so buffering,
+recording and the metrics work as they do in the app. Nothing is decoded, the
+threads spend their time waiting for the network. A stream that fails or ends
+is resolved again and reconnected, waiting twice as long after every attempt
+that did not read anything.
+"""
+
+import argparse
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import cfg
+from constants import (
+    CONFIG_METRICS_ADDRESS, CONFIG_METRICS_ENABLED, CONFIG_METRICS_PORT, CONFIG_QUALITY,
+    CONFIG_QUALITY_DELIMITER_SPLIT, HEADLESS_READ_SIZE, HEADLESS_RECONNECT_DELAY,
+    HEADLESS_RECONNECT_MAX_DELAY, METRICS_INTERVAL_MS
+)
+from containers import LiveStreamContainer
+from metrics import COUNTER_FIELDS, registry
+from metricsserver import MetricsServer
+from models import StreamModel
+import recorder
+from utils import process_stats
+
+
+class _ReadStats:
+    """Stands in for the libVLC media stats of a stream nothing plays, only
+    the bytes read and the input bitrate are known."""
+
+    def __init__(self):
+        for field in COUNTER_FIELDS:
+            setattr(self, field, 0)
+        self.input_bitrate = 0.0
+        self.demux_bitrate = 0.0
+        self._sampled = None
+
+    def sample(self, container, now):
+        read_bytes = container.bytes_read
+        if self._sampled is not None and now > self._sampled:
+            # In bytes per microsecond, like libVLC
+            self.input_bitrate = (read_bytes - self.read_bytes) / ((now - self._sampled) * 1000000.0)
+        self.read_bytes = self.demux_read_bytes = read_bytes
+        self._sampled = now
+
+
+class StreamIngest:
+    """Reads one stream and records it until stopped.
+
+    Args:
+        model (StreamModel): Resolves the stream.
+        url (str): The stream.
+        qualities (list): Quality priority, the first one the stream offers is
+            recorded, otherwise the first one in alphabetical order.
+        config (ConfigSnapshot): Buffering and recording settings.
+        stop (threading.Event): Set to stop reading.
+        read_size (int): Bytes asked for per read.
+    """
+
+    def __init__(self, model, url, qualities, config, stop, read_size=HEADLESS_READ_SIZE):
+        self.model = model
+        self.url = url
+        self.qualities = qualities
+        self.config = config
+        self.read_size = read_size
+        self.container = None
+        self.stats = _ReadStats()
+        self._stop = stop
+
+    def run(self):
+        """Connects, reads until the stream fails or ends, and does it again
+        until stopped. Closes the container when done."""
+        delay = HEADLESS_RECONNECT_DELAY
+        try:
+            while not self._stop.is_set():
+                try:
+                    if self._connect() and self._read():
+                        delay = HEADLESS_RECONNECT_DELAY
+                except Exception as e:
+                    if self._stop.is_set():
+                        break
+                    print("Could not record stream {}: {}".format(self.url, e))
+                if self._stop.wait(delay):
+                    break
+                delay = min(delay * 2, HEADLESS_RECONNECT_MAX_DELAY)
+        finally:
+            if self.container is not None:
+                self.container.stop_recording()
+                self.container.close()
+
+    def interrupt(self):
+        """Closes the stream to wake up a read blocked on the network, call
+        after setting the stop event."""
+        container = self.container
+        if container is not None:
+            try:
+                container.stream.close()
+            except Exception:
+                pass
+
+    def _connect(self):
+        """Resolves the stream and opens it, in a new container the first time.
+
+        Returns:
+            bool: False if the stream is offline.
+        """
+        stream_options = self.model.get_stream_options(self.url)
+        if not stream_options:
+            print("Stream {} is offline".format(self.url))
+            return False
+        quality = next((q for q in self.qualities if q in stream_options), None)
+        if quality is None:
+            quality = sorted(stream_options)[0]
+
+        if self.container is None:
+            self.container = LiveStreamContainer(None, self.url, stream_options, quality, config=self.config)
+            self.container.start_recording()
+        else:
+            self.container.streams = stream_options
+            self.container.update_info(self.url, quality)
+            self.container.refresh()
+        print("Recording {} in {}".format(self.url, quality))
+        return True
+
+    def _read(self):
+        """Reads until the stream ends or reading is stopped.
+
+        Returns:
+            int: The bytes read.
+        """
+        container = self.container
+        total = 0
+        while not self._stop.is_set():
+            data = container.pull(self.read_size)
+            if not data:
+                break
+            total += len(data)
+        return total
+
+
+class HeadlessRecorder:
+    """Records streams concurrently, one thread each, and keeps their metrics
+    in the registry.
+
+    Args:
+        streams (list): (url, quality priority) of the streams to record.
+        config (ConfigSnapshot): Buffering and recording settings.
+        model (StreamModel): Resolves the streams, a new one by default.
+        metrics (MetricsRegistry): Where the metrics are stored.
+    """
+
+    def __init__(self, streams, config, model=None, metrics=registry):
+        self.model = model or StreamModel(None)
+        self.metrics = metrics
+        self._stop = threading.Event()
+        self.ingests = [StreamIngest(self.model, url, qualities, config, self._stop) for url, qualities in streams]
+        self._executor = None
+        self._sampler = None
+
+    def start(self):
+        self.model.load_session()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.ingests)))
+        for ingest in self.ingests:
+            self._executor.submit(ingest.run)
+        self._sampler = threading.Thread(target=self._sample_loop, name="metrics-sampler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def _sample_loop(self):
+        while not self._stop.wait(METRICS_INTERVAL_MS / 1000.0):
+            self.sample()
+
+    def sample(self, now=None):
+        """Updates the metrics of every connected stream once."""
+        now = time.monotonic() if now is None else now
+        sampled = []
+        for ingest in self.ingests:
+            container = ingest.container
+            if container is None:
+                continue
+            ingest.stats.sample(container, now)
+            labels = {"stream_id": container.id, "url": container.url, "quality": container.quality}
+            self.metrics.update(
+                ingest,
+                labels,
+                ingest.stats,
+                now,
+                counters=container.counters(),
+                gauges=container.gauges(),
+                histograms=container.histograms()
+            )
+            sampled.append(ingest)
+        self.metrics.retain(sampled)
+
+    def stop(self):
+        """Stops reading and waits until what was read has been written."""
+        self._stop.set()
+        for ingest in self.ingests:
+            ingest.interrupt()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        recorder.join_all()
+        self.model.history.close()
+
+
+def _parse_qualities(text):
+    return [quality.strip() for quality in text.split(CONFIG_QUALITY_DELIMITER_SPLIT) if quality.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("urls", nargs="*", metavar="URL", help="streams to record")
+    parser.add_argument("--session", metavar="FILE", help="also record the streams of a saved session")
+    parser.add_argument("--quality", type=_parse_qualities,
+                        help="comma separated quality priority, defaults to the one of the settings")
+    parser.add_argument("--record-dir", help="where the recordings are written, defaults to the settings")
+    parser.add_argument("--max-size", type=int, metavar="MB",
+                        help="disk usage cap of all recordings, defaults to the settings")
+    parser.add_argument("--metrics-address", default=cfg[CONFIG_METRICS_ADDRESS])
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve the metrics on this port, by default only if enabled in the settings")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument(
+        "--log-level",
+        default="warning",
+        choices=["debug", "info", "warning", "error"],
+        help="lowest level of the log messages that are printed"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s %(message)s", level=args.log_level.upper())
+
+    priority = args.quality or list(cfg[CONFIG_QUALITY])
+    model = StreamModel(None)
+    streams = [(model.parse_url(url), priority) for url in args.urls]
+    if args.session:
+        import session
+        saved = session.load(args.session)
+        if saved is None:
+            parser.error("could not load the session " + args.session)
+        streams.extend((tile["url"], [tile["quality"]] + priority) for tile in saved["tiles"])
+    if not streams:
+        parser.error("no streams to record")
+
+    config = cfg.snapshot()
+    if args.record_dir:
+        config = config._replace(record_dir=args.record_dir)
+    if args.max_size is not None:
+        config = config._replace(record_max_size=args.max_size)
+
+    port = args.metrics_port
+    if port is None and cfg[CONFIG_METRICS_ENABLED]:
+        port = cfg[CONFIG_METRICS_PORT]
+
+    recorder = HeadlessRecorder(streams, config, model).start()
+    metrics_server = None
+    if port is not None:
+        try:
+            metrics_server = MetricsServer(
+                args.metrics_address, port, sources=[process_stats, model.resolver_stats]
+            ).start()
+            print("Serving metrics on http://{}:{}/metrics".format(*metrics_server.address))
+        except OSError as e:
+            print("Could not start the metrics server: " + str(e))
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    deadline = None if args.duration is None else time.monotonic() + args.duration
+    try:
+        # Waiting in short steps keeps Ctrl+C working on every platform
+        while not stop.wait(1.0 if deadline is None else max(0.0, min(1.0, deadline - time.monotonic()))):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+    except KeyboardInterrupt:
+        pass
+
+    recorder.stop()
+    if metrics_server is not None:
+        metrics_server.stop()
+    for ingest in recorder.ingests:
+        container = ingest.container
+        print("{}: {} bytes read, {} reconnects".format(
+            ingest.url,
+            container.bytes_read if container is not None else 0,
+            container.reconnects if container is not None else 0
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""Records live streams to disk.
+
+The read callback hands every chunk it reads from a stream to the Recorder
+of the stream, which only queues it, so recording never makes libVLC wait
+for the disk. A writer thread per recording writes the queued chunks through
+a large write buffer into .ts files, starting a new file every
+RECORD_SEGMENT_SECONDS on a transport stream packet boundary. A recording
+started in the middle of a packet skips ahead to the first whole packet, so
+every file starts with one. Whenever a
+file is finished, the oldest finished recordings in the directory are
+deleted until they all fit into the disk usage cap.
+"""
+
+import os
+import queue
+import re
+import threading
+import time
+
+from constants import (
+    RECORD_DIR, RECORD_EXTENSION, RECORD_PACKET_SIZE, RECORD_QUEUE_CHUNKS,
+    RECORD_SEGMENT_SECONDS, RECORD_WRITE_BUFFER
+)
+
+# Queued to make the writer start a new file
+_ROTATE = object()
+
+_SYNC_BYTE = 0x47
+
+# Files being written to, which are never deleted to make room
+_open_files = set()
+_open_files_lock = threading.Lock()
+
+# Recorders whose writer hasn't finished yet
+_running = set()
+_running_lock = threading.Lock()
+
+
+def recording_name(stream_id, url):
+    """Returns a file name prefix telling the recordings of streams apart."""
+    name = re.sub(r"^[a-z]+://(www\.)?", "", url.lower())
+    return "{}-{}".format(stream_id, re.sub(r"[^a-z0-9]+", "_", name).strip("_"))
+
+
+def enforce_quota(directory, max_bytes):
+    """Deletes the oldest finished recordings in the directory until all
+    recordings fit into max_bytes. Files being written count towards the
+    total but are kept.
+
+    Returns:
+        list: The deleted files.
+    """
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith(RECORD_EXTENSION)]
+    except OSError:
+        return []
+
+    files = []
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    with _open_files_lock:
+        deletable = sorted(f for f in files if f[2] not in _open_files)
+
+    deleted = []
+    for _, size, path in deletable:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError as e:
+            print("Could not delete old recording: " + str(e))
+            continue
+        total -= size
+        deleted.append(path)
+    return deleted
+
+
+def join_all(timeout=None):
+    """Waits until the writers of all stopped recorders have written what
+    was queued, e.g. before the app exits and its daemon threads die."""
+    with _running_lock:
+        recorders = list(_running)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    for recorder in recorders:
+        recorder.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+
+class Recorder:
+    """Writes the chunks of one stream to rotating files on a writer thread.
+
+    Args:
+        name (str): Prefix of the file names, see recording_name().
+        directory (str): Where the files are written, created if missing.
+        max_bytes (int): Disk usage cap of all recordings in the directory.
+        segment_seconds (float): Seconds of a stream written to one file.
+        queue_chunks (int): Chunks queued before new ones are dropped. Only
+            the chunks count, so rotate() and stop() never wait.
+        write_buffer (int): Bytes collected before they are written.
+    """
+
+    def __init__(self, name, directory=RECORD_DIR, max_bytes=None, segment_seconds=RECORD_SEGMENT_SECONDS,
+                 queue_chunks=RECORD_QUEUE_CHUNKS, write_buffer=RECORD_WRITE_BUFFER):
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_seconds = segment_seconds
+        self.write_buffer = write_buffer
+        self.files = []
+        self.bytes_written = 0
+        self.dropped_chunks = 0
+        self.error = None
+
+        self.queue_chunks = queue_chunks
+        self._queue = queue.Queue()
+        self._file = None
+        self._file_opened = 0
+        # Bytes written to the current file since its last packet boundary
+        self._packet_offset = 0
+        # Whether the first packet of the stream was found, and the data
+        # kept until it is certain where that packet starts
+        self._synced = False
+        self._pending = b""
+        self._writer = threading.Thread(target=self._write_loop, name="recorder " + name, daemon=True)
+        with _running_lock:
+            _running.add(self)
+        self._writer.start()
+
+    def write(self, data):
+        """Queues a chunk of the stream. Never blocks: if the disk can't keep
+        up and the queue is full, the chunk is dropped and counted."""
+        if not data or self.error is not None:
+            return
+        # Chunks come from one thread, so the queue can't outgrow the check
+        if self._queue.qsize() >= self.queue_chunks:
+            self.dropped_chunks += 1
+            return
+        self._queue.put(data)
+
+    def rotate(self):
+        """Starts a new file, e.g. when the stream has been reopened."""
+        self._queue.put(_ROTATE)
+
+    def stop(self):
+        """Makes the writer write what has been queued, close the file and
+        stop, without waiting for it, see join()."""
+        self._queue.put(None)
+
+    def join(self, timeout=None):
+        """Waits for the writer to stop."""
+        self._writer.join(timeout)
+
+    def _write_loop(self):
+        try:
+            while True:
+                item = self._queue.get()
+                try:
+                    if item is None:
+                        self._finish()
+                    elif item is _ROTATE:
+                        self._finish()
+                        # The reopened stream is found on its own
+                        self._synced = False
+                    elif self.error is None:
+                        self._write(item)
+                except OSError as e:
+                    print("Could not record stream {}: {}".format(self.name, e))
+                    self.error = e
+                    self._discard()
+                if item is None:
+                    return
+        finally:
+            with _running_lock:
+                _running.discard(self)
+
+    def _align(self, data, final=False):
+        """Returns the data from the first packet of the stream on, once it is
+        found. A sync byte is taken as the start of a packet when the next
+        two packets start with one too; until the data reaches that far it
+        is kept, unless it is the final data of the stream."""
+        data = self._pending + data
+        self._pending = b""
+        size = RECORD_PACKET_SIZE
+        offset = data.find(_SYNC_BYTE)
+        while offset != -1:
+            following = range(offset + size, offset + 3 * size, size)
+            if following[-1] >= len(data) and not final:
+                self._pending = data[offset:]
+                return b""
+            if all(data[i] == _SYNC_BYTE for i in following if i < len(data)):
+                self._synced = True
+                return data[offset:]
+            offset = data.find(_SYNC_BYTE, offset + 1)
+        return b""
+
+    def _write(self, data):
+        if not self._synced:
+            data = self._align(data)
+            if not data:
+                return
+
+        if self._file is not None and time.monotonic() - self._file_opened >= self.segment_seconds:
+            # Finish the current packet in the old file, so both files start with a whole packet
+            head = data[:(RECORD_PACKET_SIZE - self._packet_offset) % RECORD_PACKET_SIZE]
+            if head:
+                self._file.write(head)
+                self.bytes_written += len(head)
+                self._packet_offset = (self._packet_offset + len(head)) % RECORD_PACKET_SIZE
+                data = data[len(head):]
+            if self._packet_offset == 0:
+                self._close()
+            if not data:
+                return
+
+        if self._file is None:
+            self._open()
+        self._file.write(data)
+        self.bytes_written += len(data)
+        self._packet_offset = (self._packet_offset + len(data)) % RECORD_PACKET_SIZE
+
+    def _finish(self):
+        """Writes the data kept while looking for the first packet and closes the file."""
+        if self._pending and self.error is None:
+            data = self._align(b"", final=True)
+            if data:
+                self._write(data)
+        self._pending = b""
+        self._close()
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, "{}-{}{}".format(self.name, stamp, RECORD_EXTENSION))
+        count = 1
+        while os.path.exists(path):
+            count += 1
+            path = os.path.join(self.directory, "{}-{}-{}{}".format(self.name, stamp, count, RECORD_EXTENSION))
+
+        with _open_files_lock:
+            _open_files.add(path)
+        self._file = open(path, "wb", buffering=self.write_buffer)
+        self._file_opened = time.monotonic()
+        self._packet_offset = 0
+        self.files.append(path)
+
+    def _close(self):
+        if self._file is None:
+            return
+        path = self._file.name
+        try:
+            self._file.close()
+        finally:
+            self._file = None
+            with _open_files_lock:
+                _open_files.discard(path)
+        if self.max_bytes is not None:
+            enforce_quota(self.directory, self.max_bytes)
+
+    def _discard(self):
+        """Closes the file after an error, what was queued is thrown away."""
+        self._pending = b""
+        try:
+            self._close()
+        except OSError:
+            pass
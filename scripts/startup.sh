@@ -0,0 +1,2 @@
+#!/bin/bash
+python -m benchmarks.bench_startup --runs 5 --budget "first frame=1500" --budget "window init=500"
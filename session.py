@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""Saves the streams on the wall to a session file and restores them.
+
+The session holds every window, in the order they were opened, and every
+tile holds the index of its window. A restore opens the windows, resolves all
+streams in parallel and adds each frame as soon as the frames before it are
+in place, so every frame ends up at its saved position in its saved quality
+without asking the user anything. The positions of streams that can't be
+resolved are left empty.
+"""
+
+import base64
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5 import QtCore
+
+from config import cfg
+from constants import CONFIG_QUALITY, SESSION_FILE, SESSION_RESTORE_WORKERS, SESSION_VERSION
+from models.coordinates import VideoFrameCoordinates
+from utils import atomic_write
+
+
+def grid_order(tiles):
+    """Sorts tiles by the order the grid hands out their positions in."""
+    positions = {}
+    coordinates = VideoFrameCoordinates(x=0, y=0)
+    for index in range(len(tiles)):
+        positions[(coordinates.x, coordinates.y)] = index
+        coordinates = coordinates.update_coordinates()
+    return sorted(tiles, key=lambda tile: positions.get((tile["x"], tile["y"]), len(tiles)))
+
+
+def capture(window):
+    """Returns the session of all windows of the app as a dict that can be
+    saved as JSON, with the tiles of each window in grid order."""
+    layouts = []
+    tiles = []
+    for index, open_window in enumerate(window.windows):
+        layouts.append({
+            "geometry": base64.b64encode(bytes(open_window.saveGeometry())).decode("ascii"),
+            "maximized": open_window.isMaximized(),
+        })
+        window_tiles = []
+        for frame in open_window.grid.videoframes:
+            window_tiles.append({
+                "url": frame.stream.url,
+                "quality": frame.stream.quality,
+                "muted": frame.is_muted,
+                "volume": frame.volume_slider.value(),
+                "window": index,
+                "x": frame._coordinates.x,
+                "y": frame._coordinates.y,
+            })
+        tiles.extend(grid_order(window_tiles))
+    return {
+        "version": SESSION_VERSION,
+        "saved_at": time.time(),
+        "windows": layouts,
+        "tiles": tiles,
+    }
+
+
+def save(window, path=SESSION_FILE):
+    """Writes the session of the window to the session file."""
+    atomic_write(path, json.dumps(capture(window), indent=4))
+
+
+def load(path=SESSION_FILE):
+    """Returns the saved session, or None if there is none or it can't be read."""
+    try:
+        with open(path, "r") as f:
+            session = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print("Could not read the session file: " + str(e))
+        return None
+    if session.get("version") != SESSION_VERSION:
+        return None
+    return session
+
+
+class SessionRestorer(QtCore.QObject):
+    """Restores a saved session into a window and the windows it opens.
+
+    Args:
+        window (ApplicationWindow): The first window, the others are opened
+            from it as needed.
+        session (dict): The session as returned by load().
+        workers (int): Number of streams resolved at the same time.
+    """
+
+    # Emitted from the workers with the tile index and its stream options,
+    # or None if the stream could not be resolved
+    resolved = QtCore.pyqtSignal(int, object)
+    # Emitted with the number of restored streams and the seconds it took
+    finished = QtCore.pyqtSignal(int, float)
+
+    def __init__(self, window, session, workers=SESSION_RESTORE_WORKERS):
+        super(SessionRestorer, self).__init__(window)
+        self.window = window
+        self.tiles = session["tiles"]
+        # Sessions saved before there were more windows hold only the first one
+        self.layouts = session.get("windows") or [session.get("window", {})]
+        self.workers = workers
+        self.restored = 0
+        self._results = {}
+        self._next = 0
+        self._start = None
+        self.resolved.connect(self._on_resolved)
+
+    def start(self):
+        """Opens the windows, restores their layouts and starts resolving all streams."""
+        self._start = time.perf_counter()
+        count = max([len(self.layouts)] + [tile.get("window", 0) + 1 for tile in self.tiles])
+        while len(self.window.windows) < count:
+            self.window.open_window()
+        for open_window, layout in zip(self.window.windows, self.layouts):
+            geometry = layout.get("geometry")
+            if geometry:
+                open_window.restoreGeometry(QtCore.QByteArray(base64.b64decode(geometry)))
+            if layout.get("maximized"):
+                open_window.showMaximized()
+
+        if not self.tiles:
+            self._finish()
+            return
+
+        self._window(self.tiles[0]).show_loading_gif()
+        # The pool isn't waited on, the GUI keeps running while it resolves
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        for index, tile in enumerate(self.tiles):
+            executor.submit(self._resolve, index, tile["url"])
+        executor.shutdown(wait=False)
+
+    def _resolve(self, index, url):
+        """Resolves one stream, called on a worker thread."""
+        try:
+            stream_options = self.window.model.get_stream_options(url)
+        except Exception as e:
+            print("Could not restore stream {}: {}".format(url, e))
+            stream_options = None
+        self.resolved.emit(index, stream_options or None)
+
+    def _on_resolved(self, index, stream_options):
+        """Adds every frame whose preceding frames have all been added."""
+        self._results[index] = stream_options
+        while self._next in self._results:
+            tile = self.tiles[self._next]
+            stream_options = self._results.pop(self._next)
+            self._next += 1
+            if stream_options is not None:
+                self._add(tile, stream_options)
+        if self._next == len(self.tiles):
+            self._finish()
+        else:
+            # Show the loading gif at the next position, which may be in another window
+            self._hide_loading_gifs()
+            tile = self.tiles[self._next]
+            self._skip_to(tile)
+            self._window(tile).show_loading_gif()
+
+    def _window(self, tile):
+        return self.window.windows[tile.get("window", 0)]
+
+    def _skip_to(self, tile):
+        """Moves the next position of the grid of the tile ahead to the saved
+        position of the tile, leaving the positions of the tiles that could
+        not be resolved empty."""
+        grid = self._window(tile).grid
+        coordinates = grid.coordinates
+        for _ in range(len(self.tiles)):
+            if (coordinates.x, coordinates.y) == (tile["x"], tile["y"]):
+                grid.coordinates = coordinates
+                return
+            coordinates = coordinates.update_coordinates()
+
+    def _add(self, tile, stream_options):
+        quality = tile["quality"]
+        if quality not in stream_options:
+            # Fall back to the quality priority of the settings
+            quality = next((q for q in cfg[CONFIG_QUALITY] if q in stream_options), None)
+            if quality is None:
+                quality = sorted(stream_options)[0]
+
+        self._skip_to(tile)
+        window = self._window(tile)
+        window.setup_videoframe(tile["url"], stream_options, quality)
+        window.model.save_stream_to_history(tile["url"], quality)
+        frame = window.grid.videoframes[-1]
+        frame.is_muted = tile["muted"]
+        frame.player.audio_set_mute(frame.is_muted)
+        frame.volume_slider.setValue(tile["volume"])
+        self.restored += 1
+
+    def _hide_loading_gifs(self):
+        for window in self.window.windows:
+            window.hide_loading_gif()
+
+    def _finish(self):
+        self._hide_loading_gifs()
+        self.finished.emit(self.restored, time.perf_counter() - self._start)
+
+
+class SessionAutosaver(QtCore.QObject):
+    """Saves the session of a window every interval and when asked to.
+
+    Nothing is saved before the first stream has been added, so quitting
+    before restoring does not overwrite the last session with an empty one.
+    """
+
+    def __init__(self, window, interval, path=SESSION_FILE):
+        super(SessionAutosaver, self).__init__(window)
+        self.window = window
+        self.path = path
+        self.enabled = False
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.save)
+        self.timer.start(interval)
+
+    def save(self):
+        if not self.enabled:
+            return
+        try:
+            save(self.window, self.path)
+        except OSError as e:
+            print("Could not save the session: " + str(e))
+
+    def finish(self):
+        """Saves one last time, while all windows are still open. Later saves
+        do nothing, so closing the windows can't overwrite the session."""
+        self.save()
+        self.enabled = False
+        self.timer.stop()
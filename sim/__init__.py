@@ -0,0 +1,3 @@
+from sim.server import DEFAULT_OPTIONS, QUALITIES, SimulatorOptions, SimulatorServer
+
+__all__ = ['DEFAULT_OPTIONS', 'QUALITIES', 'SimulatorOptions', 'SimulatorServer']
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""Runs the stream simulator until interrupted.
+
+    python -m sim [--address ADDRESS] [--port PORT] [--jitter SECONDS] ...
+
+Streams are then opened as sim://ADDRESS:PORT/<any name>.
+"""
+
+import argparse
+import time
+
+from constants import SIM_ADDRESS, SIM_PORT
+from sim.server import DEFAULT_OPTIONS, SimulatorServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--address", default=SIM_ADDRESS)
+    parser.add_argument("--port", type=int, default=SIM_PORT)
+    for field, default in DEFAULT_OPTIONS._asdict().items():
+        parser.add_argument("--" + field.replace("_", "-"), type=type(default) if default is not None else int,
+                            default=default)
+    args = parser.parse_args()
+
+    options = DEFAULT_OPTIONS._replace(**{field: getattr(args, field) for field in DEFAULT_OPTIONS._fields})
+    server = SimulatorServer(args.address, args.port, options).start()
+    print("Serving simulated streams as " + server.url("<name>"))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
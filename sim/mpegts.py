@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Generates MPEG-TS segments of synthetic H.264 content.
+
+The elementary stream only holds access unit delimiters and filler data, so
+there is nothing to decode, but the transport stream is valid: PAT and PMT at
+the start of every segment, one PES packet per frame with PTS, a PCR on the
+first packet of every frame and continuous continuity counters. That is all
+the demuxer and the data path up to it need, at exactly the requested bitrate.
+"""
+
+import struct
+
+PACKET_SIZE = 188
+PAT_PID = 0x0000
+PMT_PID = 0x1000
+VIDEO_PID = 0x0100
+PROGRAM_NUMBER = 1
+# Stream type of H.264 video in the PMT
+STREAM_TYPE_H264 = 0x1b
+CLOCK = 90000
+# Presentation starts this many clock ticks after the PCR, giving decoders a buffer
+PTS_DELAY = 9000
+
+# Bytes of the PES header with a PTS, and of the adaptation field with a PCR
+_PES_HEADER_SIZE = 14
+_PCR_FIELD_SIZE = 8
+
+# H.264 access unit delimiter and the start of a filler data NAL unit
+_ACCESS_UNIT_DELIMITER = b"\x00\x00\x00\x01\x09\xf0"
+_FILLER_START = b"\x00\x00\x00\x01\x0c"
+
+
+def _crc32_table():
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04c11db7) if crc & 0x80000000 else crc << 1
+        table.append(crc & 0xffffffff)
+    return table
+
+
+_CRC_TABLE = _crc32_table()
+
+
+def crc32_mpeg(data):
+    """Returns the CRC-32/MPEG-2 of the data, as used by PSI sections."""
+    crc = 0xffffffff
+    for byte in data:
+        crc = ((crc << 8) & 0xffffffff) ^ _CRC_TABLE[(crc >> 24) ^ byte]
+    return crc
+
+
+def _section_packet(pid, table_id, body, continuity):
+    """Returns a packet holding one PSI section."""
+    # Section syntax, private, reserved bits and the length of the rest
+    section = struct.pack(">BH", table_id, 0xb000 | (len(body) + 4)) + body
+    section += struct.pack(">I", crc32_mpeg(section))
+    header = struct.pack(">BHB", 0x47, 0x4000 | pid, 0x10 | continuity)
+    # Pointer field, then the section padded with stuffing
+    packet = header + b"\x00" + section
+    return packet + b"\xff" * (PACKET_SIZE - len(packet))
+
+
+def pat_packet(continuity=0):
+    body = struct.pack(">HBBBHH", 1, 0xc1, 0, 0, PROGRAM_NUMBER, 0xe000 | PMT_PID)
+    return _section_packet(PAT_PID, 0x00, body, continuity)
+
+
+def pmt_packet(continuity=0, stream_type=STREAM_TYPE_H264):
+    body = struct.pack(
+        ">HBBBHHBHH",
+        PROGRAM_NUMBER, 0xc1, 0, 0,
+        0xe000 | VIDEO_PID,         # PCR PID
+        0xf000,                     # No program info
+        stream_type,
+        0xe000 | VIDEO_PID,
+        0xf000                      # No stream info
+    )
+    return _section_packet(PMT_PID, 0x02, body, continuity)
+
+
+def _timestamp(marker, value):
+    """Encodes a 33 bit PTS with its 4 bit marker."""
+    return struct.pack(
+        ">BHH",
+        (marker << 4) | (((value >> 30) & 0x07) << 1) | 1,
+        (((value >> 15) & 0x7fff) << 1) | 1,
+        ((value & 0x7fff) << 1) | 1
+    )
+
+
+def _pcr(value):
+    """Encodes a PCR base, with no extension."""
+    base = value & 0x1ffffffff
+    return struct.pack(">IH", base >> 1, ((base & 1) << 15) | 0x7e00)
+
+
+def _frame_packets(payload, pts, continuity):
+    """Returns the packets of one PES packet carrying the frame payload, and
+    the continuity counter following them."""
+    pes = b"\x00\x00\x01\xe0\x00\x00\x80\x80\x05" + _timestamp(0x2, pts) + payload
+    packets = []
+    offset = 0
+    while offset < len(pes):
+        first = offset == 0
+        # The first packet of a frame carries the PCR and the random access indicator
+        adaptation = b"\x50" + _pcr(pts - PTS_DELAY) if first else None
+        room = PACKET_SIZE - 4 - (len(adaptation) + 1 if adaptation is not None else 0)
+        chunk = pes[offset:offset + room]
+
+        # The last packet is padded through the adaptation field
+        stuffing = room - len(chunk)
+        if stuffing and adaptation is not None:
+            adaptation += b"\xff" * stuffing
+        elif stuffing == 1:
+            adaptation = b""
+        elif stuffing:
+            adaptation = b"\x00" + b"\xff" * (stuffing - 2)
+
+        header = struct.pack(
+            ">BHB",
+            0x47,
+            (0x4000 if first else 0) | VIDEO_PID,
+            (0x30 if adaptation is not None else 0x10) | continuity
+        )
+        if adaptation is not None:
+            header += bytes([len(adaptation)]) + adaptation
+        packets.append(header + chunk)
+
+        offset += len(chunk)
+        continuity = (continuity + 1) & 0x0f
+    return packets, continuity
+
+
+def frame_payload(size):
+    """Returns an H.264 access unit of about size bytes holding no picture."""
+    filler = max(0, size - len(_ACCESS_UNIT_DELIMITER) - len(_FILLER_START) - 1)
+    # Filler NAL units end with the RBSP trailing bits
+    return _ACCESS_UNIT_DELIMITER + _FILLER_START + b"\xff" * filler + b"\x80"
+
+
+def generate_segment(sequence, duration, bitrate, fps=30):
+    """Returns segment number 'sequence' of a stream cut into segments of
+    'duration' seconds, at about 'bitrate' bits per second.
+
+    Segments are generated independently, but timestamps and continuity
+    counters carry on from the previous segment.
+    """
+    frames = int(round(duration * fps))
+    # Size the frames to fill whole packets, so the bitrate includes the overhead
+    packets_per_frame = max(1, int(round(bitrate / 8.0 / fps / PACKET_SIZE)))
+    payload = frame_payload(packets_per_frame * (PACKET_SIZE - 4) - _PES_HEADER_SIZE - _PCR_FIELD_SIZE)
+
+    packets = [pat_packet(sequence & 0x0f), pmt_packet(sequence & 0x0f)]
+    continuity = (sequence * frames * packets_per_frame) & 0x0f
+    first_frame = sequence * frames
+    for frame in range(frames):
+        pts = ((first_frame + frame) * CLOCK // fps + PTS_DELAY) & 0x1ffffffff
+        frame_packets, continuity = _frame_packets(payload, pts, continuity)
+        packets.extend(frame_packets)
+    return b"".join(packets)
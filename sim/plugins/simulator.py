@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Streamlink plugin resolving sim:// urls to the local stream simulator.
+
+    sim://[host:port]/<name>[?options]
+
+Without a host the simulator is expected at SIM_ADDRESS:SIM_PORT. The options
+are passed on to the simulator, see sim.server. With transport=http the
+streams are the endless MPEG-TS over plain HTTP instead of HLS.
+"""
+
+import re
+from urllib.parse import parse_qsl
+
+from streamlink.plugin import Plugin
+from streamlink.stream.hls import HLSStream
+from streamlink.stream.http import HTTPStream
+
+from constants import SIM_ADDRESS, SIM_PORT
+from sim.server import QUALITIES
+
+try:
+    from streamlink.plugin import pluginmatcher
+except ImportError:
+    # Streamlink before 2.1 asks can_handle_url() instead
+    pluginmatcher = None
+
+_url_re = re.compile(r"sim://(?P<netloc>[^/?]*)/(?P<name>[^/?]+)/?(?:\?(?P<query>.*))?$")
+
+
+class Simulator(Plugin):
+
+    @classmethod
+    def can_handle_url(cls, url):
+        return _url_re.match(url) is not None
+
+    def _get_streams(self):
+        match = _url_re.match(self.url)
+        netloc = match.group("netloc") or "{}:{}".format(SIM_ADDRESS, SIM_PORT)
+        query = match.group("query") or ""
+        base = "http://{}/{}".format(netloc, match.group("name"))
+        suffix = "?" + query if query else ""
+
+        if dict(parse_qsl(query)).get("transport") == "http":
+            return {
+                quality: HTTPStream(self.session, "{}/{}.ts{}".format(base, quality, suffix))
+                for quality, _, _ in QUALITIES
+            }
+        return HLSStream.parse_variant_playlist(self.session, base + "/master.m3u8" + suffix)
+
+
+if pluginmatcher is not None:
+    Simulator = pluginmatcher(_url_re)(Simulator)
+
+__plugin__ = Simulator
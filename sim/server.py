@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""An HTTP server simulating live streams, for benchmarks and tests that
+should not depend on a real stream being online.
+
+    GET /<name>/master.m3u8             HLS variant playlist of all qualities
+    GET /<name>/<quality>/index.m3u8    Live media playlist of the quality
+    GET /<name>/<quality>/<n>.ts        Media segment n
+    GET /<name>/<quality>.ts            Endless MPEG-TS over plain HTTP
+
+Every stream is live from the moment the server starts, with the segment of
+the current wall time at the live edge. The behaviour is tuned with the
+SimulatorOptions, which any request can override through its query string,
+e.g. /name/master.m3u8?jitter=0.2&stall_probability=0.05. Playlists pass the
+query string on to the urls they list.
+"""
+
+import random
+import socket
+import socketserver
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from constants import SIM_ADDRESS, SIM_PORT
+from sim.mpegts import generate_segment
+
+# (name, height, bits per second) of the simulated qualities
+QUALITIES = (
+    ("160p", 160, 300000),
+    ("360p", 360, 800000),
+    ("720p", 720, 3000000),
+)
+
+SimulatorOptions = namedtuple("SimulatorOptions", [
+    "segment_duration",         # Seconds of media per segment
+    "playlist_size",            # Segments listed in a media playlist
+    "expiry",                   # Segments kept after leaving the playlist, older ones are 404
+    "bitrate_scale",            # Multiplies the bitrate of every quality
+    "jitter",                   # Up to this many seconds of delay before every response
+    "stall_probability",        # Chance of a response stalling for stall_seconds
+    "stall_seconds",
+    "disconnect_probability",   # Chance of a response being cut off halfway
+    "seed",                     # Seeds the random knobs, None for a random seed
+])
+
+DEFAULT_OPTIONS = SimulatorOptions(
+    segment_duration=2.0,
+    playlist_size=5,
+    expiry=5,
+    bitrate_scale=1.0,
+    jitter=0.0,
+    stall_probability=0.0,
+    stall_seconds=5.0,
+    disconnect_probability=0.0,
+    seed=None,
+)
+
+
+def parse_options(query, defaults=DEFAULT_OPTIONS):
+    """Returns the defaults overridden by the options in the query string.
+    Unknown and malformed options are ignored."""
+    overrides = {}
+    for key, value in parse_qsl(query):
+        if key not in SimulatorOptions._fields:
+            continue
+        try:
+            overrides[key] = int(value) if key in ("playlist_size", "expiry", "seed") else float(value)
+        except ValueError:
+            pass
+    return defaults._replace(**overrides)
+
+
+def variant_playlist(query=""):
+    """Returns the HLS variant playlist listing every quality."""
+    suffix = "?" + query if query else ""
+    lines = ["#EXTM3U"]
+    for quality, height, bitrate in QUALITIES:
+        lines.append("#EXT-X-STREAM-INF:BANDWIDTH={},RESOLUTION={}x{},NAME=\"{}\"".format(
+            bitrate, height * 16 // 9, height, quality
+        ))
+        lines.append("{}/index.m3u8{}".format(quality, suffix))
+    return "\n".join(lines) + "\n"
+
+
+def media_playlist(live_edge, options, query=""):
+    """Returns the media playlist of the segments up to the live edge."""
+    suffix = "?" + query if query else ""
+    first = max(0, live_edge - options.playlist_size + 1)
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        "#EXT-X-TARGETDURATION:{}".format(int(options.segment_duration + 0.999)),
+        "#EXT-X-MEDIA-SEQUENCE:{}".format(first),
+    ]
+    for sequence in range(first, live_edge + 1):
+        lines.append("#EXTINF:{:.3f},".format(options.segment_duration))
+        lines.append("{}.ts{}".format(sequence, suffix))
+    return "\n".join(lines) + "\n"
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _SimulatorRequestHandler(BaseHTTPRequestHandler):
+
+    # Keep connections open between playlist and segment requests, like a CDN
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        simulator = self.server.simulator
+        url = urlsplit(self.path)
+        options = parse_options(url.query, simulator.options)
+        parts = url.path.strip("/").split("/")
+        qualities = {quality: bitrate for quality, _, bitrate in QUALITIES}
+        simulator.requests += 1
+
+        if len(parts) == 2 and parts[1] == "master.m3u8":
+            self._delay(options)
+            self._respond(variant_playlist(url.query).encode("ascii"), "application/vnd.apple.mpegurl", options)
+        elif len(parts) == 3 and parts[1] in qualities and parts[2] == "index.m3u8":
+            self._delay(options)
+            body = media_playlist(simulator.live_edge(options), options, url.query).encode("ascii")
+            self._respond(body, "application/vnd.apple.mpegurl", options)
+        elif len(parts) == 3 and parts[1] in qualities and parts[2].endswith(".ts"):
+            self._segment(parts[2][:-3], qualities[parts[1]], options)
+        elif len(parts) == 2 and parts[1].endswith(".ts") and parts[1][:-3] in qualities:
+            self._progressive(qualities[parts[1][:-3]], options)
+        else:
+            self.send_error(404)
+
+    def _segment(self, sequence, bitrate, options):
+        try:
+            sequence = int(sequence)
+        except ValueError:
+            self.send_error(404)
+            return
+        live_edge = self.server.simulator.live_edge(options)
+        if sequence > live_edge or sequence < live_edge - options.playlist_size - options.expiry:
+            self.send_error(404)
+            return
+        self._delay(options)
+        body = self.server.simulator.segment(sequence, bitrate, options)
+        self._respond(body, "video/mp2t", options)
+
+    def _progressive(self, bitrate, options):
+        """Sends segments from the live edge on, paced to real time."""
+        simulator = self.server.simulator
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp2t")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        sequence = simulator.live_edge(options)
+        start = time.monotonic()
+        try:
+            while not simulator.stopped:
+                self._delay(options)
+                body = simulator.segment(sequence, bitrate, options)
+                if self._disconnects(options):
+                    self.wfile.write(body[:len(body) // 2])
+                    return
+                self.wfile.write(body)
+                sequence += 1
+                # Stay one segment ahead of real time
+                ahead = start + (sequence - 1) * options.segment_duration - time.monotonic()
+                if ahead > 0:
+                    time.sleep(ahead)
+        except (ConnectionError, socket.timeout):
+            pass
+
+    def _respond(self, body, content_type, options):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self._disconnects(options):
+            # Promise the whole body, send half of it and hang up
+            self.wfile.write(body[:len(body) // 2])
+            self.close_connection = True
+            self.server.simulator.disconnects += 1
+            return
+        self.wfile.write(body)
+
+    def _delay(self, options):
+        simulator = self.server.simulator
+        delay = simulator.random.uniform(0, options.jitter) if options.jitter else 0.0
+        if options.stall_probability and simulator.random.random() < options.stall_probability:
+            delay += options.stall_seconds
+            simulator.stalls += 1
+        if delay:
+            time.sleep(delay)
+
+    def _disconnects(self, options):
+        return bool(options.disconnect_probability) and \
+            self.server.simulator.random.random() < options.disconnect_probability
+
+    def log_message(self, format, *args):
+        # Players request a segment every few seconds, don't spam stderr
+        pass
+
+
+class SimulatorServer:
+    """Serves the simulated streams over HTTP from background threads.
+
+    Args:
+        address (str): Address to bind to.
+        port (int): Port to bind to, 0 picks a free one.
+        options (SimulatorOptions): Defaults for requests not overriding them.
+    """
+
+    def __init__(self, address=SIM_ADDRESS, port=SIM_PORT, options=DEFAULT_OPTIONS):
+        self.options = options
+        self.random = random.Random(options.seed)
+        self.started = time.time()
+        self.stopped = False
+        self.requests = 0
+        self.stalls = 0
+        self.disconnects = 0
+        # Generated segments by (sequence, bitrate), only the recent ones are kept
+        self._segments = {}
+        self._segments_lock = threading.Lock()
+
+        self._server = _ThreadingHTTPServer((address, port), _SimulatorRequestHandler)
+        self._server.simulator = self
+        self._thread = None
+
+    @property
+    def address(self):
+        """The (host, port) the server is bound to."""
+        return self._server.server_address
+
+    def url(self, name="stream"):
+        """Returns the sim:// url of a stream served by this server."""
+        host, port = self.address
+        return "sim://{}:{}/{}".format(host, port, name)
+
+    def live_edge(self, options):
+        """Returns the number of the newest segment."""
+        return int((time.time() - self.started) / options.segment_duration)
+
+    def segment(self, sequence, bitrate, options):
+        """Returns the segment, generating it on the first request."""
+        bitrate = int(bitrate * options.bitrate_scale)
+        key = (sequence, bitrate, options.segment_duration)
+        with self._segments_lock:
+            body = self._segments.get(key)
+        if body is None:
+            body = generate_segment(sequence, options.segment_duration, bitrate)
+            with self._segments_lock:
+                self._segments[key] = body
+                # Every quality of every stream shares the segments of a sequence number
+                for old in [k for k in self._segments if k[0] < sequence - options.playlist_size - options.expiry]:
+                    del self._segments[old]
+        return body
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="stream-simulator",
+            daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.stopped = True
+        self._server.shutdown()
+        self._server.server_close()
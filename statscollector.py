@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import ctypes
+
+from PyQt5 import QtCore
+
+from constants import METRICS_INTERVAL_MS
+from metrics import registry
+from videoframes import libvlc
+
+
+class MediaStatsCollector(QtCore.QObject):
+    """Samples the libVLC media stats of every frame on a timer and feeds
+    them into the metrics registry.
+
+    Sampling is a handful of counter reads per frame, so it runs on the GUI
+    thread where the frames live. One collector samples the frames of all
+    windows, as the registry forgets every frame it was not given.
+
+    Args:
+        parent (QObject): Owns the collector.
+        videoframes (callable): Returns the frames to sample.
+        interval (int): Milliseconds between two samples.
+        metrics (MetricsRegistry): Where the metrics are stored.
+    """
+
+    # Emitted with the frame and a message when its dropped frames spike
+    alarm = QtCore.pyqtSignal(object, str)
+
+    def __init__(self, parent, videoframes, interval=METRICS_INTERVAL_MS, metrics=registry):
+        super(MediaStatsCollector, self).__init__(parent)
+        self.videoframes = videoframes
+        self.metrics = metrics
+        self._stats = None
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.sample)
+        self.timer.start(interval)
+
+    def sample(self):
+        """Samples the media stats of all frames once."""
+        frames = self.videoframes()
+        # There can't be any frames before libVLC has been loaded
+        if frames and self._stats is None:
+            self._stats = libvlc.get().MediaStats()
+
+        for frame in frames:
+            if not frame.stream.media.get_stats(ctypes.byref(self._stats)):
+                continue
+            stream = frame.stream
+            labels = {"stream_id": stream.id, "url": stream.url, "quality": stream.quality}
+            message = self.metrics.update(
+                frame,
+                labels,
+                self._stats,
+                counters=stream.counters(),
+                gauges=stream.gauges(),
+                histograms=stream.histograms()
+            )
+            if message is not None:
+                self.alarm.emit(frame, message)
+
+        self.metrics.retain(frames)
@@ -0,0 +1,71 @@
+from unittest import TestCase
+
+from PyQt5 import QtCore
+
+from audio import NO_TRACK, AudioFocusManager
+
+
+class FakePlayer:
+    """Has one audio track, selected when the player starts."""
+
+    def __init__(self):
+        self.track = 1
+        self.muted = 0
+
+    def audio_get_track(self):
+        return self.track
+
+    def audio_set_track(self, track):
+        self.track = track
+        return 0
+
+    def audio_get_track_description(self):
+        return [(NO_TRACK, b"Disable"), (1, b"Track 1")]
+
+    def audio_get_mute(self):
+        return self.muted
+
+
+class FakeFrame:
+
+    def __init__(self):
+        self.player = FakePlayer()
+
+
+class TestAudioFocusManager(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # The timer needs an application
+        cls.app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+    def setUp(self):
+        self.frames = [FakeFrame() for _ in range(3)]
+        self.manager = AudioFocusManager(None, lambda: self.frames)
+        self.manager.timer.stop()
+
+    def tracks(self):
+        return [frame.player.track for frame in self.frames]
+
+    def test_only_the_focused_frame_keeps_its_track(self):
+        self.manager.update()
+        self.assertEqual(self.tracks(), [1, NO_TRACK, NO_TRACK])
+
+        self.manager.focus(self.frames[2])
+        self.assertEqual(self.tracks(), [NO_TRACK, NO_TRACK, 1])
+        self.assertEqual(self.manager.stats(), {"audio_focus_switches": 1, "audio_decoding_streams": 1})
+
+    def test_muted_and_restarted_frames(self):
+        self.manager.focus(self.frames[1])
+        self.frames[1].player.muted = 1
+        self.manager.update()
+        self.assertEqual(self.tracks(), [NO_TRACK] * 3)
+
+        # A reload selects the track again
+        self.frames[0].player.track = 1
+        self.frames[1].player.muted = 0
+        self.manager.update()
+        self.assertEqual(self.tracks(), [NO_TRACK, 1, NO_TRACK])
+
+        self.manager.set_enabled(False)
+        self.assertEqual(self.tracks(), [1, 1, 1])
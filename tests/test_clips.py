@@ -0,0 +1,88 @@
+from unittest import TestCase
+
+from clips import CLOCK, ClipError, cut, cut_chunks, index
+from sim.mpegts import PACKET_SIZE, generate_segment, pmt_packet
+
+
+def stream(seconds, keyframe_every=1):
+    """Returns seconds of 30 fps MPEG-TS with every n:th frame a keyframe."""
+    data = bytearray(b"".join(generate_segment(i, 1.0, 300000) for i in range(seconds)))
+    frames, _ = index(bytes(data))
+    for number, frame in enumerate(frames):
+        if number % keyframe_every:
+            # Clear the random access indicator
+            data[frame.offset + 5] &= ~0x40
+    return bytes(data)
+
+
+def frames_with_nal(header, stream_type=0x1b):
+    """Returns a second of MPEG-TS whose frames start with the NAL unit header
+    instead of filler data, and have no random access indicator."""
+    data = stream(1, keyframe_every=60)
+    data = data[:PACKET_SIZE] + pmt_packet(0, stream_type) + data[2 * PACKET_SIZE:]
+    data = bytearray(data.replace(b"\x00\x00\x00\x01\x0c", b"\x00\x00\x00\x01" + header))
+    data[2 * PACKET_SIZE + 5] &= ~0x40
+    return bytes(data)
+
+
+class TestClips(TestCase):
+
+    def duration(self, clip):
+        frames, _ = index(clip)
+        return (frames[-1].pts - frames[0].pts) / CLOCK
+
+    def test_index_finds_every_frame_and_the_psi(self):
+        frames, psi = index(stream(2))
+
+        self.assertEqual(len(frames), 60)
+        self.assertEqual([frame.pts for frame in frames], sorted(frame.pts for frame in frames))
+        self.assertEqual(len(psi), 2 * PACKET_SIZE)
+
+    def test_clip_starts_at_a_keyframe_before_the_start(self):
+        data = stream(10, keyframe_every=60)
+        clip = cut(data, 3)
+
+        frames, _ = index(clip)
+        self.assertTrue(frames[0].keyframe)
+        # The keyframe 4 seconds before the newest frame is the last one before 3 seconds
+        self.assertAlmostEqual(self.duration(clip), 4 - 1.0 / 30, places=3)
+        self.assertEqual(len(clip) % PACKET_SIZE, 0)
+        self.assertEqual(clip[:PACKET_SIZE * 2], index(data)[1])
+
+    def test_clip_ends_at_end(self):
+        clip = cut(stream(10), 6, 2)
+
+        self.assertAlmostEqual(self.duration(clip), 4, places=3)
+
+    def test_data_cut_mid_packet_is_resynchronized(self):
+        data = stream(3)
+        clip = cut(data[1000:], 1)
+
+        self.assertEqual(clip[PACKET_SIZE * 2], 0x47)
+        self.assertAlmostEqual(self.duration(clip), 1, places=3)
+
+    def test_chunks_give_the_same_clip_as_the_joined_data(self):
+        data = stream(20, keyframe_every=60)
+        chunks = [data[offset:offset + 4096] for offset in range(0, len(data), 4096)]
+
+        self.assertEqual(cut_chunks(chunks, 5, 1), cut(data, 5, 1))
+
+    def test_no_video_raises(self):
+        with self.assertRaises(ClipError):
+            cut(b"\x00" * 10000, 5)
+
+    def test_keyframes_are_told_by_the_nal_units_of_the_stream_type(self):
+        cases = [
+            # H.264 IDR slice, and a non-IDR slice with nal_ref_idc 1
+            (b"\x65\x88", 0x1b, True),
+            (b"\x21\x9a", 0x1b, False),
+            # HEVC IDR_W_RADL and TRAIL_R pictures
+            (b"\x26\x01", 0x24, True),
+            (b"\x02\x01", 0x24, False),
+            # An H.264 IDR header in a stream of another type
+            (b"\x65\x88", 0x02, False),
+        ]
+        for header, stream_type, keyframe in cases:
+            frames, _ = index(frames_with_nal(header, stream_type))
+            self.assertEqual(len(frames), 30)
+            self.assertEqual({frame.keyframe for frame in frames}, {keyframe}, (header, stream_type))
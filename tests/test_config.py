@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase, mock
+
+import config as config_module
+from config import _Config, read_config, validate
+from constants import CONFIG_BUFFER_SIZE, CONFIG_DEFAULT_VALUES, CONFIG_QUALITY, CONFIG_VERSION, CONFIG_VERSION_KEY
+
+
+class TestConfig(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "config.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, values):
+        with open(self.path, "w") as f:
+            json.dump(values, f)
+
+    def read(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def test_missing_file_is_created_with_defaults(self):
+        config = _Config(self.path)
+
+        self.assertEqual(config[CONFIG_BUFFER_SIZE], CONFIG_DEFAULT_VALUES[CONFIG_BUFFER_SIZE])
+        self.assertEqual(self.read()[CONFIG_VERSION_KEY], CONFIG_VERSION)
+        self.assertEqual(os.listdir(self.directory), ["config.json"])
+
+    def test_invalid_values_fall_back_to_defaults(self):
+        self.write({CONFIG_BUFFER_SIZE: "big", CONFIG_QUALITY: "720p, 480p", CONFIG_VERSION_KEY: 1})
+
+        config = _Config(self.path)
+        config[CONFIG_QUALITY].append("1080p")
+
+        self.assertEqual(config[CONFIG_BUFFER_SIZE], CONFIG_DEFAULT_VALUES[CONFIG_BUFFER_SIZE])
+        self.assertEqual(config[CONFIG_QUALITY], ["720p", "480p", "1080p"])
+        self.assertNotIn("1080p", CONFIG_DEFAULT_VALUES[CONFIG_QUALITY])
+
+    def test_broken_file_is_kept(self):
+        with open(self.path, "w") as f:
+            f.write("{")
+
+        config = _Config(self.path)
+
+        self.assertEqual(config[CONFIG_BUFFER_SIZE], CONFIG_DEFAULT_VALUES[CONFIG_BUFFER_SIZE])
+        self.assertTrue(os.path.exists(self.path + ".bad"))
+
+    def test_setting_invalid_value_raises(self):
+        config = _Config(self.path)
+
+        with self.assertRaises(ValueError):
+            config[CONFIG_BUFFER_SIZE] = 0
+
+    def test_subscribers_can_unsubscribe_while_published(self):
+        config = _Config(self.path)
+
+        class Subscriber:
+            def __init__(self):
+                self.snapshots = []
+
+            def on_config_changed(self, snapshot):
+                self.snapshots.append(snapshot)
+                config.unsubscribe(self.on_config_changed)
+
+        first = Subscriber()
+        config.subscribe(first.on_config_changed)
+        gone = Subscriber()
+        config.subscribe(gone.on_config_changed)
+        del gone
+
+        config.dump()
+        config.dump()
+
+        self.assertEqual(len(first.snapshots), 1)
+
+    def test_save_publishes_at_once_and_writes_later(self):
+        config = _Config(self.path, save_delay=0.05)
+        snapshots = []
+        config.subscribe(snapshots.append)
+
+        config[CONFIG_BUFFER_SIZE] = 5
+        config.save()
+        config[CONFIG_BUFFER_SIZE] = 7
+        config.save()
+
+        self.assertEqual([snapshot.buffer_size for snapshot in snapshots], [5, 7])
+        self.assertNotEqual(self.read()[CONFIG_BUFFER_SIZE], 7)
+        time.sleep(0.2)
+        self.assertEqual(self.read()[CONFIG_BUFFER_SIZE], 7)
+
+    def test_unmodified_file_is_parsed_once(self):
+        _Config(self.path)
+        with mock.patch.object(config_module.json, "load", wraps=json.load) as load:
+            first = read_config(self.path)
+            self.assertEqual(read_config(self.path), first)
+        self.assertEqual(load.call_count, 1)
+
+    def test_files_that_are_not_objects_or_have_no_valid_version_are_broken(self):
+        for values in ([1, 2], "text", None, {CONFIG_VERSION_KEY: "2"}, {CONFIG_VERSION_KEY: None}):
+            with self.assertRaises(ValueError):
+                validate(values)
+
+        self.write([CONFIG_BUFFER_SIZE])
+        config = _Config(self.path)
+
+        self.assertEqual(config[CONFIG_BUFFER_SIZE], CONFIG_DEFAULT_VALUES[CONFIG_BUFFER_SIZE])
+        self.assertTrue(os.path.exists(self.path + ".bad"))
@@ -0,0 +1,49 @@
+import threading
+from unittest import TestCase
+
+from utils import Deferred
+
+
+class TestDeferred(TestCase):
+
+    def test_get_without_start_runs_factory(self):
+        deferred = Deferred(lambda: 42)
+
+        self.assertFalse(deferred.ready)
+        self.assertEqual(deferred.get(), 42)
+        self.assertTrue(deferred.ready)
+
+    def test_factory_runs_once(self):
+        calls = []
+        deferred = Deferred(lambda: calls.append(1))
+
+        deferred.start()
+        deferred.start()
+        deferred.get()
+        deferred.get()
+
+        self.assertEqual(len(calls), 1)
+
+    def test_start_runs_factory_on_another_thread(self):
+        deferred = Deferred(lambda: threading.current_thread().name, name="loader")
+
+        self.assertEqual(deferred.start().get(timeout=5), "loader")
+
+    def test_get_reraises_factory_error(self):
+        def factory():
+            raise OSError("no library")
+        deferred = Deferred(factory)
+
+        with self.assertRaises(OSError):
+            deferred.get()
+        with self.assertRaises(OSError):
+            deferred.get()
+
+    def test_get_times_out(self):
+        release = threading.Event()
+        deferred = Deferred(release.wait).start()
+
+        with self.assertRaises(TimeoutError):
+            deferred.get(timeout=0.01)
+        release.set()
+        self.assertTrue(deferred.get(timeout=5))
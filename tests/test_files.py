@@ -0,0 +1,40 @@
+import os
+import stat
+import tempfile
+import unittest
+from unittest import TestCase
+
+from utils import atomic_write
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+@unittest.skipIf(os.name == "nt", "needs POSIX file modes")
+class TestAtomicWrite(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "file.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_new_files_get_the_mode_of_open(self):
+        with open(os.path.join(self.tmp.name, "opened"), "w"):
+            pass
+
+        atomic_write(self.path, "new")
+
+        self.assertEqual(mode(self.path), mode(os.path.join(self.tmp.name, "opened")))
+
+    def test_replaced_files_keep_their_mode(self):
+        atomic_write(self.path, "old")
+        os.chmod(self.path, 0o640)
+
+        atomic_write(self.path, b"new")
+
+        self.assertEqual(mode(self.path), 0o640)
+        with open(self.path) as f:
+            self.assertEqual(f.read(), "new")
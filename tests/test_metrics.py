@@ -0,0 +1,128 @@
+import time
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+from constants import READ_PROBE_SAMPLE_EVERY
+from containers import LiveStreamContainer
+from metrics import COUNTER_FIELDS, Histogram, MetricsRegistry, ReadProbe, StreamMetrics
+
+
+def media_stats(**values):
+    stats = {field: 0 for field in COUNTER_FIELDS}
+    stats.update(input_bitrate=0.0, demux_bitrate=0.0)
+    stats.update(values)
+    return SimpleNamespace(**stats)
+
+
+class TestStreamMetrics(TestCase):
+
+    def setUp(self):
+        self.metrics = StreamMetrics({"url": "http://www.example.com"})
+
+    def test_first_sample_has_no_rates(self):
+        self.metrics.update(media_stats(read_bytes=1000, input_bitrate=0.5), now=0)
+
+        self.assertEqual(self.metrics.values["read_bytes"], 1000)
+        self.assertEqual(self.metrics.values["read_rate"], 0.0)
+        self.assertEqual(self.metrics.values["input_bitrate_kbps"], 4000.0)
+
+    def test_bitrates_of_libvlc_are_in_bytes_per_microsecond(self):
+        # What libVLC reports for a 6 Mb/s stream
+        self.metrics.update(media_stats(input_bitrate=0.75, demux_bitrate=0.7), now=0)
+
+        self.assertAlmostEqual(self.metrics.values["input_bitrate_kbps"], 6000.0)
+        self.assertAlmostEqual(self.metrics.values["demux_bitrate_kbps"], 5600.0)
+
+    def test_rates_and_deltas(self):
+        self.metrics.update(media_stats(read_bytes=1000, displayed_pictures=30), now=0)
+        self.metrics.update(media_stats(read_bytes=5000, displayed_pictures=90, lost_pictures=2), now=2)
+
+        self.assertEqual(self.metrics.values["read_rate"], 2000)
+        self.assertEqual(self.metrics.values["displayed_fps"], 30)
+        self.assertEqual(self.metrics.values["dropped_pictures"], 2)
+
+    def test_counter_reset(self):
+        self.metrics.update(media_stats(read_bytes=5000), now=0)
+        self.metrics.update(media_stats(read_bytes=1000), now=1)
+
+        self.assertEqual(self.metrics.values["read_rate"], 1000)
+
+    def test_alarm_once_per_spike(self):
+        self.assertIsNone(self.metrics.update(media_stats(displayed_pictures=50), now=0))
+        alarm = self.metrics.update(media_stats(displayed_pictures=60, lost_pictures=10), now=1)
+        repeated = self.metrics.update(media_stats(displayed_pictures=70, lost_pictures=20), now=2)
+        self.metrics.update(media_stats(displayed_pictures=120, lost_pictures=20), now=3)
+
+        self.assertIn("dropped 10 of 20 pictures", alarm)
+        self.assertIsNone(repeated)
+        self.assertFalse(self.metrics.in_alarm)
+
+
+class TestMetricsRegistry(TestCase):
+
+    def test_snapshot_and_retain(self):
+        registry = MetricsRegistry()
+        alarms = []
+        registry.alarm_handlers.append(lambda key, message: alarms.append(key))
+
+        registry.update("a", {"url": "a"}, media_stats(displayed_pictures=10), now=0)
+        registry.update("b", {"url": "b"}, media_stats(), now=0)
+        registry.update("a", {"url": "a"}, media_stats(displayed_pictures=10, lost_pictures=10), now=1)
+        registry.retain(["a"])
+
+        self.assertEqual([stream["url"] for stream in registry.snapshot()], ["a"])
+        self.assertIsNone(registry.get("b"))
+        self.assertEqual(alarms, ["a"])
+
+
+class TestHistogram(TestCase):
+
+    def test_snapshot_is_cumulative(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        snapshot = histogram.snapshot()
+
+        self.assertEqual(snapshot["buckets"], [[0.1, 2], [1.0, 3], [float("inf"), 4]])
+        self.assertEqual(snapshot["count"], 4)
+        self.assertAlmostEqual(snapshot["sum"], 2.65)
+
+
+class TestReadProbe(TestCase):
+
+    def test_measure_samples_the_calls(self):
+        probe = ReadProbe()
+        copied = []
+
+        for i in range(READ_PROBE_SAMPLE_EVERY * 2):
+            probe.measure(lambda buf, data: copied.append(data), None, i, 1.0, 1.5)
+
+        self.assertEqual(copied, list(range(READ_PROBE_SAMPLE_EVERY * 2)))
+        histograms = probe.histograms()
+        for name in ("read_latency", "read_blocked", "read_copy"):
+            self.assertEqual(histograms[name]["count"], 2)
+        self.assertEqual(histograms["read_blocked"]["sum"], 1.0)
+
+    def test_stalls_are_counted_with_the_probe_disabled(self):
+        class SlowStream:
+            def read(self, length):
+                time.sleep(0.02)
+                return b"x" * length
+
+            def close(self):
+                pass
+
+        streams = {"best": SimpleNamespace(open=SlowStream)}
+        container = LiveStreamContainer(None, "test://slow", streams, "best")
+        enabled = ReadProbe.enabled
+        ReadProbe.set_enabled(False)
+        try:
+            with mock.patch("containers.STALL_THRESHOLD", 0.01):
+                container.pull(10)
+        finally:
+            ReadProbe.set_enabled(enabled)
+            container.close()
+
+        self.assertEqual(container.counters()["stalls"], 1)
+        self.assertEqual(container.probe.calls, 0)
@@ -0,0 +1,61 @@
+import json
+from unittest import TestCase
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from metrics import Histogram, MetricsRegistry
+from metricsserver import MetricsServer
+from tests.test_metrics import media_stats
+
+
+class TestMetricsServer(TestCase):
+
+    def setUp(self):
+        histogram = Histogram((0.01, 0.1))
+        histogram.observe(0.05)
+
+        metrics = MetricsRegistry()
+        metrics.update(
+            "tile",
+            {"stream_id": 1, "url": 'http://www.example.com/"quoted"', "quality": "720p"},
+            media_stats(),
+            counters={"bytes_read": 4096},
+            histograms={"read_latency": histogram.snapshot()}
+        )
+
+        self.server = MetricsServer(
+            "127.0.0.1", 0,
+            metrics=metrics,
+            sources=[lambda: {"threads": 3}]
+        ).start()
+        self.url = "http://{}:{}".format(*self.server.address)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def get(self, path):
+        with urlopen(self.url + path, timeout=5) as response:
+            return response.read().decode("utf-8")
+
+    def test_prometheus(self):
+        text = self.get("/metrics")
+        labels = 'stream_id="1",url="http://www.example.com/\\"quoted\\"",quality="720p"'
+
+        self.assertIn("# TYPE dsv_stream_bytes_read_total counter", text)
+        self.assertIn("dsv_stream_bytes_read_total{" + labels + "} 4096", text)
+        self.assertIn("dsv_stream_read_latency_seconds_bucket{" + labels + ',le="0.01"} 0', text)
+        self.assertIn("dsv_stream_read_latency_seconds_bucket{" + labels + ',le="+Inf"} 1', text)
+        self.assertIn("dsv_stream_read_latency_seconds_count{" + labels + "} 1", text)
+        self.assertIn("dsv_threads 3", text)
+
+    def test_json(self):
+        data = json.loads(self.get("/metrics.json"))
+
+        self.assertEqual(data["streams"][0]["bytes_read"], 4096)
+        self.assertEqual(data["streams"][0]["histograms"]["read_latency"]["buckets"][-1], ["+Inf", 1])
+        self.assertEqual(data["process"], {"threads": 3})
+
+    def test_unknown_path(self):
+        with self.assertRaises(HTTPError) as error:
+            self.get("/nope")
+        self.assertEqual(error.exception.code, 404)
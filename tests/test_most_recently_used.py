@@ -0,0 +1,43 @@
+from unittest import TestCase
+
+from utils import MostRecentlyUsed
+
+
+class TestMostRecentlyUsed(TestCase):
+
+    def test_newest_first(self):
+        recent = MostRecentlyUsed(maxlen=3)
+        recent.add("a")
+        recent.add("b")
+        recent.add("c")
+
+        self.assertEqual(list(recent), ["c", "b", "a"])
+        self.assertEqual(recent.newest(), "c")
+
+    def test_readding_moves_to_front(self):
+        recent = MostRecentlyUsed(maxlen=3)
+        recent.add("a", 1)
+        recent.add("b", 2)
+        evicted = recent.add("a", 3)
+
+        self.assertEqual(evicted, [])
+        self.assertEqual(recent.items(), [("a", 3), ("b", 2)])
+
+    def test_evicts_least_recently_used(self):
+        recent = MostRecentlyUsed(maxlen=2)
+        recent.add("a", 1)
+        recent.add("b", 2)
+        recent.add("a", 1)
+        evicted = recent.add("c", 3)
+
+        self.assertEqual(evicted, [("b", 2)])
+        self.assertEqual(list(recent), ["c", "a"])
+        self.assertNotIn("b", recent)
+        self.assertEqual(len(recent), 2)
+
+    def test_empty(self):
+        recent = MostRecentlyUsed(maxlen=2)
+
+        self.assertIsNone(recent.newest())
+        self.assertIsNone(recent.get("a"))
+        self.assertEqual(list(recent), [])
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import threading
+from unittest import TestCase, mock
+
+import record
+from config import cfg
+from metrics import MetricsRegistry
+from record import HeadlessRecorder, StreamIngest
+from recorder import join_all
+
+PACKET = b"\x47" + b"\x00" * 187
+
+
+class EndingStream:
+    """Returns count packets, then ends."""
+
+    def __init__(self, count):
+        self.count = count
+
+    def read(self, length):
+        if not self.count:
+            return b""
+        self.count -= 1
+        return PACKET
+
+    def close(self):
+        pass
+
+
+class EndingStreamOption:
+
+    def __init__(self, count):
+        self.count = count
+
+    def open(self):
+        return EndingStream(self.count)
+
+
+class FakeModel:
+
+    def __init__(self, stream_options):
+        self.stream_options = stream_options
+        self.resolved = 0
+
+    def get_stream_options(self, url):
+        self.resolved += 1
+        return self.stream_options
+
+
+class TestHeadlessRecorder(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = cfg.snapshot()._replace(record_dir=self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @mock.patch.object(record, "HEADLESS_RECONNECT_DELAY", 0.0)
+    def test_resolves_again_and_reconnects_when_the_stream_ends(self):
+        model = FakeModel({"720p": EndingStreamOption(3), "160p": EndingStreamOption(1)})
+        stop = threading.Event()
+        ingest = StreamIngest(model, "sim://x/a", ["1080p", "720p"], self.config, stop)
+
+        original = ingest._read
+
+        def read_and_stop_after_three_connections():
+            total = original()
+            if model.resolved == 3:
+                stop.set()
+            return total
+        ingest._read = read_and_stop_after_three_connections
+        ingest.run()
+
+        container = ingest.container
+        self.assertEqual(container.quality, "720p")
+        self.assertEqual(container.reconnects, 2)
+        self.assertEqual(container.bytes_read, 9 * len(PACKET))
+        # Every connection gets its own file, the container was closed
+        self.assertIsNone(container.recorder)
+        join_all()
+        recorded = sorted(os.listdir(self.tmp.name))
+        self.assertEqual(len(recorded), 3)
+        self.assertEqual(sum(os.path.getsize(os.path.join(self.tmp.name, name)) for name in recorded),
+                         9 * len(PACKET))
+
+    def test_samples_connected_streams_into_the_metrics(self):
+        metrics = MetricsRegistry()
+        model = FakeModel({"720p": EndingStreamOption(2)})
+        recorder = HeadlessRecorder([("sim://x/a", ["720p"]), ("sim://x/b", ["720p"])], self.config, model, metrics)
+        first, second = recorder.ingests
+        first._connect()
+        first._read()
+
+        recorder.sample(now=1.0)
+        first.container.bytes_read += 1000
+        recorder.sample(now=2.0)
+
+        streams = metrics.snapshot()
+        self.assertEqual(len(streams), 1)
+        self.assertEqual(streams[0]["url"], "sim://x/a")
+        self.assertEqual(streams[0]["bytes_read"], 2 * len(PACKET) + 1000)
+        self.assertAlmostEqual(streams[0]["input_bitrate_kbps"], 8.0)
+        first.container.close()
@@ -0,0 +1,145 @@
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest import TestCase
+
+from config import cfg
+from containers import LiveStreamContainer
+from recorder import Recorder, enforce_quota, recording_name
+
+PACKET = b"\x47" + b"\x00" * 187
+
+
+class TestRecorder(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, "recordings")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_files(self, recorder):
+        contents = []
+        for path in recorder.files:
+            with open(path, "rb") as f:
+                contents.append(f.read())
+        return contents
+
+    def test_writes_the_chunks_in_order(self):
+        recorder = Recorder("1-stream", self.directory)
+        chunks = [(b"\x47" + bytes([i]) * 187) * 5 for i in range(50)]
+        for chunk in chunks:
+            recorder.write(chunk)
+        recorder.stop()
+        recorder.join()
+
+        self.assertEqual(self.read_files(recorder), [b"".join(chunks)])
+        self.assertEqual(recorder.bytes_written, 50 * 5 * 188)
+
+    def test_starts_on_the_first_whole_packet(self):
+        recorder = Recorder("1-stream", self.directory, segment_seconds=0)
+        # Started in the middle of a packet whose rest holds a stray sync byte
+        data = b"\x00\x47\x00" + PACKET * 10
+        for start in range(0, len(data), 100):
+            recorder.write(data[start:start + 100])
+        recorder.stop()
+        recorder.join()
+
+        files = self.read_files(recorder)
+        self.assertEqual(b"".join(files), PACKET * 10)
+        for content in files:
+            self.assertEqual(len(content) % len(PACKET), 0)
+            self.assertEqual(content[:1], b"\x47")
+
+    def test_rotates_on_packet_boundaries(self):
+        recorder = Recorder("1-stream", self.directory, segment_seconds=0)
+        # Chunks that end in the middle of a packet
+        data = PACKET * 10
+        for start in range(0, len(data), 300):
+            recorder.write(data[start:start + 300])
+        recorder.stop()
+        recorder.join()
+
+        files = self.read_files(recorder)
+        self.assertGreater(len(files), 1)
+        self.assertEqual(b"".join(files), data)
+        for content in files:
+            self.assertEqual(len(content) % len(PACKET), 0)
+            self.assertEqual(content[:1], b"\x47")
+
+    def test_rotate_starts_a_new_file(self):
+        recorder = Recorder("1-stream", self.directory)
+        recorder.write(PACKET)
+        recorder.rotate()
+        recorder.write(PACKET * 2)
+        recorder.stop()
+        recorder.join()
+
+        self.assertEqual(self.read_files(recorder), [PACKET, PACKET * 2])
+
+    def test_quota_deletes_the_oldest_recordings(self):
+        os.makedirs(self.directory)
+        paths = []
+        for i in range(4):
+            path = os.path.join(self.directory, "{}.ts".format(i))
+            with open(path, "wb") as f:
+                f.write(b"\x00" * 100)
+            os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+            paths.append(path)
+
+        deleted = enforce_quota(self.directory, 250)
+
+        self.assertEqual(deleted, paths[:2])
+        self.assertEqual(sorted(os.listdir(self.directory)), ["2.ts", "3.ts"])
+
+    def test_recording_names_are_safe_file_names(self):
+        self.assertEqual(recording_name(3, "https://www.twitch.tv/some_one?x=1"), "3-twitch_tv_some_one_x_1")
+
+
+class PacketStream:
+
+    def __init__(self, fill):
+        self.fill = fill
+
+    def read(self, length):
+        return (b"\x47" + bytes([self.fill]) * 187) * 4
+
+    def close(self):
+        pass
+
+
+class TestContainerRecording(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_quality_change_records_into_a_new_file(self):
+        streams = {
+            "480p": SimpleNamespace(open=lambda: PacketStream(1)),
+            "720p": SimpleNamespace(open=lambda: PacketStream(2)),
+        }
+        config = cfg.snapshot()._replace(record_dir=self.tmp.name, worker_processes=False)
+        container = LiveStreamContainer(None, "test://stream", streams, "480p", config=config)
+        container.start_recording()
+        container.pull(752)
+
+        # libVLC closes the media whenever the player stops, e.g. for a quality change
+        container.close()
+        container.change_stream_quality("720p")
+        container.pull(752)
+        self.assertTrue(container.recording)
+        recorder = container.recorder
+        container.stop_recording()
+        recorder.join()
+        container.close()
+
+        contents = []
+        for path in recorder.files:
+            with open(path, "rb") as f:
+                contents.append(f.read())
+        self.assertEqual([content[1:2] for content in contents], [b"\x01", b"\x02"])
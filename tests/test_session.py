@@ -0,0 +1,180 @@
+import os
+import tempfile
+import time
+from unittest import TestCase
+
+from PyQt5 import QtCore
+
+import session
+from models.coordinates import VideoFrameCoordinates
+from session import SessionRestorer, grid_order
+
+
+class TestGridOrder(TestCase):
+
+    def test_tiles_are_sorted_in_the_order_the_grid_fills(self):
+        tiles = [{"url": str(i), "x": x, "y": y} for i, (x, y) in enumerate([(1, 1), (0, 1), (1, 0), (0, 0)])]
+
+        self.assertEqual([tile["url"] for tile in grid_order(tiles)], ["3", "1", "2", "0"])
+
+
+class FakeSlider:
+
+    def __init__(self):
+        self.volume = 100
+
+    def value(self):
+        return self.volume
+
+    def setValue(self, volume):
+        self.volume = volume
+
+
+class FakePlayer:
+
+    def audio_set_mute(self, muted):
+        pass
+
+
+class FakeStream:
+
+    def __init__(self, url, quality):
+        self.url = url
+        self.quality = quality
+
+
+class FakeFrame:
+
+    def __init__(self, url, quality, coordinates):
+        self.stream = FakeStream(url, quality)
+        self.is_muted = False
+        self.volume_slider = FakeSlider()
+        self.player = FakePlayer()
+        self._coordinates = coordinates
+
+
+class FakeGrid:
+
+    def __init__(self):
+        self.coordinates = VideoFrameCoordinates(x=0, y=0)
+        self.videoframes = []
+
+
+class FakeModel:
+    """Resolves the urls in streams, after the delay of the url if any."""
+
+    def __init__(self, streams, delays):
+        self.streams = streams
+        self.delays = delays
+
+    def get_stream_options(self, url):
+        time.sleep(self.delays.get(url, 0))
+        return self.streams.get(url)
+
+    def save_stream_to_history(self, url, quality):
+        pass
+
+
+class FakeWindow(QtCore.QObject):
+    """Has the parts of an ApplicationWindow sessions use."""
+
+    def __init__(self, primary=None, streams=None, delays=None):
+        super(FakeWindow, self).__init__()
+        self.primary = primary or self
+        self.windows = self.primary.windows if primary is not None else []
+        self.windows.append(self)
+        self.grid = FakeGrid()
+        self.model = primary.model if primary is not None else FakeModel(streams or {}, delays or {})
+        self.geometry = "window {}".format(len(self.windows)).encode()
+
+    def open_window(self):
+        return FakeWindow(self.primary)
+
+    def saveGeometry(self):
+        return QtCore.QByteArray(self.geometry)
+
+    def restoreGeometry(self, geometry):
+        self.geometry = bytes(geometry)
+
+    def isMaximized(self):
+        return False
+
+    def setup_videoframe(self, url, stream_options, quality):
+        self.grid.videoframes.append(FakeFrame(url, quality, self.grid.coordinates))
+        self.grid.coordinates = self.grid.coordinates.update_coordinates()
+
+    def show_loading_gif(self):
+        pass
+
+    def hide_loading_gif(self):
+        pass
+
+
+def tiles(window):
+    return [
+        (index, frame.stream.url, frame.stream.quality, frame._coordinates.x, frame._coordinates.y)
+        for index, open_window in enumerate(window.windows)
+        for frame in open_window.grid.videoframes
+    ]
+
+
+class TestSessionRestorer(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # The resolved streams are handed to the restorer through the event loop
+        cls.app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "session.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def restore(self, saved, streams, delays=None):
+        window = FakeWindow(streams=streams, delays=delays)
+        restorer = SessionRestorer(window, saved)
+        done = []
+        restorer.finished.connect(lambda restored, seconds: done.append(restored))
+        restorer.start()
+        end = time.monotonic() + 5
+        while not done and time.monotonic() < end:
+            self.app.processEvents()
+            time.sleep(0.01)
+        self.assertTrue(done, "the restore did not finish")
+        return window
+
+    def test_restores_every_window_in_order(self):
+        saved_window = FakeWindow()
+        saved_window.open_window()
+        for index, url in enumerate(["a", "b", "c", "d", "e"]):
+            saved_window.windows[index % 2].setup_videoframe(url, None, "720p")
+        session.save(saved_window, self.path)
+
+        streams = {url: {"720p": url} for url in "abcde"}
+        # The first streams resolve last
+        delays = {"a": 0.3, "c": 0.2}
+        window = self.restore(session.load(self.path), streams, delays)
+
+        self.assertEqual(tiles(window), tiles(saved_window))
+        self.assertEqual([w.geometry for w in window.windows], [b"window 1", b"window 2"])
+
+    def test_leaves_the_position_of_unresolved_streams_empty(self):
+        saved_window = FakeWindow()
+        for url in ["a", "b", "c"]:
+            saved_window.setup_videoframe(url, None, "720p")
+
+        window = self.restore(session.capture(saved_window), {"a": {"720p": "a"}, "c": {"720p": "c"}})
+
+        self.assertEqual(tiles(window), [(0, "a", "720p", 0, 0), (0, "c", "720p", 1, 0)])
+
+    def test_falls_back_to_the_quality_priority(self):
+        saved_window = FakeWindow()
+        saved_window.setup_videoframe("a", None, "1080p60")
+        saved_window.setup_videoframe("b", None, "1080p60")
+
+        streams = {"a": {"160p": "a", "480p": "a", "best": "a"}, "b": {"source": "b"}}
+        window = self.restore(session.capture(saved_window), streams)
+
+        self.assertEqual([frame.stream.quality for frame in window.grid.videoframes], ["480p", "source"])
@@ -0,0 +1,56 @@
+from unittest import TestCase
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from sim.mpegts import PACKET_SIZE, VIDEO_PID, crc32_mpeg, generate_segment
+from sim.server import DEFAULT_OPTIONS, SimulatorServer, media_playlist, parse_options
+
+
+class TestMpegTs(TestCase):
+
+    def test_crc(self):
+        self.assertEqual(crc32_mpeg(b"123456789"), 0x0376e6e7)
+
+    def test_segment_is_packetized_at_the_bitrate(self):
+        segment = generate_segment(3, 2.0, 800000)
+
+        self.assertEqual(len(segment) % PACKET_SIZE, 0)
+        self.assertTrue(all(segment[i] == 0x47 for i in range(0, len(segment), PACKET_SIZE)))
+        self.assertAlmostEqual(len(segment) * 8 / 2.0, 800000, delta=800000 * 0.05)
+
+    def test_continuity_carries_on_between_segments(self):
+        def video_counters(segment):
+            return [segment[i + 3] & 0x0f for i in range(0, len(segment), PACKET_SIZE)
+                    if ((segment[i + 1] & 0x1f) << 8 | segment[i + 2]) == VIDEO_PID]
+
+        first = video_counters(generate_segment(0, 1.0, 300000))
+        second = video_counters(generate_segment(1, 1.0, 300000))
+
+        self.assertEqual(second[0], (first[-1] + 1) & 0x0f)
+
+
+class TestSimulatorServer(TestCase):
+
+    def setUp(self):
+        self.server = SimulatorServer(port=0).start()
+        host, port = self.server.address
+        self.base = "http://{}:{}/test".format(host, port)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_serves_live_segments(self):
+        playlist = urlopen(self.base + "/360p/index.m3u8").read().decode("ascii")
+        segment = playlist.splitlines()[-1]
+
+        self.assertEqual(len(urlopen(self.base + "/360p/" + segment).read()) % PACKET_SIZE, 0)
+        with self.assertRaises(HTTPError):
+            urlopen(self.base + "/360p/1000.ts")
+
+    def test_query_overrides_options(self):
+        options = parse_options("jitter=0.5&playlist_size=3&bogus=1&expiry=x")
+
+        self.assertEqual(options.jitter, 0.5)
+        self.assertEqual(options.playlist_size, 3)
+        self.assertEqual(options.expiry, DEFAULT_OPTIONS.expiry)
+        self.assertIn("#EXT-X-MEDIA-SEQUENCE:7", media_playlist(9, options))
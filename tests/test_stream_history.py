@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from models.history import StreamHistory, search_key
+
+
+class TestStreamHistory(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.history_file = os.path.join(self.directory, "history.txt")
+        self.history = None
+
+    def tearDown(self):
+        if self.history is not None:
+            self.history.close()
+        shutil.rmtree(self.directory)
+
+    def open(self):
+        if self.history is not None:
+            self.history.close()
+        self.history = StreamHistory(
+            os.path.join(self.directory, "history.db"),
+            flush_interval=0,
+            history_file=self.history_file
+        )
+        return self.history
+
+    def test_search_ranks_by_play_count(self):
+        history = self.open()
+        history.record("http://www.twitch.tv/b")
+        for _ in range(3):
+            history.record("http://www.twitch.tv/a", "720p", 0.5)
+        history.record("http://www.youtube.com/c")
+        history.flush()
+
+        self.assertEqual(history.search("twitch.tv/"), ["http://www.twitch.tv/a", "http://www.twitch.tv/b"])
+        self.assertEqual(history.search("https://www.YouTube"), ["http://www.youtube.com/c"])
+        played = history.get("http://www.twitch.tv/a")
+        self.assertEqual((played["play_count"], played["last_quality"]), (3, "720p"))
+
+    def test_last_session(self):
+        with open(self.history_file, "w") as f:
+            f.write("http://www.twitch.tv/old\n")
+        history = self.open()
+        history.record("http://www.twitch.tv/new")
+        history.flush()
+
+        self.assertEqual(history.last_session(), ["http://www.twitch.tv/old"])
+        self.assertFalse(os.path.exists(self.history_file))
+        self.assertEqual(self.open().last_session(), ["http://www.twitch.tv/new"])
+
+    def test_search_key(self):
+        self.assertEqual(search_key("https://www.Twitch.tv/a"), "twitch.tv/a")
@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from models import StreamModel, StreamResolver
+
+
+class FakeHistory:
+
+    def last_session(self):
+        return []
+
+
+class FakeSession:
+
+    def __init__(self):
+        self.resolved = []
+
+    def streams(self, url):
+        self.resolved.append(url)
+        return {"720p": url}
+
+
+class TestSharedResolver(TestCase):
+
+    def test_windows_resolve_a_stream_once(self):
+        resolver = StreamResolver()
+        session = FakeSession()
+        resolver._streamlink_session.get = lambda: session
+        first = StreamModel(None, resolver, FakeHistory())
+        second = StreamModel(None, resolver, FakeHistory())
+
+        self.assertEqual(first.get_stream_options("sim://x/a"), {"720p": "sim://x/a"})
+        self.assertEqual(second.get_stream_options("sim://x/a"), {"720p": "sim://x/a"})
+
+        self.assertEqual(session.resolved, ["sim://x/a"])
+        self.assertEqual(second.resolver_stats()["resolver_cache_hits"], 1)
@@ -0,0 +1,59 @@
+import io
+import logging
+from unittest import TestCase
+
+from vlclog import StreamLog, VlcLogBridge
+
+
+class FakeInstance:
+
+    def log_set(self, callback, data):
+        pass
+
+
+class TestStreamLog(TestCase):
+
+    def setUp(self):
+        self.log = StreamLog("stream 1", min_level=0, capacity=3)
+        self.logger = logging.getLogger("test_vlclog")
+
+    def test_repeated_messages_are_counted_until_flushed(self):
+        for _ in range(3):
+            self.log.append(3, "ts", "discontinuity")
+        self.log.append(4, "avcodec", "decoder error")
+
+        with self.assertLogs(self.logger, logging.WARNING) as logs:
+            self.log.flush(self.logger)
+
+        self.assertEqual(logs.output, [
+            "WARNING:test_vlclog:[stream 1] ts: discontinuity (repeated 3 times)",
+            "ERROR:test_vlclog:[stream 1] avcodec: decoder error",
+        ])
+
+        self.log.append(3, "ts", "discontinuity")
+        self.assertEqual([entry[4] for entry in self.log.entries], [3, 1, 1])
+
+    def test_ring_is_bounded(self):
+        for i in range(5):
+            self.log.append(3, "ts", "message {}".format(i))
+
+        f = io.StringIO()
+        self.log.dump(f)
+
+        self.assertEqual(len(self.log.entries), 3)
+        self.assertIn("message 4", f.getvalue())
+        self.assertNotIn("message 1", f.getvalue())
+
+
+class TestVlcLogBridge(TestCase):
+
+    def test_keeps_attached_logs_and_bounds_closed_ones(self):
+        bridge = VlcLogBridge(keep=2)
+        bridge._callback = object()
+        logs = [bridge.attach(FakeInstance(), "stream {}".format(i)) for i in range(4)]
+
+        self.assertEqual(bridge.logs, logs[::-1])
+
+        for log in logs[:3]:
+            bridge.detach(log)
+        self.assertEqual(bridge.logs, [logs[3], logs[2], logs[1]])
@@ -0,0 +1,107 @@
+import os
+import signal
+import threading
+import time
+import unittest
+from unittest import TestCase
+
+import workers
+from models.model import create_streamlink_session
+from sim.server import SimulatorServer
+from workers import _HEADER_SIZE, Ring, WorkerStream
+
+
+def ring(capacity):
+    return Ring(memoryview(bytearray(_HEADER_SIZE + capacity)), capacity, threading.Event(), threading.Event())
+
+
+class TestRing(TestCase):
+
+    def test_wraps_around(self):
+        buffer = ring(100)
+        stop = threading.Event()
+        for i in range(10):
+            data = bytes([i]) * 70
+            self.assertTrue(buffer.write(data, stop))
+            self.assertEqual(buffer.read(50) + buffer.read(50), data)
+        self.assertEqual(buffer.read(50), b"")
+
+    def test_writer_waits_for_the_reader(self):
+        buffer = ring(64)
+        data = os.urandom(10000)
+        stop = threading.Event()
+        writer = threading.Thread(target=buffer.write, args=(data, stop))
+        writer.start()
+
+        received = b""
+        while len(received) < len(data):
+            buffer.data_ready.wait(1)
+            buffer.data_ready.clear()
+            received += buffer.read(48)
+        writer.join()
+
+        self.assertEqual(received, data)
+
+    def test_stop_ends_a_waiting_write(self):
+        buffer = ring(10)
+        stop = threading.Event()
+        stop.set()
+
+        self.assertFalse(buffer.write(b"x" * 20, stop))
+        self.assertEqual(buffer.read(20), b"x" * 10)
+
+
+@unittest.skipUnless(workers.available, "needs multiprocessing.shared_memory")
+class TestWorkerStream(TestCase):
+
+    def setUp(self):
+        self.server = SimulatorServer(port=0).start()
+        self.url = "sim://{}:{}/test?transport=http".format(*self.server.address)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def read_for(self, stream, seconds):
+        data = b""
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            data += stream.read(65536)
+        return data
+
+    def test_restarts_a_killed_worker(self):
+        stream = WorkerStream(self.url, "160p")
+        try:
+            self.assertEqual(self.read_for(stream, 1)[:1], b"\x47")
+            os.kill(stream.pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+
+            self.assertTrue(self.read_for(stream, 1))
+            self.assertEqual(stream.restarts, 1)
+        finally:
+            stream.close()
+        self.assertEqual(stream.read(10), b"")
+
+    def test_opens_the_resolved_stream(self):
+        for transport in ("http", "hls"):
+            url = "sim://{}:{}/test?transport={}".format(*self.server.address, transport)
+            resolved = create_streamlink_session().streams(url)["160p"]
+            self.assertIsNotNone(workers.stream_spec(resolved))
+
+            stream = WorkerStream(url, "160p", resolved)
+            try:
+                self.assertEqual(self.read_for(stream, 1)[:1], b"\x47")
+            finally:
+                stream.close()
+
+    def test_falls_back_to_the_quality_priority(self):
+        stream = WorkerStream(self.url, "4320p", None, ["4320p", "160p"])
+        try:
+            self.assertEqual(self.read_for(stream, 1)[:1], b"\x47")
+        finally:
+            stream.close()
+
+        stream = WorkerStream(self.url, "4320p")
+        try:
+            self.assertEqual(stream.read(10), b"")
+            self.assertEqual(stream.restarts, 0)
+        finally:
+            stream.close()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Loads the Qt Designer .ui files used by the application.
+
+Parsing the .ui XML with uic.loadUi is slow and happens on the GUI thread, for
+frames once per added tile. If compile_ui.py has been run, the generated
+Python modules in UI_COMPILED_DIR are used instead, falling back to runtime
+parsing whenever a module is missing or older than its .ui file.
+"""
+
+import importlib.util
+import os
+
+from PyQt5 import uic
+
+from constants import UI_COMPILED_DIR, UI_COMPILED_SUFFIX
+
+# Maps a .ui file to its compiled Ui_* class, or None if it has to be parsed.
+_ui_classes = {}
+
+
+def compiled_module_path(ui_file):
+    """Returns the path of the compiled Python module for the .ui file."""
+    name = os.path.splitext(os.path.basename(ui_file))[0]
+    return os.path.join(UI_COMPILED_DIR, name + UI_COMPILED_SUFFIX)
+
+
+def _is_up_to_date(ui_file, module_path):
+    try:
+        return os.path.getmtime(module_path) >= os.path.getmtime(ui_file)
+    except OSError:
+        return False
+
+
+def _import_ui_class(ui_file):
+    """Imports the Ui_* class from the compiled module of the .ui file."""
+    module_path = compiled_module_path(ui_file)
+    if not _is_up_to_date(ui_file, module_path):
+        return None
+
+    module_name = os.path.splitext(os.path.basename(module_path))[0]
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except (ImportError, SyntaxError):
+        return None
+
+    for name in dir(module):
+        if name.startswith("Ui_"):
+            return getattr(module, name)
+    return None
+
+
+def ui_class(ui_file):
+    """Returns the compiled Ui_* class for the .ui file, None if unavailable."""
+    if ui_file not in _ui_classes:
+        _ui_classes[ui_file] = _import_ui_class(ui_file)
+    return _ui_classes[ui_file]
+
+
+def load_ui(ui_file, widget):
+    """Builds the .ui file into the widget, same as uic.loadUi(ui_file, widget).
+
+    All named children are set as attributes on the widget, exactly like
+    uic.loadUi does, so callers don't have to care which path was taken.
+    """
+    compiled = ui_class(ui_file)
+    if compiled is None:
+        return uic.loadUi(ui_file, widget)
+
+    ui = compiled()
+    ui.setupUi(widget)
+    widget.__dict__.update(vars(ui))
+    return widget
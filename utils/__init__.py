@@ -1,3 +1,7 @@
 from utils.OS import OS
+from utils.deferred import Deferred
+from utils.files import atomic_write
+from utils.mru import MostRecentlyUsed
+from utils.process import process_stats
 
-__all__ = ['OS']
+__all__ = ['OS', 'Deferred', 'atomic_write', 'MostRecentlyUsed', 'process_stats']
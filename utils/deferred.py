@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+
+class Deferred:
+    """A value that is expensive to create and thus built on a background thread.
+
+    The factory runs at most once, either on a background thread after start()
+    or on the calling thread if get() is called before anything was started.
+    Exceptions raised by the factory are re-raised by get().
+
+    Args:
+        factory (callable): Creates the value, takes no arguments.
+        name (str): Name of the loader thread, handy when debugging.
+    """
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self._name = name
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._started = False
+        self._value = None
+        self._error = None
+
+    @property
+    def ready(self):
+        """True once the factory has finished, successfully or not."""
+        return self._done.is_set()
+
+    def _claim(self):
+        """Marks the factory as started, returns False if it already was."""
+        with self._lock:
+            if self._started:
+                return False
+            self._started = True
+            return True
+
+    def _run(self):
+        try:
+            self._value = self._factory()
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done.set()
+
+    def start(self):
+        """Starts creating the value on a background thread."""
+        if self._claim():
+            threading.Thread(target=self._run, name=self._name, daemon=True).start()
+        return self
+
+    def get(self, timeout=None):
+        """Returns the value, blocking until it has been created."""
+        if self._claim():
+            self._run()
+        if not self._done.wait(timeout):
+            raise TimeoutError("Timed out waiting for " + (self._name or "deferred value"))
+        if self._error is not None:
+            raise self._error
+        return self._value
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import os
+import stat
+import tempfile
+
+
+def _umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Read once on import, reading it means setting it, which is not thread safe
+_UMASK = _umask()
+
+
+def atomic_write(path, text):
+    """Replaces the file with the text, or bytes, so that a crash while
+    writing leaves either the old or the new file. The file keeps its mode,
+    a new one gets the mode open() would give it. Exceptions are not handled."""
+    directory = os.path.dirname(os.path.abspath(path))
+    name = os.path.basename(path)
+
+    fd, temp_path = tempfile.mkstemp(prefix="." + name + "-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, mode='wb' if isinstance(text, bytes) else 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file readable by its owner only
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
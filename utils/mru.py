@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+
+
+class MostRecentlyUsed:
+    """An ordered mapping of the most recently used keys, capped in size.
+
+    Adding a key moves it to the front in constant time and evicts the least
+    recently used keys once there are more than maxlen of them.
+
+    Args:
+        maxlen (int): Maximum number of keys kept.
+    """
+
+    def __init__(self, maxlen):
+        self.maxlen = maxlen
+        # Ordered from least to most recently used
+        self._items = OrderedDict()
+
+    def add(self, key, value=None):
+        """Marks key as the most recently used one.
+
+        Returns:
+            list: The (key, value) pairs that were evicted to stay within maxlen.
+        """
+        if key in self._items:
+            self._items.move_to_end(key)
+        self._items[key] = value
+
+        evicted = []
+        while len(self._items) > self.maxlen:
+            evicted.append(self._items.popitem(last=False))
+        return evicted
+
+    def get(self, key, default=None):
+        return self._items.get(key, default)
+
+    def newest(self):
+        """Returns the most recently used key, or None if there are none."""
+        for key in reversed(self._items):
+            return key
+        return None
+
+    def items(self):
+        """Returns the (key, value) pairs, most recently used first."""
+        return [(key, self._items[key]) for key in reversed(self._items)]
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __iter__(self):
+        return reversed(self._items)
+
+    def __len__(self):
+        return len(self._items)
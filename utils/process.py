@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+def _resident_memory():
+    """Returns the resident set size in bytes, or None if unknown."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+
+    if resource is not None:
+        # Only the peak is available, in bytes on macOS and kilobytes elsewhere
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    return None
+
+
+def process_stats():
+    """Returns the memory, CPU time and thread count of this process."""
+    times = os.times()
+    return {
+        "resident_memory_bytes": _resident_memory(),
+        "cpu_seconds": times.user + times.system,
+        "threads": threading.active_count(),
+    }
@@ -12,7 +12,8 @@ class VideoFrameGrid(QtWidgets.QGridLayout):
 
     The VideoFrameGrid keeps track of the position of all LiveVideoFrames and
     is in charge of reparenting a VideoFrame back to it's original position
-    after a toggled fullscreen mode.
+    after a toggled fullscreen mode. Frames can be moved to the grids of the
+    other windows, see move_frame().
     """
 
     def __init__(self, parent):
@@ -29,7 +30,10 @@ class VideoFrameGrid(QtWidgets.QGridLayout):
         self.selected_frame = None
         self.fullscreen = False
         self.window_state = self.parent.windowState()
-        self.url_list = []
+        self.stats_overlay_visible = False
+        self.recording = False
+        # The AudioFocusManager of the windows, if any
+        self.audio_focus = None
 
     def _add_videoframe(self, videoframe):
         """Adds the provided videoframeobject to the VideoFrameGrid."""
@@ -41,18 +45,58 @@ class VideoFrameGrid(QtWidgets.QGridLayout):
         """Creates a new LiveVideoFrame object."""
         return LiveVideoFrame(self.parent, stream_url, stream_options, quality)
 
-    def add_new_videoframe(self, stream_url, stream_options, quality):
-        """Creates and adds a new LiveVideoFrame to the VideoFrameGrid."""
-        videoframe = self._create_videoframe(stream_url, stream_options, quality)
+    def _attach(self, videoframe):
+        """Hands the frame the callbacks of this grid and adds it."""
         videoframe._swap = self.swap_frame
         videoframe._fullscreen = self.toggle_fullscreen
         videoframe._coordinates = self.coordinates
         videoframe._delete_stream = self.delete_stream
+        videoframe._focus = self.focus_frame
+        videoframe._move = self.move_frame
+        videoframe._move_targets = self.move_targets
+        videoframe.set_stats_overlay_visible(self.stats_overlay_visible)
+        if self.recording:
+            videoframe.set_recording(True)
         self._add_videoframe(videoframe)
 
-        if stream_url in self.url_list:
-            self.url_list.remove(stream_url)
-        self.url_list.insert(0, stream_url)
+    def add_new_videoframe(self, stream_url, stream_options, quality):
+        """Creates and adds a new LiveVideoFrame to the VideoFrameGrid."""
+        videoframe = self._create_videoframe(stream_url, stream_options, quality)
+        self._attach(videoframe)
+
+    def move_targets(self):
+        """Returns the grids of the other windows, in the order they were opened."""
+        return [window.grid for window in getattr(self.parent, "windows", ()) if window.grid is not self]
+
+    def move_frame(self, videoframe, grid):
+        """Moves the frame with its player and stream to the end of another
+        grid, e.g. in a window on another monitor."""
+        if self.fullscreen:
+            self.toggle_fullscreen(videoframe, force_minimize=True)
+        if self.selected_frame is videoframe:
+            self.selected_frame = None
+        if videoframe.selected:
+            videoframe.deselect()
+        self.take_videoframe(videoframe)
+        grid.adopt_videoframe(videoframe)
+
+    def adopt_videoframe(self, videoframe):
+        """Adds a frame taken from another grid at the next position."""
+        videoframe.setParent(self.parent)
+        self._attach(videoframe)
+        videoframe.show()
+
+    def set_stats_overlay_visible(self, visible):
+        """Shows or hides the performance overlay on all frames."""
+        self.stats_overlay_visible = visible
+        for videoframe in self.videoframes:
+            videoframe.set_stats_overlay_visible(visible)
+
+    def set_recording(self, recording):
+        """Starts or stops recording all frames, including the ones added later."""
+        self.recording = recording
+        for videoframe in self.videoframes:
+            videoframe.set_recording(recording)
 
     def swap_frame(self, frame):
         """Swaps the provided VideoFrame with the currently selected one."""
@@ -76,6 +120,11 @@ class VideoFrameGrid(QtWidgets.QGridLayout):
             else:
                 self.selected_frame = frame
 
+    def focus_frame(self, videoframe):
+        """Gives the frame the audio focus."""
+        if self.audio_focus is not None:
+            self.audio_focus.focus(videoframe)
+
     def toggle_fullscreen(self, selected_frame, force_minimize=False):
         if not self.fullscreen and not force_minimize:
             for videoframe in self.videoframes:
@@ -87,6 +136,7 @@ class VideoFrameGrid(QtWidgets.QGridLayout):
             self.window_state = self.parent.windowState()
             self.parent.showFullScreen()
             self.fullscreen = True
+            self.focus_frame(selected_frame)
 
         elif self.fullscreen:
             for videoframe in self.videoframes:
@@ -102,12 +152,17 @@ class VideoFrameGrid(QtWidgets.QGridLayout):
         """Removes selected stream/videoframe from grid"""
 
         videoframe.hide()
+        self.take_videoframe(videoframe)
+        sip.delete(videoframe)
 
+    def take_videoframe(self, videoframe):
+        """Removes the frame from the grid without deleting it, the frames
+        after it move up to close the gap."""
         # If one or two frames
         if len(self.videoframes) < 3:
-            # Reset coordinates and delete frame
+            # Reset coordinates and remove frame
             self.coordinates = VideoFrameCoordinates(x=0, y=0)
-            self.delete_videoframe(videoframe)
+            self._remove_videoframe(videoframe)
             # If one frame left after deletion
             if len(self.videoframes) == 1:
                 # Set last frame's coordinates to (0,0) and update coordinates
@@ -125,8 +180,8 @@ class VideoFrameGrid(QtWidgets.QGridLayout):
             index = self.videoframes.index(videoframe)
             frames_to_move = self.videoframes[index + 1:]
 
-            # Delete frame and all its children
-            self.delete_videoframe(videoframe)
+            # Remove frame and all its children
+            self._remove_videoframe(videoframe)
 
             # Move remaining frames
             for frame in frames_to_move:
@@ -150,11 +205,14 @@ class VideoFrameGrid(QtWidgets.QGridLayout):
 
     def delete_videoframe(self, videoframe):
         """Deletes a videoframe and all its children from grid"""
-        self.videoframes.remove(videoframe)
-        self.removeWidget(videoframe)
+        self._remove_videoframe(videoframe)
         sip.delete(videoframe)
         videoframe = None
 
+    def _remove_videoframe(self, videoframe):
+        self.videoframes.remove(videoframe)
+        self.removeWidget(videoframe)
+
     def update_new_stream_coordinates(self):
         """Prepares coordinates for next stream"""
         self.coordinates = self.coordinates.update_coordinates()
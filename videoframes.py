@@ -1,21 +1,48 @@
 # -*- coding: utf-8 -*-
 
+import importlib
 import platform
 import sys
+import threading
 import webbrowser
 import os as os2
 
-from PyQt5 import QtWidgets, QtCore, uic
+from PyQt5 import QtWidgets, QtCore, QtGui
 from urllib.parse import urlparse, urlunparse
 
-import vlc
+import clips
 from constants import (
-    FRAME_SELECT_STYLE, CONFIG_MUTE, CONFIG_BUFFER_STREAM,
-    BUTTON_PAUSE, BUTTON_PLAY
+    FRAME_SELECTED_PROPERTY, CONFIG_BUFFER_STREAM, CLIP_DEFAULT_SECONDS,
+    PAUSE_ICON, PLAY_ICON, FRAME_UI_FILE, REWOUND_FRAME_UI_FILE
 )
 from containers import LiveStreamContainer, RewoundStreamContainer
-from utils import OS
+from recorder import recording_name
+from overlay import StatsOverlay
+from utils import OS, Deferred
 from config import cfg
+from profiling import profiler
+from uiloader import load_ui
+from vlclog import bridge
+
+
+def _load_libvlc():
+    """Imports the libVLC bindings, which loads the libVLC shared library."""
+    with profiler.span("libvlc"):
+        return importlib.import_module("vlc")
+
+
+# The vlc module, loaded in the background by calling libvlc.start()
+libvlc = Deferred(_load_libvlc, name="libvlc")
+
+# Icons shared by all frames, so every image file is only read once
+_icons = {}
+
+
+def _icon(path):
+    """Returns the cached icon for the image file."""
+    if path not in _icons:
+        _icons[path] = QtGui.QIcon(path)
+    return _icons[path]
 
 
 class _VideoFrame(QtWidgets.QFrame):
@@ -28,12 +55,13 @@ class _VideoFrame(QtWidgets.QFrame):
     def __init__(self, parent):
         super(_VideoFrame, self).__init__(parent)
         # Opengl performs better on windows, which is odd
-        self.vlc_instance = vlc.Instance(
-            "--quiet " +           # Dont print stuff to stdout
+        self.vlc_instance = libvlc.get().Instance(
             "--no-xlib " +         # Turn off XInitThreads()
             "--vout=opengl " +     # Force OpenGL as vout module for better performance on windows
             "--avcodec-threads=0"  # Number of threads used for decoding, 0 meaning auto
         )
+        # Log through Python instead of printing to stdout, tagged once the stream is known
+        self.vlc_log = bridge.attach(self.vlc_instance, "frame")
         self.player = self.vlc_instance.media_player_new()
         # Remove input handling from vlc, and give it back
         self.player.video_set_mouse_input(False)
@@ -44,16 +72,24 @@ class _VideoFrame(QtWidgets.QFrame):
         self.setup_ui()
 
         # Set default value for mute
-        self.is_muted = cfg[CONFIG_MUTE]
+        self.config = cfg.snapshot()
+        self.is_muted = self.config.mute
         self.player.audio_set_mute(self.is_muted)
+        cfg.subscribe(self.on_config_changed)
 
         self.selected = False
 
     def setup_ui(self, ui_file):
-        uic.loadUi(ui_file, self)
+        load_ui(ui_file, self)
         # Find the draw area
         self.draw_area = self.findChild(QtCore.QObject, "drawArea")
-        # Bind the player
+        # The play/pause icon fills the whole button
+        self.pause_button.setIconSize(self.pause_button.size())
+        self.stats_overlay = StatsOverlay(self)
+        self._bind_player()
+
+    def _bind_player(self):
+        """Makes the player draw into the draw area."""
         # Get the current operating system
         os = platform.system().lower()
         if os == OS.LINUX:
@@ -121,16 +157,43 @@ class _VideoFrame(QtWidgets.QFrame):
         """Sets the volume according to the range of the UI volume slider."""
         self.player.audio_set_volume(self.volume_slider.value())
 
+    def on_config_changed(self, config):
+        """Applies saved settings to the running frame."""
+        if config.mute != self.config.mute:
+            self.is_muted = config.mute
+            self.player.audio_set_mute(self.is_muted)
+        self.config = config
+
     def delete_stream(self):
         """Deletes videoframe/stream"""
+        cfg.unsubscribe(self.on_config_changed)
         self._fullscreen(self, force_minimize=True)
+        self._release_vlc()
+        self._delete_stream(self)
+
+    def _release_vlc(self):
+        """Releases the player and the VLC instance, then retains the log."""
         self.player.stop()
         self.player.release()
-        self._delete_stream(self)
+        # libVLC would keep calling back with the log's pointer after it is freed
+        self.vlc_instance.log_unset()
+        self.vlc_instance.release()
+        bridge.detach(self.vlc_log)
+
+    def _set_selected(self, selected):
+        """Sets the selected property which the stylesheet draws a border for."""
+        self.selected = selected
+        self.setProperty(FRAME_SELECTED_PROPERTY, selected)
+        # Only this frame has to be polished again, no stylesheet is parsed
+        self.style().unpolish(self)
+        self.style().polish(self)
+
+    def _show_playback_icon(self, playing):
+        """Shows the pause icon while playing and the play icon otherwise."""
+        self.pause_button.setIcon(_icon(PAUSE_ICON if playing else PLAY_ICON))
 
     def select(self):
-        self.selected = True
-        self.setStyleSheet(FRAME_SELECT_STYLE)
+        self._set_selected(True)
         self.pause_button.hide()
         self.delete_button.hide()
         self.volume_slider.hide()
@@ -138,14 +201,11 @@ class _VideoFrame(QtWidgets.QFrame):
         self._swap(self)
 
     def deselect(self):
-        self.selected = False
+        self._set_selected(False)
         self.pause_button.show()
         self.delete_button.show()
         self.volume_slider.show()
-        if self.player.is_playing():
-            self.setStyleSheet(BUTTON_PLAY)
-        else:
-            self.setStyleSheet(BUTTON_PAUSE)
+        self._show_playback_icon(self.player.is_playing())
 
     def toggle_select(self):
         if self.selected:
@@ -153,12 +213,14 @@ class _VideoFrame(QtWidgets.QFrame):
         else:
             self.select()
 
+    def set_stats_overlay_visible(self, visible):
+        """Shows or hides the performance overlay of this frame."""
+        self.stats_overlay.setVisible(visible)
+
     def toggle_button(self):
         """Toggles the icon of a play/pause button"""
-        if self.player.is_playing():
-            self.setStyleSheet(BUTTON_PAUSE)
-        else:
-            self.setStyleSheet(BUTTON_PLAY)
+        # The player has not changed state yet, so show the opposite icon
+        self._show_playback_icon(not self.player.is_playing())
 
     def resizeEvent(self, event):
         rect = self.geometry()
@@ -190,12 +252,16 @@ class LiveVideoFrame(_VideoFrame):
     """
 
     stream_end = QtCore.pyqtSignal()
+    # Emitted from the export thread with the clip path and an error message, if any
+    clip_exported = QtCore.pyqtSignal(str, str)
 
     def __init__(self, parent, stream_url, stream_options, quality):
         super(LiveVideoFrame, self).__init__(parent)
         self.stream = LiveStreamContainer(self.vlc_instance, stream_url, stream_options, quality)
+        self.vlc_log.tag = "stream {} {}".format(self.stream.id, stream_url)
         self.stream.on_stream_end = self.stream_end.emit
         self.stream_end.connect(self.on_stream_end)
+        self.clip_exported.connect(self.on_clip_exported)
         self.player.set_media(self.stream.media)
         self.player.play()
         self.toggle_button()
@@ -204,7 +270,7 @@ class LiveVideoFrame(_VideoFrame):
         self.rewound = None
 
     def setup_ui(self):
-        super(LiveVideoFrame, self).setup_ui("ui/frame.ui")
+        super(LiveVideoFrame, self).setup_ui(FRAME_UI_FILE)
 
         self.findChild(QtCore.QObject, "delete_button").clicked.connect(self.delete_stream)
         self.findChild(QtCore.QObject, "pause_button").clicked.connect(self.toggle_playback)
@@ -217,12 +283,19 @@ class LiveVideoFrame(_VideoFrame):
         super(LiveVideoFrame, self).setup_actions()
         self.rewind_action = self.context_menu.addAction("Rewind")
         self.rewind_action.triggered.connect(self.rewind)
+        self.clip_action = self.context_menu.addAction("Export Clip...")
+        self.clip_action.triggered.connect(self.export_clip)
         self.context_menu.addSeparator()
 
         self.reload_action = self.context_menu.addAction("Reload")
         self.reload_action.triggered.connect(self.reload_stream)
         self.context_menu.addSeparator()
 
+        self.record_action = self.context_menu.addAction("Record")
+        self.record_action.setCheckable(True)
+        self.record_action.setChecked(self.stream.recording)
+        self.context_menu.addSeparator()
+
         self.chat_action = self.context_menu.addAction("Open Chat")
         self.chat_action.triggered.connect(self.open_stream_in_browser)
         self.context_menu.addSeparator()
@@ -244,9 +317,30 @@ class LiveVideoFrame(_VideoFrame):
 
         self.context_menu.addMenu(quality_submenu)
 
+        # Only there when another window is open
+        self.move_actions = []
+        targets = self._move_targets()
+        if targets:
+            move_submenu = QtWidgets.QMenu("Move to Window", parent=self)
+            for number, grid in enumerate(targets, 1):
+                action = move_submenu.addAction("{} {}".format(number, grid.parent.windowTitle()))
+                self.move_actions.append((action, grid))
+            self.context_menu.addMenu(move_submenu)
+
     def check_actions(self, event):
         user_action = super(LiveVideoFrame, self).check_actions(event)
 
+        if user_action == self.mute_action:
+            # Decodes the audio again if it was unmuted
+            self._focus(self)
+
+        for move_action, grid in self.move_actions:
+            if user_action == move_action:
+                self.move_to(grid)
+
+        if user_action == self.record_action:
+            self.set_recording(not self.stream.recording)
+
         for quality_action in self.quality_actions:
             quality = quality_action.text()
             if user_action == quality_action and quality != self.stream.quality:
@@ -261,6 +355,27 @@ class LiveVideoFrame(_VideoFrame):
 
         user_action = self.check_actions(event)
 
+    def on_config_changed(self, config):
+        # Switch to the quality that now has the highest priority
+        if config.quality != self.config.quality:
+            quality = self.stream.preferred_quality(config.quality)
+            if quality is not None and quality != self.stream.quality:
+                self.change_stream_quality(quality)
+        super(LiveVideoFrame, self).on_config_changed(config)
+
+    def set_recording(self, recording):
+        """Starts or stops recording the stream to disk."""
+        if recording:
+            self.stream.start_recording()
+        else:
+            self.stream.stop_recording()
+
+    def delete_stream(self):
+        self.stream.stop_recording()
+        if self.rewound is not None:
+            self.rewound.close()
+        super(LiveVideoFrame, self).delete_stream()
+
     def change_stream_quality(self, quality):
         self.player.stop()
         self.stream.change_stream_quality(quality)
@@ -288,6 +403,17 @@ class LiveVideoFrame(_VideoFrame):
         else:
             webbrowser.open(url)
 
+    def move_to(self, grid):
+        """Moves the frame to the grid of another window, the stream keeps
+        playing unless the player has to be bound to a new native window."""
+        window_id = int(self.draw_area.winId())
+        self._move(self, grid)
+        if int(self.draw_area.winId()) != window_id:
+            self._bind_player()
+            self.player.stop()
+            self.stream.refresh()
+            self.player.play()
+
     def reload_stream(self, event):
         self.player.stop()
         self.stream.refresh()
@@ -307,9 +433,14 @@ class LiveVideoFrame(_VideoFrame):
             rect.height() / 2 - label_rect.height() / 2
         )
 
+    def select(self):
+        super(LiveVideoFrame, self).select()
+        self._focus(self)
+
     def enterEvent(self, event):
         super(LiveVideoFrame, self).enterEvent(event)
         self.delete_button.show()
+        self._focus(self)
 
     def leaveEvent(self, event):
         super(LiveVideoFrame, self).leaveEvent(event)
@@ -328,6 +459,7 @@ class LiveVideoFrame(_VideoFrame):
             self.rewound.setWindowTitle("Rewound Stream")
             self.rewound.resize(QtWidgets.QDesktopWidget().availableGeometry(-1).size() * 0.5)
             self.rewound.frame = RewoundVideoFrame(self.rewound, self.stream.buffer)
+            self.rewound.frame.vlc_log.tag = "rewound " + self.vlc_log.tag
             # Set events:
             self.rewound.closeEvent = self.close_rewound
             self.rewound.frame._fullscreen = self.fullscreen_rewound
@@ -337,12 +469,57 @@ class LiveVideoFrame(_VideoFrame):
             # Init values
             self.rewound.is_fullscreen = False
 
+    def export_clip(self):
+        """Asks for a number of seconds and writes that many seconds from
+        the end of the buffer to a file in the clips directory."""
+        if not cfg[CONFIG_BUFFER_STREAM]:
+            QtWidgets.QMessageBox().warning(
+                self,
+                "Warning",
+                "Cannot export a clip. You currently have buffering turned off."
+            )
+            return
+        seconds, ok = QtWidgets.QInputDialog.getInt(
+            self,
+            "Export clip",
+            "Seconds to export:",
+            CLIP_DEFAULT_SECONDS,
+            1
+        )
+        if not ok:
+            return
+
+        # Copying the list of chunks is cheap, the chunks themselves are never modified
+        chunks = list(self.stream.buffer)
+        path = clips.clip_path(recording_name(self.stream.id, self.stream.url))
+        threading.Thread(target=self._export_clip, args=(chunks, path, seconds), daemon=True).start()
+
+    def _export_clip(self, chunks, path, seconds):
+        """Cuts and writes the clip, called on a worker thread."""
+        error = ""
+        try:
+            clips.export_clip(chunks, path, seconds)
+        except (clips.ClipError, OSError) as e:
+            error = str(e)
+        try:
+            self.clip_exported.emit(path, error)
+        except RuntimeError:
+            # The frame has been deleted in the meantime, there is nothing left to show it on
+            print("Could not export the clip: " + error if error else "Clip written to " + path)
+
+    def on_clip_exported(self, path, error):
+        """Tells the user where the clip was written, or why it wasn't."""
+        if error:
+            QtWidgets.QMessageBox().warning(self, "Export clip", "Could not export the clip: " + error)
+        else:
+            QtWidgets.QMessageBox.information(self, "Export clip", "Clip written to " + path)
+
     # Following functions belong to the rewound window
     def close_rewound(self, _):
         """Called whenever the rewound window is closed"""
         # First stop and release the media player
-        self.rewound.frame.player.stop()
-        self.rewound.frame.player.release()
+        cfg.unsubscribe(self.rewound.frame.on_config_changed)
+        self.rewound.frame._release_vlc()
         # To remove the rewound video window;
         # Let the garbage collector do its magic
         self.rewound = None
@@ -374,7 +551,7 @@ class RewoundVideoFrame(_VideoFrame):
         self.player.play()
 
     def setup_ui(self):
-        super(RewoundVideoFrame, self).setup_ui("ui/rewoundframe.ui")
+        super(RewoundVideoFrame, self).setup_ui(REWOUND_FRAME_UI_FILE)
 
         self.findChild(QtCore.QObject, "pause_button").clicked.connect(self.toggle_playback)
         self.findChild(QtCore.QObject, "forward_button").clicked.connect(self.scrub_forward)
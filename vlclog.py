@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""Bridges the log messages of the libVLC instances into Python logging.
+
+Every frame owns a libVLC instance, so every instance gets a StreamLog tagged
+with the stream it plays. libVLC calls the log callback from its own threads,
+so the callback only formats the message and counts it into the StreamLog.
+Repeated messages are aggregated and the Python logger is only written to
+when the GUI thread flushes the logs, once every VLC_LOG_FLUSH_MS.
+
+Note that libVLC hands every message, debug ones included, to the callback.
+Those below VLC_LOG_MIN_LEVEL are dropped before being formatted.
+"""
+
+import ctypes
+import ctypes.util
+import importlib
+import logging
+import platform
+import threading
+import time
+from collections import deque
+
+from constants import (
+    VLC_LOG_KEEP, VLC_LOG_MESSAGE_MAX, VLC_LOG_MIN_LEVEL, VLC_LOG_PENDING_MAX,
+    VLC_LOG_RING_SIZE
+)
+from utils import OS, MostRecentlyUsed
+
+logger = logging.getLogger("vlc")
+
+# libVLC log levels to Python logging levels
+LEVELS = {
+    0: logging.DEBUG,
+    2: logging.INFO,
+    3: logging.WARNING,
+    4: logging.ERROR,
+}
+
+
+def _load_vsnprintf():
+    """Returns the C library vsnprintf used to format the libVLC messages."""
+    if platform.system().lower() == OS.WINDOWS:
+        vsnprintf = ctypes.cdll.msvcrt._vsnprintf
+    else:
+        vsnprintf = ctypes.CDLL(ctypes.util.find_library("c")).vsnprintf
+    vsnprintf.argtypes = [ctypes.c_char_p, ctypes.c_size_t, ctypes.c_char_p, ctypes.c_void_p]
+    vsnprintf.restype = ctypes.c_int
+    return vsnprintf
+
+
+def _log_cb(data, level, ctx, fmt, args):
+    """LibVLC log callback, called from any of the libVLC threads.
+
+    data:   pointer to the StreamLog of the instance.
+    level:  libVLC log level of the message.
+    ctx:    message context, only valid during the call.
+    fmt:    printf format string of the message.
+    args:   va_list of the format arguments.
+    """
+    log = ctypes.cast(data, ctypes.POINTER(ctypes.py_object)).contents.value
+    if level < log.min_level:
+        return
+
+    buf = ctypes.create_string_buffer(VLC_LOG_MESSAGE_MAX)
+    bridge.vsnprintf(buf, VLC_LOG_MESSAGE_MAX, fmt, args)
+    module = bridge.vlc.libvlc_log_get_context(ctx)[0]
+    log.append(
+        level,
+        module.decode("utf-8", "replace") if module else "",
+        buf.value.decode("utf-8", "replace")
+    )
+
+
+class StreamLog:
+    """The recent libVLC log messages of one stream.
+
+    A message repeated before the next flush only increments the count of its
+    first entry. The entries are kept in a ring of the last capacity distinct
+    messages, for dumping after something went wrong.
+
+    Args:
+        tag (str): Identifies the stream in the log records.
+        min_level (int): Lowest libVLC log level kept.
+        capacity (int): Number of entries kept in the ring.
+    """
+
+    def __init__(self, tag, min_level=VLC_LOG_MIN_LEVEL, capacity=VLC_LOG_RING_SIZE):
+        self.tag = tag
+        self.min_level = min_level
+        # Entries are [time, level, module, message, count]
+        self.entries = deque(maxlen=capacity)
+        self._pending = {}
+        self._suppressed = 0
+        self._lock = threading.Lock()
+
+        # Cast this log to a c pointer to use in the log callback
+        self.opaque = ctypes.cast(ctypes.pointer(
+            ctypes.py_object(self)), ctypes.c_void_p)
+
+    def append(self, level, module, message):
+        """Counts a message, adding an entry if it is new since the last flush."""
+        key = (level, module, message)
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is not None:
+                entry[4] += 1
+                return
+            # Messages that differ every time would otherwise grow without bound
+            if len(self._pending) >= VLC_LOG_PENDING_MAX:
+                self._suppressed += 1
+                return
+            entry = [time.time(), level, module, message, 1]
+            self._pending[key] = entry
+            self.entries.append(entry)
+
+    def flush(self, log=logger):
+        """Writes the messages counted since the last flush to the logger."""
+        with self._lock:
+            pending = self._pending
+            suppressed = self._suppressed
+            self._pending = {}
+            self._suppressed = 0
+
+        for _, level, module, message, count in pending.values():
+            if count > 1:
+                log.log(LEVELS.get(level, logging.INFO), "[%s] %s: %s (repeated %d times)",
+                        self.tag, module, message, count)
+            else:
+                log.log(LEVELS.get(level, logging.INFO), "[%s] %s: %s", self.tag, module, message)
+        if suppressed:
+            log.warning("[%s] %d more libVLC messages suppressed", self.tag, suppressed)
+
+    def dump(self, f):
+        """Writes the entries in the ring to the file object f."""
+        with self._lock:
+            entries = [list(entry) for entry in self.entries]
+        for timestamp, level, module, message, count in entries:
+            f.write("{} {} [{}] {}: {}{}\n".format(
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)),
+                logging.getLevelName(LEVELS.get(level, logging.INFO)),
+                self.tag,
+                module,
+                message,
+                " (x{})".format(count) if count > 1 else ""
+            ))
+
+
+class VlcLogBridge:
+    """Attaches StreamLogs to libVLC instances and flushes them.
+
+    The logs of the attached instances are kept until their frame is deleted
+    and detaches them. The logs of the last 'keep' detached instances are
+    kept as well, so the logs of a closed stream can still be dumped.
+    """
+
+    def __init__(self, keep=VLC_LOG_KEEP):
+        # Oldest first
+        self.attached = []
+        self.closed = MostRecentlyUsed(keep)
+        self.vlc = None
+        self.vsnprintf = None
+        self._callback = None
+
+    def attach(self, vlc_instance, tag):
+        """Routes the log messages of vlc_instance into a new StreamLog.
+
+        Returns:
+            StreamLog: The log, keep a reference to it while the instance lives.
+        """
+        if self._callback is None:
+            self.vlc = importlib.import_module("vlc")
+            self.vsnprintf = _load_vsnprintf()
+            self._callback = self.vlc.CallbackDecorators.LogCb(_log_cb)
+
+        log = StreamLog(tag)
+        vlc_instance.log_set(self._callback, log.opaque)
+        self.attached.append(log)
+        return log
+
+    def detach(self, log):
+        """Moves the log of a deleted frame to the retained closed logs."""
+        if log in self.attached:
+            self.attached.remove(log)
+            self.closed.add(log)
+
+    @property
+    def logs(self):
+        """All logs, the attached ones and then the closed ones, newest first."""
+        return self.attached[::-1] + list(self.closed)
+
+    def flush(self):
+        """Writes what all logs counted since the last flush to the logger."""
+        for log in self.logs:
+            log.flush()
+
+    def dump(self, path):
+        """Writes the recent entries of all logs, newest stream first, to path."""
+        with open(path, "w") as f:
+            for log in self.logs:
+                log.dump(f)
+
+
+bridge = VlcLogBridge()
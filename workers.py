@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+"""Reads streams in worker processes.
+
+In the worker process mode every stream is opened by a process of its own,
+which reads it with streamlink and writes what it reads into a ring buffer
+in shared memory. The app passes the worker the stream it already resolved,
+so starting and restarting a worker doesn't resolve the url again; only
+streams of other types are resolved by the worker, which then falls back to
+the quality priority if the quality is gone. The read callback of the stream only copies out of
+the ring, so fetching segments and whatever the plugin does run outside of
+the GIL of the GUI, and a worker that crashes is started again without
+taking the app down.
+
+Workers run this module as their main script, python -m workers, so they
+only import what reading a stream needs. multiprocessing would import the
+main script of the app, and with it Qt, in every worker. Each side wakes up
+the other by writing a byte to the pipe between them.
+
+WorkerStream has the read() and close() of an opened streamlink stream, so
+containers use it in place of one. Shared memory needs Python 3.8, on older
+versions streams are always read in process. So are they in a frozen build,
+whose executable is the app and can't run a module.
+"""
+
+import json
+import os
+import struct
+import subprocess
+import sys
+import threading
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    # Python before 3.8
+    shared_memory = None
+
+from constants import (
+    WORKER_MAX_RESTARTS, WORKER_POLL_INTERVAL, WORKER_READ_SIZE, WORKER_RING_SIZE, WORKER_STOP_TIMEOUT
+)
+
+available = shared_memory is not None and not getattr(sys, "frozen", False)
+
+# The ring starts with the total bytes written, the total bytes read and
+# whether the stream has ended, the data follows the header
+_COUNT = struct.Struct("Q")
+_WRITTEN = 0
+_READ = 8
+_ENDED = 16
+_HEADER_SIZE = 64
+
+# Workers run from here, where the modules of the app can be imported
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The resolved streams a worker opens as they are, by Stream.shortname()
+_STREAM_TYPES = ("hls", "http")
+
+
+def stream_spec(stream):
+    """Returns what a worker needs to open the resolved stream, as JSON
+    values, or None if the worker has to resolve the url itself."""
+    if stream is None or stream.shortname() not in _STREAM_TYPES:
+        return None
+    args = dict(stream.args)
+    # The headers of the request, including those the plugin set on its session
+    args["headers"] = stream.__json__().get("headers", {})
+    try:
+        json.dumps(args)
+    except (TypeError, ValueError):
+        # E.g. cookies or an auth object of the plugin
+        return None
+    return {"type": stream.shortname(), "args": args}
+
+
+def _open(url, spec):
+    """Opens the stream in the worker: the resolved stream if the app passed
+    it, otherwise the first quality of the priority the url offers.
+
+    Returns:
+        The opened stream, None if the url offers none of the qualities.
+    """
+    if spec["stream"] is not None:
+        import streamlink
+        from streamlink.stream.hls import HLSStream
+        from streamlink.stream.http import HTTPStream
+
+        stream_type = {"hls": HLSStream, "http": HTTPStream}[spec["stream"]["type"]]
+        return stream_type(streamlink.Streamlink(), **spec["stream"]["args"]).open()
+
+    from models.model import create_streamlink_session
+
+    streams = create_streamlink_session().streams(url)
+    for quality in spec["qualities"]:
+        if quality in streams:
+            return streams[quality].open()
+    return None
+
+
+class _Notifier:
+    """Wakes up the other process, like setting an Event it waits on.
+
+    Args:
+        pipe (file): Unbuffered binary pipe to the other process.
+    """
+
+    def __init__(self, pipe):
+        self.pipe = pipe
+
+    def set(self):
+        try:
+            self.pipe.write(b"\x01")
+        except (OSError, ValueError):
+            # The other process has exited or the pipe was closed, both are noticed elsewhere
+            pass
+
+
+class _Waiter:
+    """Waits for the other process to wake it up, like an Event.
+
+    A thread reads the pipe from the other process and sets the event on
+    every byte. Once the other end is closed the thread closes the pipe, the
+    event stays set and closed is set.
+
+    Args:
+        pipe (file): Unbuffered binary pipe from the other process.
+        name (str): Name of the thread.
+    """
+
+    def __init__(self, pipe, name):
+        self._pipe = pipe
+        self._event = threading.Event()
+        self.closed = threading.Event()
+        threading.Thread(target=self._run, name=name, daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                data = self._pipe.read(4096)
+            except (OSError, ValueError):
+                data = b""
+            if not data:
+                self._pipe.close()
+                self.closed.set()
+                self._event.set()
+                return
+            self._event.set()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def clear(self):
+        if not self.closed.is_set():
+            self._event.clear()
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+
+class Ring:
+    """A ring buffer of bytes with one writer and one reader, which can be in
+    different processes.
+
+    The writer only moves the written count and the reader only the read
+    count, each after copying, so neither needs a lock. The events wake up a
+    reader waiting for data and a writer waiting for space.
+
+    Args:
+        buf (memoryview): The shared memory, _HEADER_SIZE + capacity bytes.
+        capacity (int): Bytes of data the ring holds.
+        data_ready (Event): Set whenever data was written, waited on by the reader.
+        space_ready (Event): Set whenever data was read, waited on by the writer.
+    """
+
+    def __init__(self, buf, capacity, data_ready, space_ready):
+        self.buf = buf
+        self.capacity = capacity
+        self.data_ready = data_ready
+        self.space_ready = space_ready
+
+    def _get(self, offset):
+        return _COUNT.unpack_from(self.buf, offset)[0]
+
+    def _set(self, offset, value):
+        _COUNT.pack_into(self.buf, offset, value)
+
+    def reset(self):
+        """Empties the ring, only while nothing writes to it."""
+        self._set(_WRITTEN, 0)
+        self._set(_READ, 0)
+        self.buf[_ENDED] = 0
+
+    @property
+    def ended(self):
+        """Whether the writer has reached the end of the stream."""
+        return bool(self.buf[_ENDED])
+
+    def end(self):
+        self.buf[_ENDED] = 1
+        self.data_ready.set()
+
+    def available(self):
+        return self._get(_WRITTEN) - self._get(_READ)
+
+    def write(self, data, stop):
+        """Copies data into the ring, waiting for the reader to make room.
+
+        Returns:
+            bool: False if stop was set while waiting.
+        """
+        view = memoryview(data)
+        written = self._get(_WRITTEN)
+        while len(view):
+            self.space_ready.clear()
+            free = self.capacity - (written - self._get(_READ))
+            if not free:
+                if stop.is_set():
+                    return False
+                self.space_ready.wait(WORKER_POLL_INTERVAL)
+                continue
+
+            count = min(free, len(view))
+            start = written % self.capacity
+            first = min(count, self.capacity - start)
+            self.buf[_HEADER_SIZE + start:_HEADER_SIZE + start + first] = view[:first]
+            if count > first:
+                self.buf[_HEADER_SIZE:_HEADER_SIZE + count - first] = view[first:count]
+            written += count
+            self._set(_WRITTEN, written)
+            self.data_ready.set()
+            view = view[count:]
+        return True
+
+    def read(self, length):
+        """Returns up to length bytes, empty if there are none. Never waits."""
+        read = self._get(_READ)
+        count = min(self._get(_WRITTEN) - read, length)
+        if count <= 0:
+            return b""
+
+        start = read % self.capacity
+        first = min(count, self.capacity - start)
+        data = bytes(self.buf[_HEADER_SIZE + start:_HEADER_SIZE + start + first])
+        if count > first:
+            data += bytes(self.buf[_HEADER_SIZE:_HEADER_SIZE + count - first])
+        self._set(_READ, read + count)
+        self.space_ready.set()
+        return data
+
+
+def _run_worker(url, spec, name, capacity, read_size):
+    """Runs in the worker process: reads the stream into the ring until it
+    ends or the app closes the pipe. Errors end the process with a traceback
+    and a non zero exit code, which makes the stream start it again."""
+    # The notifications go to the app on stdout, anything printed to stderr
+    notify = os.fdopen(os.dup(1), "wb", 0)
+    os.dup2(2, 1)
+    space_ready = _Waiter(os.fdopen(os.dup(0), "rb", 0), "space-ready")
+
+    memory = shared_memory.SharedMemory(name=name)
+    if os.name == "posix":
+        # The app owns the memory, the tracker of this process would remove it on exit
+        resource_tracker.unregister(memory._name, "shared_memory")
+    ring = Ring(memory.buf, capacity, _Notifier(notify), space_ready)
+    stream = _open(url, spec)
+    if stream is None:
+        # Offline, or none of the qualities; starting again won't help
+        print("Stream {} has none of the qualities {}".format(url, ", ".join(spec["qualities"])))
+        ring.end()
+        ring.buf = None
+        memory.close()
+        return
+    try:
+        while not space_ready.closed.is_set():
+            data = stream.read(read_size)
+            if not data:
+                ring.end()
+                break
+            if not ring.write(data, space_ready.closed):
+                break
+    finally:
+        stream.close()
+        ring.buf = None
+        memory.close()
+
+
+class WorkerStream:
+    """Reads a stream in a worker process, started right away.
+
+    Args:
+        url (str): The url of the stream.
+        quality (str): The quality opened by the worker.
+        stream (Stream): The resolved stream of the quality, opened by the
+            worker as it is if it can be, see stream_spec(). Otherwise, or
+            if it is None, the worker resolves the url.
+        priority (list): Qualities a worker that resolves the url opens
+            instead, in order, if the url no longer offers the quality.
+        capacity (int): Bytes the worker reads ahead at most.
+        read_size (int): Bytes the worker reads from the stream at a time.
+
+    Attributes:
+        restarts (int): Times the worker was started again after it exited
+            before the end of the stream.
+    """
+
+    def __init__(self, url, quality, stream=None, priority=(), capacity=WORKER_RING_SIZE,
+                 read_size=WORKER_READ_SIZE):
+        self.url = url
+        self.quality = quality
+        self._spec = json.dumps({
+            "stream": stream_spec(stream),
+            "qualities": [quality] + [q for q in priority if q != quality],
+        })
+        self.read_size = read_size
+        self.restarts = 0
+        # Restarts since the worker last delivered anything
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._memory = shared_memory.SharedMemory(create=True, size=_HEADER_SIZE + capacity)
+        self._ring = Ring(self._memory.buf, capacity, None, None)
+        self._process = None
+        self._start()
+
+    @property
+    def pid(self):
+        return self._process.pid
+
+    def _start(self):
+        self._ring.reset()
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "workers", self.url, self._spec, self._memory.name,
+             str(self._ring.capacity), str(self.read_size)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            bufsize=0,
+            cwd=_APP_DIR
+        )
+        self._ring.data_ready = _Waiter(self._process.stdout, "stream-worker-data")
+        self._ring.space_ready = _Notifier(self._process.stdin)
+
+    def read(self, length):
+        """Returns up to length bytes the worker has read, waiting for them
+        like a stream read would. Empty once the stream has ended, the
+        worker was given up, or the stream was closed."""
+        ring = self._ring
+        while True:
+            with self._lock:
+                if self._memory is None:
+                    return b""
+                # Cleared before looking, so a write right after is not missed
+                ring.data_ready.clear()
+                data = ring.read(length)
+                if data:
+                    self._failures = 0
+                    return data
+                if ring.ended:
+                    return b""
+                if self._process.poll() is not None:
+                    # What the worker wrote just before it exited
+                    data = ring.read(length)
+                    if data:
+                        return data
+                    if ring.ended or not self._restart():
+                        return b""
+                    continue
+            ring.data_ready.wait(WORKER_POLL_INTERVAL)
+
+    def _restart(self):
+        """Starts the worker again after it exited early.
+
+        Returns:
+            bool: False if it has been restarted too often without delivering anything.
+        """
+        exitcode = self._process.returncode
+        self._process.stdin.close()
+        if self._failures >= WORKER_MAX_RESTARTS:
+            print("Giving up on the worker of stream {}, it exited with code {}".format(self.url, exitcode))
+            return False
+        print("The worker of stream {} exited with code {}, restarting it".format(self.url, exitcode))
+        self._failures += 1
+        self.restarts += 1
+        self._start()
+        return True
+
+    def close(self):
+        """Stops the worker and frees the shared memory."""
+        with self._lock:
+            if self._memory is None:
+                return
+            if self._process.poll() is None:
+                # The end of the pipe tells the worker to stop
+                self._process.stdin.close()
+                try:
+                    self._process.wait(WORKER_STOP_TIMEOUT)
+                except subprocess.TimeoutExpired:
+                    self._process.terminate()
+                    self._process.wait()
+            self._process.stdin.close()
+            self._ring.buf = None
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+
+if __name__ == "__main__":
+    _run_worker(sys.argv[1], json.loads(sys.argv[2]), sys.argv[3], int(sys.argv[4]), int(sys.argv[5]))